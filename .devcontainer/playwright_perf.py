@@ -0,0 +1,389 @@
+"""Frontend performance runs against the local stack, checked against budgets.
+
+Drives the wallet_load (chat page opened with ?wallet=, the /wallets -> overview loading path),
+wallet_switch and chat flows in several browser contexts at once. Each page records its web
+vitals and the waterfall of API requests, with the backend's X-Request-ID, X-Cache-Status and,
+given the backend's PROFILE_TOKEN, Server-Timing and X-Profile-Id headers. The report goes to
+automation_output/<timestamp>/perf_report.json; the run exits non-zero when a budget in
+perf_budgets.json is exceeded. Budgets for routes or flows that were not exercised are skipped.
+
+    python .devcontainer/playwright_perf.py
+    python .devcontainer/playwright_perf.py --contexts 8 --flows wallet_load wallet_switch
+    python .devcontainer/playwright_perf.py --profile-token "$PROFILE_TOKEN" --budgets ""
+"""
+import asyncio
+from playwright.async_api import async_playwright
+import argparse
+from datetime import datetime
+import json
+from pathlib import Path
+import re
+import sys
+import time
+
+BUDGETS_PATH = Path(__file__).resolve().parent / "perf_budgets.json"
+
+# Collected in the page from the first byte on; read back with page.evaluate("window.__perfVitals")
+WEB_VITALS_SCRIPT = """
+(() => {
+  const vitals = window.__perfVitals = { ttfb: null, fcp: null, lcp: null, cls: 0, inp: null };
+  const observe = (type, callback, options = {}) => {
+    try {
+      new PerformanceObserver((list) => list.getEntries().forEach(callback)).observe({ type, buffered: true, ...options });
+    } catch (e) {}
+  };
+  observe("navigation", (entry) => { vitals.ttfb = entry.responseStart; });
+  observe("paint", (entry) => { if (entry.name === "first-contentful-paint") vitals.fcp = entry.startTime; });
+  observe("largest-contentful-paint", (entry) => { vitals.lcp = entry.startTime; });
+  observe("layout-shift", (entry) => { if (!entry.hadRecentInput) vitals.cls += entry.value; });
+  observe("event", (entry) => {
+    if (entry.interactionId) vitals.inp = Math.max(vitals.inp || 0, entry.duration);
+  }, { durationThreshold: 16 });
+})();
+"""
+
+# Path segments that identify a document (uuids, hex ids and hashes, numbers, base58 addresses)
+ID_SEGMENT = re.compile(r"^([0-9a-fA-F-]{32,36}|0x[0-9a-fA-F]+|\d+|[1-9A-HJ-NP-Za-km-z]{32,44})$")
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))]
+
+
+def route_of(method: str, url: str) -> str:
+    """'GET /api/wallets/{id}/overview' for a request URL, so that budgets apply per endpoint"""
+    path = url.split("://", 1)[-1].split("/", 1)[-1].split("?", 1)[0]
+    segments = ["{id}" if ID_SEGMENT.match(segment) else segment for segment in path.split("/")]
+    return f"{method} /" + "/".join(segments)
+
+
+def parse_server_timing(value: str) -> dict:
+    """Server-Timing 'mongo;dur=1.2, rpc;dur=30.5, app;dur=40' as {'mongo': 1.2, 'rpc': 30.5, 'app': 40.0}"""
+    timings = {}
+    for metric in filter(None, (part.strip() for part in (value or "").split(","))):
+        name, *params = [param.strip() for param in metric.split(";")]
+        for param in params:
+            if param.startswith("dur="):
+                timings[name] = float(param[4:])
+    return timings
+
+
+def api_depth(requests) -> int:
+    """Longest chain of API calls in which each one started only after the previous one ended"""
+    depths = []
+    for request in sorted(requests, key=lambda request: request["start_ms"]):
+        earlier = [depth for other, depth in depths if other["start_ms"] + other["duration_ms"] <= request["start_ms"]]
+        depths.append((request, 1 + max(earlier, default=0)))
+    return max((depth for _, depth in depths), default=0)
+
+
+class PageRecorder:
+    """Records the API requests and web vitals of one page load"""
+
+    def __init__(self, page, flow: str, context_index: int, api_prefix: str):
+        self.page = page
+        self.flow = flow
+        self.context_index = context_index
+        self.api_prefix = api_prefix
+        self.requests = []
+        self.pending = []
+        self.time_origin = None
+        page.on("requestfinished", lambda request: self.pending.append(asyncio.ensure_future(self._record(request))))
+        page.on("requestfailed", lambda request: self.pending.append(asyncio.ensure_future(self._record(request, failed=True))))
+
+    async def _record(self, request, failed=False):
+        if self.api_prefix not in request.url or request.method == "OPTIONS":
+            return
+        timing = request.timing
+        response = None if failed else await request.response()
+        headers = await response.all_headers() if response else {}
+        self.requests.append({
+            "route": route_of(request.method, request.url),
+            "url": request.url,
+            "status": response.status if response else None,
+            "started_at": timing["startTime"],
+            # Offsets are relative to the request start; -1 means the phase did not happen
+            "ttfb_ms": round(timing["responseStart"], 2) if timing["responseStart"] >= 0 else None,
+            "duration_ms": round(timing["responseEnd"], 2) if timing["responseEnd"] >= 0 else None,
+            "request_id": headers.get("x-request-id"),
+            "profile_id": headers.get("x-profile-id"),
+            "cache_status": headers.get("x-cache-status"),
+            "server_timing": parse_server_timing(headers.get("server-timing")),
+        })
+
+    async def navigate(self, url: str):
+        await self.page.goto(url, wait_until="domcontentloaded", timeout=30000)
+        self.time_origin = await self.page.evaluate("performance.timeOrigin")
+
+    async def finish(self) -> dict:
+        """Wait for in-flight recording and return this page's vitals and waterfall"""
+        await self.page.wait_for_load_state("networkidle")
+        vitals = await self.page.evaluate("window.__perfVitals")
+        await asyncio.gather(*self.pending)
+        requests = []
+        for request in sorted(self.requests, key=lambda request: request["started_at"]):
+            started_at = request.pop("started_at")
+            requests.append({**request, "start_ms": round(started_at - self.time_origin, 2), "duration_ms": request["duration_ms"] or 0.0})
+        return {"flow": self.flow, "context": self.context_index, "vitals": vitals, "requests": requests}
+
+
+def details_panel(page, wallet):
+    """The selected wallet panel, once it shows this wallet"""
+    return page.locator("h4", has_text=re.compile(f"^{re.escape(wallet['name'])}$"))
+
+
+async def wallet_load(context, args, context_index, wallets, iteration) -> dict:
+    """Open the chat page with a wallet preselected and time until its details are shown"""
+    wallet = wallets[(context_index + iteration) % len(wallets)]
+    page = await context.new_page()
+    recorder = PageRecorder(page, "wallet_load", context_index, args.api_prefix)
+    try:
+        await recorder.navigate(f"{args.url}/?wallet={wallet['wallet_id']}")
+        await details_panel(page, wallet).wait_for(timeout=args.timeout_ms)
+        elapsed = await page.evaluate("performance.now()")
+        record = await recorder.finish()
+        # Only the calls made before the details appeared are on the loading path
+        loading_path = [request for request in record["requests"] if request["start_ms"] <= elapsed]
+        record.update(duration_ms=round(elapsed, 2), api_depth=api_depth(loading_path))
+        return record
+    finally:
+        await page.close()
+
+
+async def wallet_switch(context, args, context_index, wallets, iteration) -> dict:
+    """Switch between wallets in the sidebar, timing each switch until the details panel updates"""
+    page = await context.new_page()
+    recorder = PageRecorder(page, "wallet_switch", context_index, args.api_prefix)
+    try:
+        await recorder.navigate(args.url)
+        await page.locator("input[name=wallet]").nth(1).wait_for(timeout=args.timeout_ms)
+        switches = []
+        for offset in range(min(args.switches, len(wallets))):
+            # The sidebar lists the wallets in /wallets order, after the "General Chat" entry
+            position = (context_index + iteration + offset) % len(wallets)
+            wallet = wallets[position]
+            start = time.perf_counter()
+            await page.locator("input[name=wallet]").nth(position + 1).click()
+            await details_panel(page, wallet).wait_for(timeout=args.timeout_ms)
+            switches.append(round((time.perf_counter() - start) * 1000, 2))
+        record = await recorder.finish()
+        record.update(switches_ms=switches)
+        return record
+    finally:
+        await page.close()
+
+
+async def chat(context, args, context_index, wallets, iteration) -> dict:
+    """Send the chat messages with a wallet selected, timing each one until the reply is shown"""
+    wallet = wallets[(context_index + iteration) % len(wallets)]
+    page = await context.new_page()
+    recorder = PageRecorder(page, "chat", context_index, args.api_prefix)
+    try:
+        await recorder.navigate(f"{args.url}/?wallet={wallet['wallet_id']}")
+        await details_panel(page, wallet).wait_for(timeout=args.timeout_ms)
+        replies = page.locator(".console-message-assistant .console-message-content:not(:has(.console-loader))")
+        messages = []
+        for message in args.chat_messages:
+            count = await replies.count()
+            start = time.perf_counter()
+            await page.locator("form input[type=text]").fill(message)
+            await page.locator("form button[type=submit]").click()
+            await replies.nth(count).wait_for(timeout=args.timeout_ms)
+            messages.append(round((time.perf_counter() - start) * 1000, 2))
+        record = await recorder.finish()
+        record.update(messages_ms=messages)
+        return record
+    finally:
+        await page.close()
+
+
+FLOWS = {"wallet_load": wallet_load, "wallet_switch": wallet_switch, "chat": chat}
+
+
+async def seed_wallets(playwright, api_url: str, count: int):
+    """The wallets to drive the flows with, creating ETH wallets until there are `count`"""
+    api = await playwright.request.new_context()
+    try:
+        response = await api.get(f"{api_url}/wallets")
+        wallets = await response.json()
+        for index in range(len(wallets), count):
+            response = await api.post(f"{api_url}/wallets", data={"name": f"perf-{index}", "chain_type": "ETH"})
+            wallets.append(await response.json())
+        return wallets[:count]
+    finally:
+        await api.dispose()
+
+
+async def run_context(browser, args, context_index, wallets):
+    headers = {"X-Profile-Token": args.profile_token} if args.profile_token else {}
+    context = await browser.new_context(extra_http_headers=headers)
+    await context.add_init_script(WEB_VITALS_SCRIPT)
+    records = []
+    try:
+        for iteration in range(args.iterations):
+            for flow in args.flows:
+                records.append(await FLOWS[flow](context, args, context_index, wallets, iteration))
+    finally:
+        await context.close()
+    return records
+
+
+def summarize(records) -> dict:
+    """Web vitals at p75 (as the web-vitals thresholds are defined), flows and API routes at p50/p95"""
+    vitals = {}
+    for name, key in (("ttfb_ms", "ttfb"), ("fcp_ms", "fcp"), ("lcp_ms", "lcp"), ("cls", "cls"), ("inp_ms", "inp")):
+        values = [record["vitals"][key] for record in records if record["vitals"] and record["vitals"].get(key) is not None]
+        if values:
+            vitals[name] = {"p75": round(percentile(values, 75), 3), "samples": len(values)}
+
+    flow_samples = {}
+    for record in records:
+        samples = record.get("switches_ms") or record.get("messages_ms") or [record.get("duration_ms")]
+        flow_samples.setdefault(record["flow"], []).extend(sample for sample in samples if sample is not None)
+    flows = {
+        flow: {"count": len(samples), "p50_ms": percentile(samples, 50), "p95_ms": percentile(samples, 95), "max_ms": max(samples)}
+        for flow, samples in flow_samples.items() if samples
+    }
+    depths = [record["api_depth"] for record in records if "api_depth" in record]
+    if depths and "wallet_load" in flows:
+        flows["wallet_load"]["max_api_depth"] = max(depths)
+
+    by_route = {}
+    for record in records:
+        for request in record["requests"]:
+            by_route.setdefault(request["route"], []).append(request)
+    routes = {}
+    for route, requests in sorted(by_route.items()):
+        durations = [request["duration_ms"] for request in requests]
+        server = [request["server_timing"]["app"] for request in requests if "app" in request["server_timing"]]
+        spans = {}
+        for request in requests:
+            for name, value in request["server_timing"].items():
+                if name != "app":
+                    spans.setdefault(name, []).append(value)
+        routes[route] = {
+            "count": len(requests),
+            "errors": sum(1 for request in requests if not request["status"] or request["status"] >= 500),
+            "p50_ms": percentile(durations, 50),
+            "p95_ms": percentile(durations, 95),
+            "server_p95_ms": percentile(server, 95) if server else None,
+            "server_spans_p95_ms": {name: percentile(values, 95) for name, values in spans.items()},
+            "cache_status": {
+                status: sum(1 for request in requests if request["cache_status"] == status)
+                for status in {request["cache_status"] for request in requests if request["cache_status"]}
+            },
+        }
+    return {"vitals": vitals, "flows": flows, "routes": routes}
+
+
+def check_budgets(summary, budgets) -> list:
+    """Every budgeted metric with its actual value; metrics that were not measured are skipped"""
+    results = []
+
+    def check(metric, budget, actual):
+        if actual is not None:
+            results.append({"metric": metric, "budget": budget, "actual": actual, "ok": actual <= budget})
+
+    for name, budget in budgets.get("vitals", {}).items():
+        check(f"vitals.{name}.p75", budget, summary["vitals"].get(name, {}).get("p75"))
+    for section, measured in (("flows", summary["flows"]), ("routes", summary["routes"])):
+        for name, limits in budgets.get(section, {}).items():
+            for key, budget in limits.items():
+                check(f"{section}.{name}.{key}", budget, measured.get(name, {}).get(key))
+    return results
+
+
+async def run_perf(args):
+    """
+    Runs the flows in parallel browser contexts and checks the results against the budgets.
+    """
+    automation_output_dir = 'automation_output'
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    run_dir = Path(automation_output_dir) / timestamp
+    run_dir.mkdir(parents=True, exist_ok=True)
+
+    result = {
+        "status": "success",
+        "data": {
+            "report": None,
+            "violations": [],
+            "error": None
+        }
+    }
+
+    try:
+        async with async_playwright() as p:
+            wallets = await seed_wallets(p, args.api_url, args.wallets)
+            if not wallets:
+                raise RuntimeError(f"No wallets available from {args.api_url}")
+            browser = await p.chromium.launch(headless=True)
+            try:
+                per_context = await asyncio.gather(
+                    *[run_context(browser, args, index, wallets) for index in range(args.contexts)]
+                )
+            finally:
+                await browser.close()
+    except Exception as e:
+        result["status"] = "error"
+        result["data"]["error"] = f"Run error: {str(e)}"
+        return result
+
+    records = [record for context_records in per_context for record in context_records]
+    summary = summarize(records)
+    budgets = json.loads(Path(args.budgets).read_text()) if args.budgets else {}
+    budget_results = check_budgets(summary, budgets)
+    report = {
+        "meta": {
+            "timestamp": timestamp,
+            "url": args.url,
+            "api_url": args.api_url,
+            "contexts": args.contexts,
+            "iterations": args.iterations,
+            "flows": args.flows,
+            "wallets": len(wallets),
+            "profiled": bool(args.profile_token),
+        },
+        **summary,
+        "budgets": budget_results,
+        "pages": records,
+    }
+    report_path = run_dir / "perf_report.json"
+    report_path.write_text(json.dumps(report, indent=2))
+
+    result["data"]["report"] = str(report_path)
+    result["data"]["violations"] = [budget for budget in budget_results if not budget["ok"]]
+    if result["data"]["violations"]:
+        result["status"] = "failed"
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Frontend performance run with budgets")
+    parser.add_argument("--url", default="http://localhost:3000", help="Frontend URL")
+    parser.add_argument("--api-url", default="http://localhost:8001/api", help="Backend API URL, for seeding wallets")
+    parser.add_argument("--api-prefix", default="/api/", help="Requests whose URL contains this are recorded")
+    parser.add_argument("--flows", nargs="*", choices=sorted(FLOWS), default=["wallet_load", "wallet_switch", "chat"])
+    parser.add_argument("--contexts", type=int, default=4, help="Browser contexts running the flows in parallel")
+    parser.add_argument("--iterations", type=int, default=3, help="Runs of every flow per context")
+    parser.add_argument("--wallets", type=int, default=5, help="Wallets to use, created if the backend has fewer")
+    parser.add_argument("--switches", type=int, default=4, help="Wallet switches per wallet_switch run")
+    parser.add_argument("--chat-messages", nargs="*", default=["Show my balance", "Explain what gas fees I should expect"])
+    parser.add_argument("--timeout-ms", type=float, default=30000)
+    parser.add_argument("--profile-token", help="Backend PROFILE_TOKEN, to record Server-Timing and profile ids (adds CORS preflights)")
+    parser.add_argument("--budgets", default=str(BUDGETS_PATH), help="Budgets file; pass an empty string to only report")
+
+    args = parser.parse_args()
+    args.url = args.url.rstrip("/")
+    args.api_url = args.api_url.rstrip("/")
+
+    result = asyncio.run(run_perf(args))
+
+    print(json.dumps(result))
+    if result["status"] != "success":
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+"""Self-contained load benchmark for the wallet API.
+
+Boots stub ETH/SOL/TRON/OpenAI upstreams, a local single-member mongod replica set (or the in-memory
+stand-in when no mongod binary is available) and server:app, then drives concurrent load on wallet
+creation, balances, transaction history, bundles and chat. Results are written as JSON so
+that runs from different commits can be compared.
+
+Run from the backend directory:
+
+    python -m benchmarks.load --concurrency 32 --requests 2000
+    python -m benchmarks.load --baseline benchmarks/results/load-abc1234.json
+    python -m benchmarks.load --mongo mongod --workers 4 --cache redis
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+import httpx
+
+from benchmarks import stubs
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def wait_until(check, timeout, what):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if check():
+                return
+        except Exception:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Timed out waiting for {what}")
+
+
+@contextmanager
+def stub_upstreams(rpc_latency_ms, llm_latency_ms):
+    port = free_port()
+    process = multiprocessing.Process(target=stubs.serve, args=(port, rpc_latency_ms, llm_latency_ms), daemon=True)
+    process.start()
+    try:
+        wait_until(lambda: socket.create_connection(("127.0.0.1", port), timeout=1).close() is None, 10, "stub server")
+        yield stubs.stub_environment(port)
+    finally:
+        process.terminate()
+        process.join()
+
+
+@contextmanager
+def cache_tier(mode, workers):
+    """Environment for the backend's cache backend, starting the Redis stand-in if needed"""
+    with tempfile.TemporaryDirectory(prefix="bench-cache-") as scratch:
+        env = {"CACHE_BACKEND": mode}
+        if workers > 1:
+            env["PROMETHEUS_MULTIPROC_DIR"] = scratch
+        if mode == "shm":
+            env["CACHE_SHM_PATH"] = os.path.join(scratch, "cache.sqlite3")
+        if mode != "redis":
+            yield env
+            return
+        port = free_port()
+        process = multiprocessing.Process(target=stubs.serve_redis, args=(port,), daemon=True)
+        process.start()
+        try:
+            wait_until(lambda: socket.create_connection(("127.0.0.1", port), timeout=1).close() is None, 10, "redis stub")
+            yield {**env, "CACHE_URL": f"redis://127.0.0.1:{port}/0"}
+        finally:
+            process.terminate()
+            process.join()
+
+
+@contextmanager
+def local_mongo(mode):
+    """Yield (MONGO_URL, BENCH_MONGO) for a throwaway mongod, or the in-memory stand-in"""
+    mongod = shutil.which("mongod")
+    if mode == "memory" or (mode == "auto" and not mongod):
+        yield "mongodb://127.0.0.1:1", "memory"
+        return
+    if not mongod:
+        raise RuntimeError("mongod not found on PATH")
+
+    # A single-member replica set, so read preferences, causal sessions and transactions are
+    # exercised the way they run in production rather than against a standalone server
+    port = free_port()
+    with tempfile.TemporaryDirectory(prefix="bench-mongo-") as dbpath:
+        process = subprocess.Popen(
+            [mongod, "--dbpath", dbpath, "--port", str(port), "--bind_ip", "127.0.0.1", "--replSet", "bench", "--quiet"],
+            stdout=subprocess.DEVNULL,
+        )
+        try:
+            from pymongo import MongoClient
+
+            direct = MongoClient(f"mongodb://127.0.0.1:{port}", directConnection=True, serverSelectionTimeoutMS=500)
+            wait_until(lambda: direct.admin.command("ping"), 30, "mongod")
+            direct.admin.command("replSetInitiate", {"_id": "bench", "members": [{"_id": 0, "host": f"127.0.0.1:{port}"}]})
+            wait_until(lambda: direct.admin.command("hello")["isWritablePrimary"], 30, "replica set primary")
+            direct.close()
+            yield f"mongodb://127.0.0.1:{port}/?replicaSet=bench", "mongod"
+        finally:
+            process.terminate()
+            process.wait()
+
+
+@contextmanager
+def backend(env, workers=1):
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.serve", str(port), str(workers)],
+        cwd=BACKEND_DIR,
+        env={**os.environ, **env},
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        wait_until(lambda: httpx.get(f"{base_url}/api/health/ready").status_code == 200, 60, "backend")
+        yield base_url
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))]
+
+
+async def drive(http, name, make_request, total, concurrency):
+    """Issue `total` requests from `concurrency` workers and summarise latencies"""
+    latencies = []
+    errors = 0
+    issued = 0
+
+    async def worker():
+        nonlocal errors, issued
+        while issued < total:
+            issued += 1
+            method, url, body = make_request()
+            start = time.perf_counter()
+            try:
+                response = await http.request(method, url, json=body)
+                if response.status_code >= 400:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    duration = time.perf_counter() - started
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "duration_s": round(duration, 3),
+        "throughput_rps": round(len(latencies) / duration, 1),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 2),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+async def run_scenarios(base_url, args):
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=f"{base_url}/api", limits=limits, timeout=60) as http:
+        # Seed wallets and history so read scenarios hit populated collections
+        wallets = []
+        for index in range(args.wallets):
+            response = await http.post("/wallets", json={"name": f"bench-{index}", "chain_type": ["ETH", "SOL", "TRON"][index % 3]})
+            response.raise_for_status()
+            wallets.append(response.json())
+        eth_wallets = [wallet for wallet in wallets if wallet["chain_type"] == "ETH"]
+        for wallet in wallets:
+            for _ in range(args.history):
+                await http.post("/transactions", json={
+                    "wallet_id": wallet["wallet_id"], "to_address": "0x" + "22" * 20, "amount": "0.01", "token_symbol": wallet["chain_type"]
+                })
+
+        def wallet_id():
+            return random.choice(wallets)["wallet_id"]
+
+        scenarios = {
+            "create_wallet": lambda: ("POST", "/wallets", {"name": "load", "chain_type": random.choice(["ETH", "SOL", "TRON"])}),
+            "wallet_balance": lambda: ("GET", f"/wallets/{wallet_id()}/balance", None),
+            "transaction_history": lambda: ("GET", f"/transactions/{wallet_id()}", None),
+            "bundle": lambda: ("POST", "/transactions/bundle", {
+                "wallet_id": random.choice(eth_wallets)["wallet_id"],
+                "transactions": [{"to_address": "0x" + "33" * 20, "amount": "0.001"} for _ in range(args.bundle_size)],
+            }),
+            "chat": lambda: ("POST", "/ai/chat", {"message": "Explain what gas fees I should expect", "wallet_id": wallet_id()}),
+            "chat_local": lambda: ("POST", "/ai/chat", {"message": "What is my balance?", "wallet_id": wallet_id()}),
+        }
+        selected = args.scenarios or list(scenarios)
+        results = {}
+        for name in selected:
+            results[name] = await drive(http, name, scenarios[name], args.requests, args.concurrency)
+            print(f"{name:22} {results[name]['throughput_rps']:8.1f} req/s  p50 {results[name]['p50_ms']:8.2f} ms  "
+                  f"p95 {results[name]['p95_ms']:8.2f} ms  p99 {results[name]['p99_ms']:8.2f} ms  errors {results[name]['errors']}")
+        return results
+
+
+def compare(results, baseline_path, max_regression):
+    """Print deltas against an earlier run; returns False if any scenario regressed too far"""
+    baseline = json.loads(Path(baseline_path).read_text())["scenarios"]
+    ok = True
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        p95_change = (current["p95_ms"] - previous["p95_ms"]) / previous["p95_ms"] * 100 if previous["p95_ms"] else 0.0
+        rps_change = (current["throughput_rps"] - previous["throughput_rps"]) / previous["throughput_rps"] * 100
+        regressed = p95_change > max_regression or -rps_change > max_regression
+        ok = ok and not regressed
+        print(f"{name:22} p95 {p95_change:+7.1f}%  throughput {rps_change:+7.1f}%{'  REGRESSION' if regressed else ''}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load benchmark for the wallet API")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=500, help="Requests per scenario")
+    parser.add_argument("--scenarios", nargs="*", help="Subset of scenarios to run")
+    parser.add_argument("--wallets", type=int, default=30, help="Wallets seeded before the run")
+    parser.add_argument("--history", type=int, default=20, help="Transactions seeded per wallet")
+    parser.add_argument("--bundle-size", type=int, default=10)
+    parser.add_argument("--rpc-latency-ms", type=float, default=20.0)
+    parser.add_argument("--llm-latency-ms", type=float, default=300.0)
+    parser.add_argument("--mongo", choices=["auto", "mongod", "memory"], default="auto")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes (needs --mongo mongod when > 1)")
+    parser.add_argument("--cache", choices=["memory", "shm", "redis"], default="memory", help="Backend cache tier")
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/load-<git sha>.json)")
+    parser.add_argument("--baseline", help="Earlier results file to compare against")
+    parser.add_argument("--max-regression", type=float, default=20.0, help="Allowed p95/throughput regression in percent")
+    args = parser.parse_args()
+
+    with stub_upstreams(args.rpc_latency_ms, args.llm_latency_ms) as stub_env, local_mongo(args.mongo) as (mongo_url, mongo_mode), \
+            cache_tier(args.cache, args.workers) as cache_env:
+        env = {**stub_env, **cache_env, "MONGO_URL": mongo_url, "DB_NAME": "benchmark", "BENCH_MONGO": mongo_mode}
+        with backend(env, args.workers) as base_url:
+            results = asyncio.run(run_scenarios(base_url, args))
+
+    revision = git_revision()
+    report = {
+        "meta": {
+            "git_revision": revision,
+            "timestamp": datetime.utcnow().isoformat(),
+            "mongo": mongo_mode,
+            "workers": args.workers,
+            "cache": args.cache,
+            "concurrency": args.concurrency,
+            "requests_per_scenario": args.requests,
+            "rpc_latency_ms": args.rpc_latency_ms,
+            "llm_latency_ms": args.llm_latency_ms,
+        },
+        "scenarios": results,
+    }
+    output = Path(args.output) if args.output else RESULTS_DIR / f"load-{revision}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(f"Results written to {output}")
+
+    if args.baseline and not compare(results, args.baseline, args.max_regression):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
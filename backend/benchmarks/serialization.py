@@ -0,0 +1,141 @@
+"""Serialization benchmark: default pydantic/FastAPI response path vs the orjson fast path.
+
+Run from the backend directory:
+
+    python -m benchmarks.serialization --docs 1000 --rounds 20 --output serialization.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")  # The client connects lazily, nothing is contacted
+
+import server  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+from fastapi.routing import APIRoute, serialize_response  # noqa: E402
+
+
+def wallet_doc(index):
+    return {
+        "wallet_id": str(uuid.uuid4()),
+        "name": f"Wallet {index}",
+        "chain_type": "ETH",
+        "address": "0x" + uuid.uuid4().hex + uuid.uuid4().hex[:8],
+        "public_key": "0x" + uuid.uuid4().hex,
+        "created_at": datetime.utcnow(),
+        "encrypted_mnemonic": None,
+        "tokens": [
+            {"token_address": "0xdac17f958d2ee523a2206206994597c13d831ec7", "symbol": "USDT", "decimals": 6,
+             "balance": "100.5", "name": "Tether", "logo_url": None},
+            {"token_address": "0xa0b86991c6218b36c1d19d4a2e9eb0ce3606eb48", "symbol": "USDC", "decimals": 6,
+             "balance": "250.75", "name": "USD Coin", "logo_url": None},
+        ],
+        "sponsor_address": None,
+        "version": 0,
+    }
+
+
+def transaction_doc(index):
+    return server.Transaction(
+        wallet_id="bench",
+        from_address="0x" + "11" * 20,
+        to_address="0x" + "22" * 20,
+        amount=str(index),
+        token_symbol="ETH",
+        tx_hash=f"demo_tx_{uuid.uuid4().hex}",
+        status="confirmed",
+        gas_price="21.50 Gwei",
+    ).model_dump()
+
+
+def chat_doc(messages):
+    return {
+        "chat_id": str(uuid.uuid4()),
+        "messages": [
+            {"role": "user" if index % 2 == 0 else "assistant", "content": f"Message number {index} " * 8}
+            for index in range(messages)
+        ],
+        "timestamp": datetime.utcnow(),
+    }
+
+
+def response_field(path):
+    for route in server.app.routes:
+        if isinstance(route, APIRoute) and route.path == path and "GET" in route.methods:
+            return route.response_field
+    raise LookupError(path)
+
+
+async def default_path(model, docs, field):
+    """What the endpoints did before: build models, then FastAPI validates and serializes them again"""
+    content = [model(**doc) for doc in docs] if isinstance(docs, list) else model(**docs)
+    content = await serialize_response(field=field, response_content=content)
+    return JSONResponse(content).body
+
+
+async def fast_path(model, docs, field):
+    previous = server.fast_serialization
+    server.fast_serialization = True
+    try:
+        return server.trusted_response(model, docs).body
+    finally:
+        server.fast_serialization = previous
+
+
+async def measure(fn, model, docs, field, rounds):
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        await fn(model, docs, field)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+async def run(doc_count, rounds):
+    cases = {
+        "GET /api/wallets": (server.Wallet, [wallet_doc(i) for i in range(doc_count)], "/api/wallets"),
+        "GET /api/transactions/{wallet_id}": (server.Transaction, [transaction_doc(i) for i in range(doc_count)], "/api/transactions/{wallet_id}"),
+        "GET /api/ai/chat/{chat_id}": (server.AIChat, chat_doc(doc_count), "/api/ai/chat/{chat_id}"),
+    }
+    results = {}
+    for name, (model, docs, path) in cases.items():
+        field = response_field(path)
+        # Both paths must produce the same payload
+        assert json.loads(await default_path(model, docs, field)) == json.loads(await fast_path(model, docs, field))
+        default_seconds = await measure(default_path, model, docs, field, rounds)
+        fast_seconds = await measure(fast_path, model, docs, field, rounds)
+        results[name] = {
+            "documents": doc_count,
+            "default_ms": round(default_seconds * 1000, 3),
+            "fast_ms": round(fast_seconds * 1000, 3),
+            "default_docs_per_s": round(doc_count / default_seconds),
+            "fast_docs_per_s": round(doc_count / fast_seconds),
+            "speedup": round(default_seconds / fast_seconds, 2),
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark response serialization paths")
+    parser.add_argument("--docs", type=int, default=1000, help="Documents per response")
+    parser.add_argument("--rounds", type=int, default=20, help="Timed rounds per path (median is reported)")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.docs, args.rounds))
+    for name, result in results.items():
+        print(f"{name:40} default {result['default_ms']:9.2f} ms  fast {result['fast_ms']:9.2f} ms  x{result['speedup']}")
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""Launch server:app for the benchmark suite.
+
+With BENCH_MONGO=memory the Motor client is swapped for mongomock-motor, an in-process
+stand-in for environments where no mongod binary is available. An optional second
+argument runs that many uvicorn worker processes; that needs a real mongod, since every
+worker would otherwise get its own in-memory database.
+
+    python -m benchmarks.serve 8011
+    python -m benchmarks.serve 8011 4
+"""
+import logging
+import os
+import sys
+from pathlib import Path
+
+import uvicorn
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import server  # noqa: E402
+
+
+def worker_app():
+    """App factory run inside each uvicorn worker process"""
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    return server.app
+
+
+def main():
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8011
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    if workers > 1:
+        if os.environ.get("BENCH_MONGO") == "memory":
+            sys.exit("Multiple workers need a real mongod (BENCH_MONGO=mongod)")
+        uvicorn.run(
+            "benchmarks.serve:worker_app", factory=True, host="127.0.0.1", port=port, workers=workers, log_level="warning"
+        )
+        return
+    if os.environ.get("BENCH_MONGO") == "memory":
+        import mongomock_motor
+
+        server.client = mongomock_motor.AsyncMongoMockClient()
+        server.db = server.client[os.environ.get("DB_NAME", "benchmark")]
+        # There are no replicas to route reads to, and mongomock's with_options isn't Motor-wrapped
+        server.read_dbs = {query_class: server.db for query_class in server.read_preference_names}
+    # Per-request upstream logging would dominate the measurements
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    uvicorn.run(server.app, host="127.0.0.1", port=port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
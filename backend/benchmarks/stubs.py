@@ -0,0 +1,281 @@
+"""Stub upstream servers for the benchmark suite.
+
+One threaded HTTP server answers, by path prefix:
+
+    /eth                      Ethereum JSON-RPC (single and batch requests)
+    /sol                      Solana JSON-RPC
+    /tron/wallet/...          TronGrid / FullNode HTTP API
+    /openai/v1/chat/...       OpenAI chat completions
+
+Responses are canned but shaped like the real services, with a configurable delay so
+that the backend's own overhead can be told apart from upstream latency.
+
+A second, asyncio-based server speaks enough of the Redis protocol (RESP) for the
+backend's CACHE_BACKEND=redis mode, so that it can be exercised without a Redis install.
+
+    python -m benchmarks.stubs --port 9545 --rpc-latency-ms 20 --llm-latency-ms 300
+    python -m benchmarks.stubs --redis-port 6390
+"""
+import argparse
+import asyncio
+import hashlib
+import itertools
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_block_numbers = itertools.count(19_000_000)
+_slots = itertools.count(250_000_000)
+
+
+def eth_result(method, params):
+    if method == "eth_chainId":
+        return "0x1"
+    if method == "eth_blockNumber":
+        return hex(next(_block_numbers))
+    if method == "eth_getBalance":
+        return hex(3 * 10 ** 18)
+    if method == "eth_getTransactionCount":
+        return "0x0"
+    if method == "eth_gasPrice":
+        return hex(20 * 10 ** 9)
+    if method == "eth_feeHistory":
+        block_count = int(params[0], 16) if isinstance(params[0], str) else params[0]
+        newest = next(_block_numbers)
+        percentiles = params[2] if len(params) > 2 else []
+        return {
+            "oldestBlock": hex(newest - block_count + 1),
+            "baseFeePerGas": [hex(18 * 10 ** 9)] * (block_count + 1),
+            "gasUsedRatio": [0.5] * block_count,
+            "reward": [[hex((index + 1) * 10 ** 9) for index, _ in enumerate(percentiles)]] * block_count,
+        }
+    if method == "eth_sendRawTransaction":
+        return "0x" + hashlib.sha256(params[0].encode()).hexdigest()
+    if method == "eth_getBlockByNumber":
+        number = params[0] if params[0] != "latest" else hex(next(_block_numbers))
+        return {"number": number, "hash": "0x" + hashlib.sha256(number.encode()).hexdigest(), "transactions": []}
+    if method in ("eth_getBlockReceipts", "eth_getLogs"):
+        return []
+    if method == "eth_call":
+        return "0x" + hex(10 ** 6)[2:].rjust(64, "0")
+    raise KeyError(method)
+
+
+def sol_result(method, params):
+    if method == "getBalance":
+        return {"context": {"slot": next(_slots)}, "value": 5 * 10 ** 9}
+    if method == "getSlot":
+        return next(_slots)
+    if method == "getHealth":
+        return "ok"
+    if method == "getRecentPrioritizationFees":
+        slot = next(_slots)
+        return [{"slot": slot - offset, "prioritizationFee": 1000 * (offset % 5)} for offset in range(150)]
+    if method == "getBlock":
+        return {"blockhash": hashlib.sha256(str(params[0]).encode()).hexdigest(), "transactions": []}
+    if method == "getTokenAccountsByOwner":
+        return {"context": {"slot": next(_slots)}, "value": []}
+    raise KeyError(method)
+
+
+def json_rpc_response(handler, request):
+    try:
+        return {"jsonrpc": "2.0", "id": request.get("id"), "result": handler(request["method"], request.get("params") or [])}
+    except KeyError:
+        return {"jsonrpc": "2.0", "id": request.get("id"), "error": {"code": -32601, "message": "Method not found"}}
+
+
+def tron_response(path, body):
+    if path.endswith("/wallet/getaccount"):
+        return {"address": body.get("address"), "balance": 12_345_678}
+    if path.endswith("/wallet/triggerconstantcontract"):
+        return {"result": {"result": True}, "constant_result": [hex(25 * 10 ** 6)[2:].rjust(64, "0")]}
+    if path.endswith("/wallet/getnowblock"):
+        return {"block_header": {"raw_data": {"number": next(_block_numbers)}}, "transactions": []}
+    return None
+
+
+def chat_completion(body):
+    prompt = " ".join(message.get("content", "") for message in body.get("messages", []))
+    reply = "Here is your wallet summary. CHECK_BALANCE"
+    return {
+        "id": "chatcmpl-stub",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "gpt-3.5-turbo"),
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": reply}, "finish_reason": "stop"}],
+        "usage": {
+            "prompt_tokens": len(prompt.split()),
+            "completion_tokens": len(reply.split()),
+            "total_tokens": len(prompt.split()) + len(reply.split()),
+        },
+    }
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"null")
+
+        if self.path.startswith("/eth") or self.path.startswith("/sol"):
+            handler = eth_result if self.path.startswith("/eth") else sol_result
+            time.sleep(self.server.rpc_latency)
+            if isinstance(body, list):
+                payload = [json_rpc_response(handler, request) for request in body]
+            else:
+                payload = json_rpc_response(handler, body)
+        elif self.path.startswith("/tron/"):
+            time.sleep(self.server.rpc_latency)
+            payload = tron_response(self.path, body or {})
+        elif self.path.startswith("/openai/") and self.path.endswith("/chat/completions"):
+            time.sleep(self.server.llm_latency)
+            payload = chat_completion(body or {})
+        else:
+            payload = None
+
+        if payload is None:
+            self.send_error(404)
+            return
+        data = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port, rpc_latency_ms=0.0, llm_latency_ms=0.0):
+    server = ThreadingHTTPServer(("127.0.0.1", port), StubHandler)
+    server.daemon_threads = True
+    server.rpc_latency = rpc_latency_ms / 1000
+    server.llm_latency = llm_latency_ms / 1000
+    server.serve_forever()
+
+
+class RedisStub:
+    """In-memory key/value store answering PING, GET, SET [EX|PX] [NX|XX], DEL, EXISTS and FLUSHDB"""
+
+    def __init__(self):
+        self.values = {}
+        self.expiry = {}
+
+    def _alive(self, key):
+        expires_at = self.expiry.get(key)
+        if expires_at is not None and expires_at <= time.monotonic():
+            self.values.pop(key, None)
+            self.expiry.pop(key, None)
+        return key in self.values
+
+    def execute(self, command, args):
+        if command == "PING":
+            return "+PONG"
+        if command in ("CLIENT", "SELECT"):
+            return "+OK"
+        if command == "GET":
+            return self.values[args[0]] if self._alive(args[0]) else None
+        if command == "SET":
+            key, value, options = args[0], args[1], [arg.decode().upper() for arg in args[2:]]
+            exists = self._alive(key)
+            if ("NX" in options and exists) or ("XX" in options and not exists):
+                return None
+            self.values[key] = value
+            self.expiry.pop(key, None)
+            for unit, scale in (("EX", 1.0), ("PX", 0.001)):
+                if unit in options:
+                    self.expiry[key] = time.monotonic() + int(options[options.index(unit) + 1]) * scale
+            return "+OK"
+        if command in ("DEL", "EXISTS"):
+            present = [key for key in args if self._alive(key)]
+            if command == "DEL":
+                for key in present:
+                    self.values.pop(key, None)
+                    self.expiry.pop(key, None)
+            return len(present)
+        if command in ("FLUSHDB", "FLUSHALL"):
+            self.values.clear()
+            self.expiry.clear()
+            return "+OK"
+        return f"-ERR unknown command '{command}'"
+
+
+def encode_resp(value):
+    if value is None:
+        return b"$-1\r\n"
+    if isinstance(value, int):
+        return b":%d\r\n" % value
+    if isinstance(value, str):
+        return value.encode() + b"\r\n"
+    return b"$%d\r\n%s\r\n" % (len(value), value)
+
+
+async def read_resp_command(reader):
+    header = await reader.readline()
+    if not header:
+        return None
+    if not header.startswith(b"*"):
+        return header.decode().split()
+    args = []
+    for _ in range(int(header[1:])):
+        length = int((await reader.readline())[1:])
+        args.append((await reader.readexactly(length + 2))[:-2])
+    return args
+
+
+async def serve_redis_async(port):
+    store = RedisStub()
+
+    async def handle(reader, writer):
+        try:
+            while True:
+                command = await read_resp_command(reader)
+                if not command:
+                    break
+                name = command[0].decode().upper() if isinstance(command[0], bytes) else command[0].upper()
+                writer.write(encode_resp(store.execute(name, command[1:])))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", port)
+    async with server:
+        await server.serve_forever()
+
+
+def serve_redis(port):
+    asyncio.run(serve_redis_async(port))
+
+
+def stub_environment(port):
+    """Environment variables pointing the backend at a stub server on this port"""
+    base_url = f"http://127.0.0.1:{port}"
+    return {
+        "ETH_RPC_URL": f"{base_url}/eth",
+        "SOL_RPC_URL": f"{base_url}/sol",
+        "TRON_RPC_URL": f"{base_url}/tron",
+        "OPENAI_BASE_URL": f"{base_url}/openai/v1",
+        "OPENAI_API_KEY": "sk-stub",
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run stub JSON-RPC, TRON and OpenAI servers")
+    parser.add_argument("--port", type=int, default=9545)
+    parser.add_argument("--rpc-latency-ms", type=float, default=0.0)
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0)
+    parser.add_argument("--redis-port", type=int, help="Serve the Redis protocol stand-in on this port instead")
+    args = parser.parse_args()
+    if args.redis_port:
+        serve_redis(args.redis_port)
+    else:
+        serve(args.port, args.rpc_latency_ms, args.llm_latency_ms)
+
+
+if __name__ == "__main__":
+    main()
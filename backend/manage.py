@@ -0,0 +1,80 @@
+"""Maintenance commands for the wallet backend.
+
+Run from the backend directory with the same environment as the server:
+
+    python manage.py backfill-daily-stats
+    python manage.py backfill-daily-stats --wallet-id <id> --since 2024-01-01
+    python manage.py migrate-amounts
+    python manage.py normalize-addresses
+    python manage.py purge-simulations
+    python manage.py seal-mnemonics
+"""
+import argparse
+import asyncio
+from datetime import datetime
+
+import server
+
+
+async def backfill_daily_stats(args):
+    since = datetime.strptime(args.since, "%Y-%m-%d") if args.since else None
+    count = await server.backfill_daily_stats(wallet_id=args.wallet_id, since=since)
+    print(f"Rebuilt {count} daily stats documents")
+
+
+async def migrate_amounts(args):
+    result = await server.migrate_transaction_amounts(batch_size=args.batch_size)
+    print(f"Migrated {result['migrated']} transactions, {result['invalid']} with unparseable amounts")
+
+
+async def normalize_addresses(args):
+    counts = await server.normalize_stored_addresses(batch_size=args.batch_size)
+    print(f"Normalized {counts['wallets']} wallets and {counts['transactions']} transactions")
+
+
+async def purge_simulations(args):
+    count = await server.purge_history_simulations()
+    print(f"Removed {count} simulations from the transaction history")
+
+
+async def seal_mnemonics(args):
+    counts = await server.seal_stored_mnemonics(batch_size=args.batch_size)
+    print(f"Encrypted {counts['sealed']} plaintext mnemonics, re-wrapped {counts['rewrapped']} under the current master key")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Wallet backend maintenance commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    backfill = commands.add_parser("backfill-daily-stats", help="Rebuild wallet_daily_stats from the transactions collection")
+    backfill.add_argument("--wallet-id", help="Only rebuild this wallet's rollups")
+    backfill.add_argument("--since", help="Only rebuild days from this UTC date (YYYY-MM-DD) onwards")
+    backfill.set_defaults(handler=backfill_daily_stats)
+
+    amounts = commands.add_parser("migrate-amounts", help="Store base-unit amounts on transactions created before they existed")
+    amounts.add_argument("--batch-size", type=int, default=1000)
+    amounts.set_defaults(handler=migrate_amounts)
+
+    addresses = commands.add_parser("normalize-addresses", help="Rewrite stored EVM addresses in checksum form")
+    addresses.add_argument("--batch-size", type=int, default=1000)
+    addresses.set_defaults(handler=normalize_addresses)
+
+    simulations = commands.add_parser("purge-simulations", help="Drop simulations stored in the transaction history by older versions")
+    simulations.set_defaults(handler=purge_simulations)
+
+    mnemonics = commands.add_parser(
+        "seal-mnemonics", help="Envelope-encrypt stored mnemonics under WALLET_MASTER_KEY, re-wrapping older envelopes"
+    )
+    mnemonics.add_argument("--batch-size", type=int, default=1000)
+    mnemonics.set_defaults(handler=seal_mnemonics)
+
+    args = parser.parse_args()
+    server.init_clients()
+    try:
+        asyncio.run(args.handler(args))
+    finally:
+        server.client.close()
+
+
+if __name__ == "__main__":
+    main()
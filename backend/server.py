@@ -1,58 +1,620 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, Body
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Body, Query, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse, PlainTextResponse, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument, UpdateOne
+from bson import Decimal128, ObjectId
+from pymongo import monitoring
+from pymongo.errors import BulkWriteError, ConfigurationError
+import orjson
+from prometheus_client import Counter, Gauge, Histogram, CONTENT_TYPE_LATEST, generate_latest
+from starlette.responses import Response
 import os
+import re
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any, Union
 import uuid
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 import json
+import asyncio
+import csv
+import io
+import gzip
+import time
+from collections import OrderedDict, deque
+import importlib
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager, contextmanager, nullcontext
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal, InvalidOperation, ROUND_CEILING, ROUND_FLOOR, localcontext
+
+import httpx
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 
 # Blockchain related imports
-from web3 import Web3
-from eth_account import Account
+# web3/eth_account/eth_keys/mnemonic and openai are imported lazily (see "Lazily loaded subsystems")
 import base58
-from mnemonic import Mnemonic
 import secrets
 import hashlib
-
-# For Solana
-from solana.rpc.api import Client as SolanaClient
-
-# AI related imports
-import openai
+import base64
+import binascii
+import email.utils
+import math
+import random
+import sys
+import threading
+import contextvars
+import weakref
+import atexit
+import copy
+import queue
+from logging.handlers import QueueHandler, QueueListener
 
 # Setup basic app configuration
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
+# Metrics
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template", ["method", "route", "status"]
+)
+RPC_REQUESTS = Counter("rpc_requests_total", "Chain RPC calls by outcome", ["chain", "method", "outcome"])
+RPC_DURATION = Histogram("rpc_request_duration_seconds", "Chain RPC call latency", ["chain", "method"])
+LLM_DURATION = Histogram(
+    "llm_request_duration_seconds", "OpenAI request latency", ["model", "outcome"],
+    buckets=(0.25, 0.5, 1, 2, 4, 8, 16, 32, 64)
+)
+LLM_TOKENS = Counter("llm_tokens_total", "OpenAI token usage", ["model", "kind"])
+LLM_RETRIES = Counter("llm_retries_total", "OpenAI calls retried after a rate limit or transient error", ["model", "reason"])
+AI_INTENTS = Counter(
+    "ai_intents_total", "AI chat messages by routed intent",
+    ["intent", "source"]  # source: rule or model when answered locally, llm otherwise
+)
+AI_ADMISSIONS = Counter(
+    "ai_admissions_total", "AI chat admission decisions",
+    ["outcome"]  # admitted, rejected_client, rejected_full, timeout
+)
+AI_QUEUE_DEPTH = Gauge("ai_queue_depth", "AI chat requests waiting for an LLM slot", multiprocess_mode="livesum")
+AI_ACTIVE = Gauge("ai_active_requests", "AI chat requests holding an LLM slot", multiprocess_mode="livesum")
+AI_QUEUE_WAIT = Histogram(
+    "ai_queue_wait_seconds", "Time AI chat requests waited for an LLM slot", ["priority"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 16, 32)
+)
+DEPOSITS_DETECTED = Counter("deposits_detected_total", "Incoming transfers recorded by the ingestor", ["chain"])
+INGEST_HEAD_LAG = Gauge(
+    "ingest_head_lag_blocks", "Blocks (ETH) or slots (SOL) between the chain head and the ingestor",
+    ["chain"], multiprocess_mode="max"
+)
+SIGNING_KEY_LOOKUPS = Counter(
+    "signing_key_lookups_total", "Signing key lookups",
+    ["outcome"]  # hit: served from the decrypted key cache, miss: decrypted and derived
+)
+LOG_RECORDS_DROPPED = Counter(
+    "log_records_dropped_total", "Log records not written",
+    ["reason"]  # sampled: repeated warning/error over its burst, queue_full: the writer fell behind
+)
+MONGO_COMMAND_DURATION = Histogram(
+    "mongo_command_duration_seconds", "MongoDB command latency", ["command", "outcome"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+)
+
+@contextmanager
+def observe_rpc(chain: str, method: str):
+    """Time a chain RPC call and count it as ok or error"""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        RPC_REQUESTS.labels(chain, method, "error").inc()
+        raise
+    else:
+        RPC_REQUESTS.labels(chain, method, "ok").inc()
+    finally:
+        elapsed = time.perf_counter() - start
+        RPC_DURATION.labels(chain, method).observe(elapsed)
+        record_span("rpc", elapsed)
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Records the duration of every command the Motor client sends"""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        MONGO_COMMAND_DURATION.labels(event.command_name, "ok").observe(event.duration_micros / 1_000_000)
+        record_span("mongo", event.duration_micros / 1_000_000)
+
+    def failed(self, event):
+        MONGO_COMMAND_DURATION.labels(event.command_name, "error").observe(event.duration_micros / 1_000_000)
+        record_span("mongo", event.duration_micros / 1_000_000)
+
+# Request profiling
+# Every request carries a RequestProfile in a context variable, which the Mongo listener, RPC,
+# LLM and rendering code add span timings to (Motor copies the context into its executor
+# threads, so Mongo time is attributed to the right request). Requests that are profiled, on
+# demand with the profile token or by sampling, are also sampled by a background thread that
+# walks the request task's await chain: a wall-clock profile showing where the request was
+# running or waiting, not just where it burned CPU.
+current_profile: contextvars.ContextVar[Optional["RequestProfile"]] = contextvars.ContextVar("current_profile", default=None)
+
+def record_span(name: str, seconds: float):
+    profile = current_profile.get()
+    if profile is not None:
+        profile.add_span(name, seconds)
+
+@contextmanager
+def profile_span(name: str):
+    """Attribute the time spent in this block to a span of the current request"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(name, time.perf_counter() - start)
+
+class RequestProfile:
+    def __init__(self, request_id: str, method: str, path: str, task: Optional[asyncio.Task], root_code, loop_thread: int):
+        self.profile_id = str(uuid.uuid4())
+        self.request_id = request_id
+        self.method = method
+        self.path = path
+        self.task = task
+        self.root_code = root_code  # Stacks are recorded from this frame down
+        self.loop_thread = loop_thread
+        self.spans: Dict[str, List[float]] = {}  # name -> [seconds, count]
+        self.samples: Dict[str, int] = {}  # Folded stack -> sample count
+        self.sampled = False
+        self.tasks: weakref.WeakSet = weakref.WeakSet()  # Child tasks, tracked while sampled
+        self.lock = threading.Lock()
+
+    def add_span(self, name: str, seconds: float):
+        with self.lock:
+            span = self.spans.setdefault(name, [0.0, 0])
+            span[0] += seconds
+            span[1] += 1
+
+    def add_task(self, task: asyncio.Task):
+        with self.lock:
+            self.tasks.add(task)
+
+    def sample(self):
+        """Record the current stacks of the request task and its child tasks; called from the sampler thread"""
+        with self.lock:
+            children = [task for task in self.tasks if not task.done()]
+        stacks = [task_stack(self.task, self.loop_thread, self.root_code)]
+        # Concurrent children are sampled alongside the parent waiting on them, under a [task] frame
+        stacks += [["[task]"] + stack for stack in (task_stack(task, self.loop_thread) for task in children) if stack]
+        with self.lock:
+            for stack in stacks:
+                if stack:
+                    folded = ";".join(stack)
+                    self.samples[folded] = self.samples.get(folded, 0) + 1
+
+    def span_summary(self) -> Dict[str, Dict[str, float]]:
+        with self.lock:
+            return {name: {"ms": round(seconds * 1000, 2), "count": count} for name, (seconds, count) in self.spans.items()}
+
+def task_stack(task: asyncio.Task, loop_thread: int, root_code=None) -> Optional[List[str]]:
+    """A task's await chain as frame labels, outermost first, starting at root_code if given"""
+    frames = []
+    waiting = False
+    awaitable = task.get_coro()
+    while awaitable is not None:
+        frame = getattr(awaitable, "cr_frame", None) or getattr(awaitable, "gi_frame", None)
+        if frame is None:
+            # Suspended on a future (I/O, a sleep, child tasks): the last frame says where
+            waiting = True
+            break
+        frames.append(frame)
+        awaitable = getattr(awaitable, "cr_await", None) or getattr(awaitable, "gi_yieldfrom", None)
+    if not waiting and frames:
+        # A coroutine that isn't suspended is running: take the loop thread's frames above it
+        running = []
+        frame = sys._current_frames().get(loop_thread)
+        while frame is not None and frame is not frames[-1]:
+            running.append(frame)
+            frame = frame.f_back
+        if frame is not None:
+            frames.extend(reversed(running))
+    
+    if root_code is not None:
+        codes = [frame.f_code for frame in frames]
+        if root_code not in codes:
+            return None
+        frames = frames[codes.index(root_code):]
+    stack = [frame_label(frame) for frame in frames]
+    if stack and waiting:
+        stack.append("[waiting]")
+    return stack
+
+def profiling_task_factory(loop, coro, **kwargs):
+    """Task factory recording tasks created by a stack-sampled request as its children"""
+    task = asyncio.Task(coro, loop=loop, **kwargs)
+    profile = current_profile.get()
+    if profile is not None and profile.sampled:
+        profile.add_task(task)
+    return task
+
+def frame_label(frame) -> str:
+    return f"{frame.f_code.co_name} ({os.path.basename(frame.f_code.co_filename)}:{frame.f_lineno})"
+
+class StackSampler:
+    """One daemon thread sampling every profiled request at a fixed interval"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.profiles: Dict[str, RequestProfile] = {}
+        self.lock = threading.Lock()
+        self.thread: Optional[threading.Thread] = None
+
+    def add(self, profile: RequestProfile):
+        with self.lock:
+            self.profiles[profile.profile_id] = profile
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+                self.thread.start()
+
+    def remove(self, profile: RequestProfile):
+        with self.lock:
+            self.profiles.pop(profile.profile_id, None)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            with self.lock:
+                profiles = list(self.profiles.values())
+                if not profiles:
+                    self.thread = None
+                    return
+            for profile in profiles:
+                try:
+                    profile.sample()
+                except Exception:
+                    pass  # The loop moved on while the stack was being walked; skip this sample
+
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ.get('DB_NAME', 'wallet_agent_db')]
+db_name = os.environ.get('DB_NAME', 'wallet_agent_db')
+# Created per worker process by init_clients() in lifespan, never at import
+client: Optional[AsyncIOMotorClient] = None
+db = None
+read_dbs: Optional[Dict[str, Any]] = None  # Query class -> db handle with that class's read preference
+mongo_supports_transactions = False  # Detected at startup: requires a replica set or sharded cluster
+
+# Read preferences per query class: history, listing and export reads may be served by secondaries
+# no more than MONGO_MAX_STALENESS_SECONDS behind; everything else, and anything that must see
+# the caller's own writes, reads from the primary
+mongo_max_staleness = int(os.environ.get('MONGO_MAX_STALENESS_SECONDS', '90'))  # MongoDB's minimum is 90
+read_preference_names = {
+    "history": os.environ.get('MONGO_HISTORY_READ_PREFERENCE', 'secondaryPreferred'),  # Transactions, activity, analytics
+    "listing": os.environ.get('MONGO_LISTING_READ_PREFERENCE', 'secondaryPreferred'),  # Wallet list
+    "export": os.environ.get('MONGO_EXPORT_READ_PREFERENCE', 'secondaryPreferred'),
+}
 
 # Initialize blockchain connections
 # Ethereum - Use Infura for mainnet, or public testnet endpoints
 eth_rpc_url = os.environ.get('ETH_RPC_URL', 'https://mainnet.infura.io/v3/9aa3d95b3bc440fa88ea12eaa4456161')  # Default to public endpoint
-web3 = Web3(Web3.HTTPProvider(eth_rpc_url))
 
 # Solana - Use public RPC endpoints
 sol_rpc_url = os.environ.get('SOL_RPC_URL', 'https://api.mainnet-beta.solana.com')  # Default to mainnet
-solana_client = SolanaClient(sol_rpc_url)
 
 # TRON - Use public RPC endpoints
 tron_rpc_url = os.environ.get('TRON_RPC_URL', 'https://api.trongrid.io')  # Default to mainnet
+tron_api_key = os.environ.get('TRON_API_KEY')  # TronGrid API key, optional for a local FullNode
+tron_max_concurrency = int(os.environ.get('TRON_MAX_CONCURRENCY', '20'))  # In-flight requests per batch query
+
+# Chain RPC transport: every ETH/SOL/TRON call goes through one pooled HTTP client
+rpc_timeout = float(os.environ.get('RPC_TIMEOUT', '10'))
+rpc_max_connections = int(os.environ.get('RPC_MAX_CONNECTIONS', '100'))
+# Cassettes: "record" saves every exchange with its latency, "replay" serves them back offline
+rpc_cassette_mode = os.environ.get('RPC_CASSETTE_MODE', 'off')  # off, record or replay
+rpc_cassette_path = os.environ.get('RPC_CASSETTE_PATH', str(ROOT_DIR / 'rpc_cassette.jsonl.gz'))
+rpc_cassette_latency_scale = float(os.environ.get('RPC_CASSETTE_LATENCY_SCALE', '1.0'))  # 0 replays instantly
+
+# Fee oracle configuration
+fee_oracle_enabled = os.environ.get('FEE_ORACLE_ENABLED', 'true').lower() == 'true'
+fee_oracle_eth_interval = float(os.environ.get('FEE_ORACLE_ETH_INTERVAL', '12'))  # ~1 ETH block
+fee_oracle_sol_interval = float(os.environ.get('FEE_ORACLE_SOL_INTERVAL', '2'))  # getRecentPrioritizationFees covers 150 slots
+fee_oracle_eth_window = int(os.environ.get('FEE_ORACLE_ETH_WINDOW', '20'))  # blocks
+fee_oracle_sol_window = int(os.environ.get('FEE_ORACLE_SOL_WINDOW', '150'))  # slots
+
+# Deposit ingestion configuration
+ingestion_enabled = os.environ.get('INGESTION_ENABLED', 'false').lower() == 'true'
+ingest_eth_interval = float(os.environ.get('INGEST_ETH_INTERVAL', '6'))  # Half an ETH block
+ingest_sol_interval = float(os.environ.get('INGEST_SOL_INTERVAL', '2'))  # ~5 slots
+ingest_max_blocks = int(os.environ.get('INGEST_MAX_BLOCKS', '20'))  # Blocks/slots fetched per batch while catching up
+eth_ingest_confirmations = int(os.environ.get('ETH_INGEST_CONFIRMATIONS', '12'))  # Blocks on top before a deposit is ingested, so reorgs can't orphan it
+ingest_bloom_error_rate = float(os.environ.get('INGEST_BLOOM_ERROR_RATE', '0.001'))  # False positives cost one indexed query
+ingest_filter_rebuild_seconds = float(os.environ.get('INGEST_FILTER_REBUILD_SECONDS', '600'))  # Drops changed addresses
+
+# Transaction export configuration
+export_batch_size = int(os.environ.get('EXPORT_BATCH_SIZE', '5000'))  # Cursor batch, also the CSV chunk size
+export_row_group_size = int(os.environ.get('EXPORT_ROW_GROUP_SIZE', '100000'))  # Parquet rows buffered per row group
+
+# Simulations live in their own TTL collection, outside the transaction history
+simulation_ttl_seconds = int(os.environ.get('SIMULATION_TTL_SECONDS', '3600'))
+
+# HTTP caching of read endpoints (ETag validators plus a short shared-cache lifetime for the nginx micro-cache)
+http_cache_max_age = int(os.environ.get('HTTP_CACHE_MAX_AGE', '1'))  # Seconds; 0 makes every hit revalidate
+
+# Wallet overview: chain calls slower than this are reported as partial failures
+overview_chain_timeout = float(os.environ.get('OVERVIEW_CHAIN_TIMEOUT', '3'))
+
+# Bundle execution configuration
+eth_chain_id = int(os.environ.get('ETH_CHAIN_ID', '1'))
+bundle_signing_workers = int(os.environ.get('BUNDLE_SIGNING_WORKERS', str(min(32, (os.cpu_count() or 1) * 4))))
+broadcast_transactions = os.environ.get('BROADCAST_TRANSACTIONS', 'false').lower() == 'true'  # Demo mode records only
+
+# Signing keys: mnemonics are stored envelope-encrypted under the master key; derived keys are cached briefly
+wallet_master_key = os.environ.get('WALLET_MASTER_KEY')  # Base64 of 32 random bytes; unset stores mnemonics unencrypted (development only)
+wallet_master_key_id = os.environ.get('WALLET_MASTER_KEY_ID', 'v1')  # Recorded in every envelope
+wallet_previous_master_keys = os.environ.get('WALLET_PREVIOUS_MASTER_KEYS', '')  # "id:key,id:key", still accepted for decryption
+signing_key_cache_size = int(os.environ.get('SIGNING_KEY_CACHE_SIZE', '1024'))  # Wallets whose derived key is kept, 0 disables
+signing_key_cache_ttl = float(os.environ.get('SIGNING_KEY_CACHE_TTL', '300'))  # Seconds a derived key is kept
 
 # OpenAI configuration (if provided)
 openai_api_key = os.environ.get('OPENAI_API_KEY')
-if openai_api_key:
-    openai.api_key = openai_api_key
+ai_model = os.environ.get('OPENAI_MODEL', 'gpt-3.5-turbo')
+
+# Local intent fast path: simple wallet commands are answered without calling OpenAI
+local_intents_enabled = os.environ.get('LOCAL_INTENTS_ENABLED', 'true').lower() == 'true'
+local_intent_threshold = float(os.environ.get('LOCAL_INTENT_THRESHOLD', '0.9'))  # Model confidence needed to skip the LLM
+local_intent_max_words = int(os.environ.get('LOCAL_INTENT_MAX_WORDS', '12'))  # Longer messages always go to the LLM
+
+# AI admission control, per worker process: at most AI_MAX_CONCURRENCY LLM calls run at once,
+# the rest wait by priority and round-robin across clients until AI_QUEUE_TIMEOUT
+ai_max_concurrency = int(os.environ.get('AI_MAX_CONCURRENCY', '8'))
+ai_max_queue = int(os.environ.get('AI_MAX_QUEUE', '200'))  # Waiting requests beyond this get 503
+ai_max_queued_per_client = int(os.environ.get('AI_MAX_QUEUED_PER_CLIENT', '8'))  # Beyond this a client gets 429
+ai_queue_timeout = float(os.environ.get('AI_QUEUE_TIMEOUT', '15'))  # Seconds, then 503
+ai_retry_attempts = int(os.environ.get('AI_RETRY_ATTEMPTS', '3'))  # Retries of rate-limited or transient OpenAI errors
+ai_retry_base_delay = float(os.environ.get('AI_RETRY_BASE_DELAY', '0.5'))  # Seconds, doubled per attempt
+ai_retry_max_delay = float(os.environ.get('AI_RETRY_MAX_DELAY', '8'))
+
+# Shared cache tier: "memory" is per process, "shm" and "redis" are shared by all workers
+cache_backend = os.environ.get('CACHE_BACKEND', 'memory')  # memory, shm or redis
+cache_url = os.environ.get('CACHE_URL', 'redis://127.0.0.1:6379/0')  # Any Redis-protocol server
+cache_shm_path = os.environ.get('CACHE_SHM_PATH', '/dev/shm/wallet-agent-cache.sqlite3' if os.path.isdir('/dev/shm') else '/tmp/wallet-agent-cache.sqlite3')
+cache_max_entries = int(os.environ.get('CACHE_MAX_ENTRIES', '10000'))  # In-process backend only
+balance_cache_ttl = float(os.environ.get('BALANCE_CACHE_TTL', '10'))  # Seconds, roughly one ETH block
+token_cache_ttl = float(os.environ.get('TOKEN_CACHE_TTL', '30'))  # TRC-20 balance lists
+
+# Readiness probe configuration
+readiness_timeout = float(os.environ.get('READINESS_TIMEOUT', '2'))  # Per dependency check
+readiness_rpc_cache_seconds = float(os.environ.get('READINESS_RPC_CACHE_SECONDS', '10'))  # Don't hit nodes on every probe
+readiness_require_rpc = os.environ.get('READINESS_REQUIRE_RPC', 'false').lower() == 'true'  # Mongo is always required
+
+# Request profiling: on demand (X-Profile-Token header) or sampled; slow requests are kept
+profile_token = os.environ.get('PROFILE_TOKEN')  # Unset disables on-demand profiling and the slow request endpoints
+profile_sample_rate = float(os.environ.get('PROFILE_SAMPLE_RATE', '0'))  # Fraction of requests stack-sampled
+profile_interval = float(os.environ.get('PROFILE_INTERVAL_MS', '5')) / 1000
+slow_request_ms = float(os.environ.get('SLOW_REQUEST_MS', '2000'))  # Requests slower than this are persisted, 0 disables
+slow_requests_max_bytes = int(os.environ.get('SLOW_REQUESTS_MAX_MB', '64')) * 1024 * 1024  # Capped collection size
+slow_requests_max_docs = int(os.environ.get('SLOW_REQUESTS_MAX_DOCS', '5000'))
+
+# Logging: JSON lines written by a background thread; repeated warnings and errors are rate limited
+log_level = os.environ.get('LOG_LEVEL', 'INFO').upper()
+log_format = os.environ.get('LOG_FORMAT', 'json')  # json, or text for the plain one-line format
+log_queue_size = int(os.environ.get('LOG_QUEUE_SIZE', '10000'))  # Records beyond this are dropped, never waited for
+log_error_burst = int(os.environ.get('LOG_ERROR_BURST', '10'))  # Identical warnings/errors written per window
+log_error_window = float(os.environ.get('LOG_ERROR_WINDOW', '60'))  # Seconds
+log_error_sample_rate = float(os.environ.get('LOG_ERROR_SAMPLE_RATE', '0.01'))  # Fraction written after the burst
+access_log = os.environ.get('ACCESS_LOG', 'true').lower() == 'true'  # One line per request with its span timings
+
+# Opt-in fast response path: orjson rendering and validation-free models for trusted documents
+fast_serialization = os.environ.get('FAST_SERIALIZATION', 'false').lower() == 'true'
+
+def _orjson_default(value: Any) -> Any:
+    if isinstance(value, (Decimal, Decimal128, ObjectId)):
+        return str(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+class FastJSONResponse(ORJSONResponse):
+    """ORJSONResponse that also renders Decimal and BSON scalar types"""
+
+    def render(self, content: Any) -> bytes:
+        with profile_span("serialization"):
+            return orjson.dumps(content, default=_orjson_default, option=orjson.OPT_NON_STR_KEYS)
+
+class ProfiledJSONResponse(JSONResponse):
+    """The default JSONResponse, with rendering time attributed to the request profile"""
+
+    def render(self, content: Any) -> bytes:
+        with profile_span("serialization"):
+            return super().render(content)
+
+# Lazily loaded subsystems
+# The chain, crypto and AI libraries take seconds to import, so they are loaded on first use or
+# by the warm-up task started in lifespan, never at module import.
+HEAVY_MODULES = ["eth_utils", "eth_keys", "eth_account", "mnemonic", "openai"]
+subsystems_ready = False
+_mnemonic = None
+_ai_client = None
+
+def get_mnemonic():
+    """Shared BIP-39 English wordlist helper"""
+    global _mnemonic
+    if _mnemonic is None:
+        from mnemonic import Mnemonic
+        _mnemonic = Mnemonic("english")
+    return _mnemonic
+
+def get_ai_client():
+    """Shared async OpenAI client"""
+    global _ai_client
+    if _ai_client is None:
+        import openai
+        # Retries are done by create_completion, which holds the admission slot while backing off
+        _ai_client = openai.AsyncOpenAI(api_key=openai_api_key, max_retries=0)
+    return _ai_client
+
+def _import_heavy_modules():
+    # Sequential on purpose: these packages share dependencies, and concurrent imports of one
+    # package tree from several threads can observe partially initialised modules
+    for name in HEAVY_MODULES:
+        importlib.import_module(name)
+    get_mnemonic()
+
+async def warm_up_subsystems():
+    """Load the heavy libraries off the event loop so the first requests don't pay for them"""
+    global subsystems_ready
+    try:
+        await asyncio.to_thread(_import_heavy_modules)
+        if openai_api_key:
+            get_ai_client()
+        subsystems_ready = True
+    except Exception as e:
+        logging.error("Subsystem warm-up failed: %s", e)
+
+async def detect_mongo_topology():
+    global mongo_supports_transactions
+    try:
+        hello = await client.admin.command("hello")
+        mongo_supports_transactions = "setName" in hello or hello.get("msg") == "isdbgrid"
+    except Exception as e:
+        logging.warning("Could not detect MongoDB topology, multi-document transactions disabled: %s", e)
+
+def read_preference(name: str):
+    """pymongo read preference for a mode name, bounded by the configured max staleness"""
+    from pymongo import read_preferences
+    
+    if name == "primary":
+        return read_preferences.Primary()
+    modes = {
+        "primaryPreferred": read_preferences.PrimaryPreferred,
+        "secondary": read_preferences.Secondary,
+        "secondaryPreferred": read_preferences.SecondaryPreferred,
+        "nearest": read_preferences.Nearest,
+    }
+    if name not in modes:
+        raise ValueError(f"Unknown read preference: {name}")
+    return modes[name](max_staleness=mongo_max_staleness)
+
+def read_db(query_class: str):
+    """The database handle for a query class (history, listing or export)"""
+    return read_dbs[query_class]
+
+@asynccontextmanager
+async def causal_session():
+    """Session in which reads, on whichever member serves them, observe the session's earlier writes.
+    
+    Yields None where the deployment has no sessions (the in-memory benchmark database); the
+    operations then run without one, which is what a single server gives anyway.
+    """
+    try:
+        session = await client.start_session(causal_consistency=True)
+    except (NotImplementedError, ConfigurationError) as e:
+        logging.debug("Sessions unavailable, reading without causal consistency: %s", e)
+        yield None
+        return
+    async with session:
+        yield session
+
+def init_clients():
+    """Start logging, load the master keys and create this worker's Mongo, RPC, cache and signing clients; anything already set is kept"""
+    global client, db, read_dbs, rpc_transport, tron_client, signing_pool, cache, master_keys
+    start_logging()
+    if not master_keys:
+        master_keys = load_master_keys()
+    if client is None:
+        client = AsyncIOMotorClient(mongo_url, event_listeners=[MongoCommandMetrics()])
+    if db is None:
+        db = client[db_name]
+    if read_dbs is None:
+        read_dbs = {
+            query_class: db.with_options(read_preference=read_preference(name))
+            for query_class, name in read_preference_names.items()
+        }
+    if rpc_transport is None:
+        rpc_transport = build_rpc_transport()
+    if tron_client is None:
+        tron_client = TronClient(rpc_transport, tron_rpc_url, api_key=tron_api_key, max_concurrency=tron_max_concurrency)
+    if signing_pool is None:
+        signing_pool = ThreadPoolExecutor(max_workers=bundle_signing_workers, thread_name_prefix="bundle-signer")
+    if cache is None:
+        cache = build_cache()
+
+async def ensure_indexes():
+    """Create the indexes the queries rely on; a no-op when they already exist"""
+    try:
+        await db.wallet_daily_stats.create_index(
+            [("wallet_id", 1), ("day", 1), ("token_symbol", 1)], unique=True, name="wallet_day_token"
+        )
+        await db.transactions.create_index(
+            [("wallet_id", 1), ("decimals", 1), ("amount_base", 1)], name="wallet_amount"
+        )
+        # Address lookups: equality on the normalized address, newest first
+        await db.wallets.create_index([("address", 1)], name="address")
+        await db.transactions.create_index([("from_address", 1), ("timestamp", -1)], name="from_address_timestamp")
+        await db.transactions.create_index([("to_address", 1), ("timestamp", -1)], name="to_address_timestamp")
+        # Deposits use deterministic tx_ids, so a replayed block can't insert duplicates
+        await db.transactions.create_index(
+            [("tx_id", 1)], unique=True, name="tx_id", partialFilterExpression={"tx_id": {"$type": "string"}}
+        )
+        await db.wallets.create_index([("created_at", 1)], name="created_at")
+        # Exports read in timestamp order, for one wallet or for all of them
+        await db.transactions.create_index([("wallet_id", 1), ("timestamp", 1)], name="wallet_timestamp")
+        await db.transactions.create_index([("timestamp", 1)], name="timestamp")
+        # Each simulation carries its own expiry, so changing the TTL setting needs no index rebuild
+        await db.transaction_simulations.create_index([("expires_at", 1)], expireAfterSeconds=0, name="expires_at")
+        await db.transaction_simulations.create_index([("tx_id", 1)], unique=True, name="tx_id")
+        await db.transaction_simulations.create_index([("wallet_id", 1), ("timestamp", -1)], name="wallet_timestamp")
+    except Exception as e:
+        logging.error("Error creating indexes: %s", e)
+
+async def ensure_slow_requests_collection():
+    """Create the capped collection slow request profiles are written to"""
+    try:
+        if not await db.list_collection_names(filter={"name": "slow_requests"}):
+            await db.create_collection(
+                "slow_requests", capped=True, size=slow_requests_max_bytes, max=slow_requests_max_docs
+            )
+        await db.slow_requests.create_index([("profile_id", 1)], name="profile_id")
+    except Exception as e:
+        # Another worker may have created it first; inserts work either way
+        logging.error("Error creating slow_requests collection: %s", e)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Each uvicorn worker runs its own lifespan, so every client below belongs to one process
+    start_logging()
+    init_clients()
+    # Warm-up runs in the background; /api/health/ready reports when it is done
+    warm_up_task = asyncio.create_task(warm_up_subsystems())
+    asyncio.create_task(detect_mongo_topology())
+    asyncio.create_task(ensure_indexes())
+    asyncio.create_task(ensure_slow_requests_collection())
+    if profile_token or profile_sample_rate > 0:
+        asyncio.get_running_loop().set_task_factory(profiling_task_factory)
+    if fee_oracle_enabled:
+        fee_oracle.start()
+    if ingestion_enabled:
+        deposit_ingestor.start()
+    if not wallet_master_key:
+        logging.warning("WALLET_MASTER_KEY is not set: new wallet mnemonics are stored unencrypted")
+    signing_keys.start()
+    yield
+    warm_up_task.cancel()
+    await fee_oracle.stop()
+    await deposit_ingestor.stop()
+    await signing_keys.stop()
+    await rpc_transport.aclose()
+    await cache.close()
+    if _ai_client is not None:
+        await _ai_client.close()
+    signing_pool.shutdown(wait=False)
+    client.close()
+    stop_logging()
 
 # Create the main app without a prefix
-app = FastAPI()
+app = FastAPI(
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse if fast_serialization else ProfiledJSONResponse
+)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -77,6 +639,7 @@ class WalletOwnerUpdate(BaseModel):
     wallet_id: str
     new_owner_address: str
     new_owner_type: str = "external"  # "external" or "wallet" (another wallet in the system)
+    expected_version: Optional[int] = None  # Optimistic concurrency: reject if the wallet changed since read
 
 class TokenInfo(BaseModel):
     token_address: str
@@ -91,6 +654,7 @@ class WalletSponsor(BaseModel):
     sponsor_address: str
     gas_limit: Optional[float] = None
     active: bool = True
+    expected_version: Optional[int] = None  # Optimistic concurrency: reject if the wallet changed since read
 
 class TransactionSimulation(BaseModel):
     wallet_id: str
@@ -101,17 +665,19 @@ class TransactionSimulation(BaseModel):
 
 class TransactionBundle(BaseModel):
     wallet_id: str
-    transactions: List[Dict[str, Any]]
+    transactions: List[Dict[str, Any]]  # Entries may carry an "id" and "depends_on" (ids or indexes)
     name: Optional[str] = None
     description: Optional[str] = None
+    atomic: bool = False  # All-or-nothing: nothing is broadcast unless every entry signs
 
 class Wallet(WalletBase):
     address: str
     public_key: str
     created_at: datetime = Field(default_factory=datetime.utcnow)
-    encrypted_mnemonic: Optional[str] = None  # In production, encrypt this
+    encrypted_mnemonic: Optional[str] = None  # Envelope from seal_mnemonic(); never returned by the API
     tokens: List[TokenInfo] = []
     sponsor_address: Optional[str] = None
+    version: int = 0  # Incremented on every owner/sponsor change
 
 class Balance(BaseModel):
     wallet_id: str
@@ -137,6 +703,14 @@ class Transaction(BaseModel):
     sponsor_address: Optional[str] = None
     bundle_id: Optional[str] = None
     data: Optional[str] = None
+    nonce: Optional[int] = None
+    error: Optional[str] = None
+    direction: str = "outgoing"  # outgoing, or incoming for detected deposits
+    block_number: Optional[int] = None  # Block (ETH) or slot (SOL) of a detected deposit
+
+class SimulatedTransaction(Transaction):
+    status: str = "simulated"
+    expires_at: datetime  # Retrievable by tx_id until then, removed by the TTL index afterwards
 
 class TransactionCreate(BaseModel):
     wallet_id: str
@@ -147,6 +721,48 @@ class TransactionCreate(BaseModel):
     use_sponsor: bool = False
     data: Optional[str] = None
 
+class FeeEstimate(BaseModel):
+    chain_type: str
+    unit: str  # Gwei for ETH, micro-lamports per CU for SOL, TRX for TRON
+    slow: float
+    standard: float
+    fast: float
+    base_fee: Optional[float] = None  # Next block base fee (ETH) or per-signature fee in lamports (SOL)
+    sample_size: int = 0
+    updated_at: Optional[datetime] = None
+
+class WalletOverview(Wallet):
+    balance: Optional[str] = None  # Native balance, None if the chain call failed (see errors)
+    token_symbol: str
+    errors: Dict[str, str] = {}  # "balance" or "tokens" -> why that part is missing or stale
+
+class AddressActivity(BaseModel):
+    address: str
+    wallet: Optional[Wallet] = None  # Our wallet holding this address, if any
+    transactions: List[Transaction]  # Most recent sends from and to the address, newest first
+
+class DailyStats(BaseModel):
+    day: str  # YYYY-MM-DD, UTC
+    token_symbol: str
+    tx_count: int = 0
+    failed_count: int = 0
+    volume: str = "0"  # Sum of the amounts of non-failed transactions
+    first_tx_at: Optional[datetime] = None
+    last_tx_at: Optional[datetime] = None
+
+class TokenTotals(BaseModel):
+    token_symbol: str
+    tx_count: int
+    failed_count: int
+    volume: str
+
+class WalletAnalytics(BaseModel):
+    wallet_id: str
+    start: str
+    end: str
+    days: List[DailyStats]
+    totals: List[TokenTotals]
+
 class AIChatMessage(BaseModel):
     role: str  # 'user' or 'assistant'
     content: str
@@ -160,26 +776,382 @@ class AIChatRequest(BaseModel):
     message: str
     wallet_id: Optional[str] = None
     chat_id: Optional[str] = None
+    priority: str = "interactive"  # interactive, or background for non-user-facing callers
 
 class AIChatResponse(BaseModel):
     chat_id: str
     response: str
     action: Optional[Dict[str, Any]] = None  # Optional action to perform
 
+# Amounts
+# Transactions keep the submitted amount string and also store it as integer base units
+# (wei, lamports, sun, token units) in a Decimal128 field. That field is indexed, so ranges
+# and sums run in Mongo. Decimal128 holds 34 significant digits, far beyond real transfer sizes.
+NATIVE_DECIMALS = {"ETH": 18, "SOL": 9, "TRON": 6}
+MAX_BASE_UNIT_DIGITS = 34
+
+def token_decimals(wallet: Dict[str, Any], token_address: Optional[str]) -> int:
+    """Decimals of a wallet's native coin or of one of its tokens (18 if unknown)"""
+    if not token_address or token_address == "native":
+        return NATIVE_DECIMALS.get(wallet.get("chain_type"), 18)
+    known_tokens = (wallet.get("tokens") or []) + [token.dict() for token in TRC20_DEFAULT_TOKENS]
+    for token in known_tokens:
+        if token["token_address"].lower() == token_address.lower():
+            return token["decimals"]
+    return 18
+
+def to_base_units(amount: Optional[str], decimals: int) -> int:
+    """Exact integer base units of a decimal amount string; ValueError if it isn't representable"""
+    try:
+        value = Decimal(amount or "0")
+    except InvalidOperation:
+        raise ValueError(f"Invalid amount: {amount}")
+    if not value.is_finite() or value < 0:
+        raise ValueError(f"Invalid amount: {amount}")
+    with localcontext() as ctx:
+        ctx.prec = 100
+        scaled = value.scaleb(decimals)
+        if scaled != scaled.to_integral_value():
+            raise ValueError(f"Amount {amount} has more than {decimals} decimal places")
+    units = int(scaled)
+    if len(str(units)) > MAX_BASE_UNIT_DIGITS:
+        raise ValueError(f"Amount {amount} is too large")
+    return units
+
+def from_base_units(units: int, decimals: int) -> str:
+    """Decimal string of an integer base unit amount, without trailing zeros"""
+    with localcontext() as ctx:
+        ctx.prec = 100
+        value = Decimal(units).scaleb(-decimals)
+    text = format(value, "f")
+    return text.rstrip("0").rstrip(".") if "." in text else text
+
+def transaction_document(tx: Transaction, decimals: int) -> Dict[str, Any]:
+    """Stored form of a transaction: the model plus its amount in base units (None if invalid)"""
+    doc = tx.dict()
+    try:
+        doc["amount_base"] = Decimal128(Decimal(to_base_units(tx.amount, decimals)))
+    except ValueError:
+        doc["amount_base"] = None
+    doc["decimals"] = decimals
+    return doc
+
+def amount_range_filter(min_amount: Optional[str], max_amount: Optional[str], decimals_in_use: List[int]) -> Dict[str, Any]:
+    """Query on amount_base for a range given in token units, one branch per decimals value"""
+    bounds = {}
+    for operator, value in (("$gte", min_amount), ("$lte", max_amount)):
+        if value is None:
+            continue
+        try:
+            bounds[operator] = Decimal(value)
+        except InvalidOperation:
+            raise HTTPException(status_code=400, detail=f"Invalid amount filter: {value}")
+        if not bounds[operator].is_finite():
+            raise HTTPException(status_code=400, detail=f"Invalid amount filter: {value}")
+    
+    branches = []
+    for decimals in decimals_in_use:
+        condition = {}
+        try:
+            with localcontext() as ctx:
+                ctx.prec = 100
+                if "$gte" in bounds:
+                    condition["$gte"] = Decimal128(Decimal(int(bounds["$gte"].scaleb(decimals).to_integral_value(ROUND_CEILING))))
+                if "$lte" in bounds:
+                    condition["$lte"] = Decimal128(Decimal(int(bounds["$lte"].scaleb(decimals).to_integral_value(ROUND_FLOOR))))
+        except ArithmeticError:
+            # Finite but beyond what an amount_base can hold, e.g. 1e999999
+            raise HTTPException(status_code=400, detail="Amount filter out of range")
+        branches.append({"decimals": decimals, "amount_base": condition})
+    if not branches:
+        return {"amount_base": {"$in": []}}  # No amounts stored yet, nothing can match
+    return branches[0] if len(branches) == 1 else {"$or": branches}
+
+async def migrate_transaction_amounts(batch_size: int = 1000) -> Dict[str, int]:
+    """Add amount_base/decimals to transactions stored before amounts were normalized"""
+    wallets: Dict[str, Dict[str, Any]] = {}
+    migrated = invalid = 0
+    requests = []
+    cursor = db.transactions.find(
+        {"amount_base": {"$exists": False}},
+        {"_id": 1, "wallet_id": 1, "amount": 1, "token_address": 1}
+    ).batch_size(batch_size)
+    async for doc in cursor:
+        wallet_id = doc.get("wallet_id")
+        if wallet_id not in wallets:
+            wallets[wallet_id] = await db.wallets.find_one({"wallet_id": wallet_id}, {"chain_type": 1, "tokens": 1}) or {}
+        decimals = token_decimals(wallets[wallet_id], doc.get("token_address"))
+        try:
+            amount_base = Decimal128(Decimal(to_base_units(doc.get("amount"), decimals)))
+            migrated += 1
+        except ValueError:
+            amount_base = None
+            invalid += 1
+        requests.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"amount_base": amount_base, "decimals": decimals}}))
+        if len(requests) >= batch_size:
+            await db.transactions.bulk_write(requests, ordered=False)
+            requests = []
+    if requests:
+        await db.transactions.bulk_write(requests, ordered=False)
+    return {"migrated": migrated, "invalid": invalid}
+
+# Addresses
+# Addresses are stored in one canonical form so indexed equality lookups find them whatever
+# case they are queried in: EVM hex addresses as EIP-55 checksums, base58 (SOL/TRON) as given.
+EVM_ADDRESS_PATTERN = re.compile(r"^0x[0-9a-fA-F]{40}$")
+
+def normalize_address(address: Optional[str]) -> Optional[str]:
+    """Canonical stored form of an address; anything unrecognised is only stripped"""
+    if not address:
+        return address
+    address = address.strip()
+    if EVM_ADDRESS_PATTERN.match(address):
+        from eth_utils import to_checksum_address
+        return to_checksum_address(address)
+    return address
+
+async def normalize_stored_addresses(batch_size: int = 1000) -> Dict[str, int]:
+    """Rewrite EVM addresses stored before normalization into their checksum form"""
+    counts = {}
+    for collection, fields in ((db.wallets, ["address", "sponsor_address"]), (db.transactions, ["from_address", "to_address"])):
+        updated = 0
+        requests = []
+        query = {"$or": [{field: {"$regex": "^0x"}} for field in fields]}
+        async for doc in collection.find(query, {field: 1 for field in fields}).batch_size(batch_size):
+            changes = {
+                field: normalize_address(doc[field])
+                for field in fields
+                if doc.get(field) and normalize_address(doc[field]) != doc[field]
+            }
+            if changes:
+                if collection.name == "wallets":
+                    changes["updated_at"] = datetime.utcnow()  # Invalidates the wallet's ETag
+                requests.append(UpdateOne({"_id": doc["_id"]}, {"$set": changes}))
+                updated += 1
+            if len(requests) >= batch_size:
+                await collection.bulk_write(requests, ordered=False)
+                requests = []
+        if requests:
+            await collection.bulk_write(requests, ordered=False)
+        counts[collection.name] = updated
+    return counts
+
+# Signing keys
+# Mnemonics are stored under envelope encryption: each wallet's mnemonic is encrypted with its
+# own random AES-256-GCM data key, and the data key is stored wrapped (AES-GCM again) by the
+# master key from WALLET_MASTER_KEY. Both layers are bound to the wallet id as associated data,
+# so an envelope copied onto another wallet fails to open. The stored form is
+# "env1:<master key id>:<wrapped data key>:<ciphertext>", each part a base64 nonce + sealed bytes;
+# anything else is a mnemonic stored in the clear before encryption was configured.
+#
+# Signing needs the private key derived from the mnemonic (PBKDF2), so derived keys are kept in
+# a small LRU with a TTL, in bytearrays that are overwritten with zeros when they are evicted,
+# expire or the process shuts down. Copies made by the signing libraries are beyond our reach.
+ENVELOPE_PREFIX = "env1"
+
+# Wallet documents as served by the API: everything but the stored mnemonic
+PUBLIC_WALLET_FIELDS = {"_id": 0, "encrypted_mnemonic": 0}
+
+def load_master_keys() -> Dict[str, bytes]:
+    """Master keys by id: the current one and any previous ones still needed for decryption"""
+    configured = [(wallet_master_key_id, wallet_master_key)] if wallet_master_key else []
+    for item in filter(None, (part.strip() for part in wallet_previous_master_keys.split(","))):
+        key_id, _, encoded = item.partition(":")
+        configured.append((key_id, encoded))
+    keys = {}
+    for key_id, encoded in configured:
+        try:
+            key = base64.b64decode(encoded, validate=True)
+        except binascii.Error:
+            key = b""
+        if len(key) != 32:
+            raise ValueError(f"Master key {key_id} must be 32 bytes, base64 encoded")
+        keys.setdefault(key_id, key)
+    return keys
+
+master_keys: Dict[str, bytes] = {}  # Loaded by init_clients(), so a malformed key fails startup rather than import
+
+def zeroize(buffer: bytearray):
+    buffer[:] = bytes(len(buffer))
+
+def _seal(key: bytes, plaintext: bytes, associated_data: bytes) -> str:
+    nonce = secrets.token_bytes(12)
+    return base64.b64encode(nonce + AESGCM(key).encrypt(nonce, plaintext, associated_data)).decode()
+
+def _open(key: bytes, sealed: str, associated_data: bytes) -> bytes:
+    data = base64.b64decode(sealed)
+    return AESGCM(key).decrypt(data[:12], data[12:], associated_data)
+
+def is_sealed(stored: Optional[str]) -> bool:
+    return bool(stored) and stored.startswith(ENVELOPE_PREFIX + ":")
+
+def seal_mnemonic(wallet_id: str, mnemonic: str) -> str:
+    """The stored form of a wallet's mnemonic: an envelope under the current master key"""
+    if not wallet_master_key:
+        return mnemonic
+    associated_data = wallet_id.encode()
+    data_key = bytearray(AESGCM.generate_key(bit_length=256))
+    try:
+        ciphertext = _seal(bytes(data_key), mnemonic.encode("utf-8"), associated_data)
+        wrapped_key = _seal(master_keys[wallet_master_key_id], bytes(data_key), associated_data)
+    finally:
+        zeroize(data_key)
+    return ":".join([ENVELOPE_PREFIX, wallet_master_key_id, wrapped_key, ciphertext])
+
+def open_mnemonic(wallet_id: str, stored: str) -> str:
+    """Decrypt a stored mnemonic; raises ValueError if its master key is unknown or it was tampered with"""
+    if not is_sealed(stored):
+        return stored
+    _, key_id, wrapped_key, ciphertext = stored.split(":")
+    if key_id not in master_keys:
+        raise ValueError(f"Unknown master key id: {key_id}")
+    associated_data = wallet_id.encode()
+    try:
+        data_key = bytearray(_open(master_keys[key_id], wrapped_key, associated_data))
+        try:
+            return _open(bytes(data_key), ciphertext, associated_data).decode("utf-8")
+        finally:
+            zeroize(data_key)
+    except InvalidTag:
+        raise ValueError("Envelope failed authentication")
+
+class SigningKeyCache:
+    """LRU of derived private keys by wallet id, each kept for at most `ttl` seconds"""
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries: OrderedDict[str, tuple] = OrderedDict()  # wallet_id -> (expires_at, bytearray)
+        self.lock = threading.Lock()
+        self._sweeper: Optional[asyncio.Task] = None
+
+    def get(self, wallet_id: str) -> Optional[bytearray]:
+        """A copy of the cached key, which the caller zeroizes when done"""
+        with self.lock:
+            entry = self.entries.get(wallet_id)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                self._drop(wallet_id)
+                return None
+            self.entries.move_to_end(wallet_id)
+            return bytearray(entry[1])
+
+    def put(self, wallet_id: str, key: bytearray):
+        if self.max_size <= 0 or self.ttl <= 0:
+            return
+        with self.lock:
+            self._drop(wallet_id)
+            self.entries[wallet_id] = (time.monotonic() + self.ttl, bytearray(key))
+            while len(self.entries) > self.max_size:
+                self._drop(next(iter(self.entries)))
+
+    def purge_expired(self):
+        now = time.monotonic()
+        with self.lock:
+            for wallet_id in [wallet_id for wallet_id, (expires_at, _) in self.entries.items() if expires_at <= now]:
+                self._drop(wallet_id)
+
+    def clear(self):
+        with self.lock:
+            for wallet_id in list(self.entries):
+                self._drop(wallet_id)
+
+    def _drop(self, wallet_id: str):
+        entry = self.entries.pop(wallet_id, None)
+        if entry is not None:
+            zeroize(entry[1])
+
+    def start(self):
+        """Expire idle keys in the background rather than on their next lookup"""
+        if self._sweeper is None and self.max_size > 0 and self.ttl > 0:
+            self._sweeper = asyncio.create_task(self._sweep())
+
+    async def stop(self):
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            self._sweeper = None
+        self.clear()
+
+    async def _sweep(self):
+        while True:
+            await asyncio.sleep(max(1.0, self.ttl / 4))
+            self.purge_expired()
+
+signing_keys = SigningKeyCache(signing_key_cache_size, signing_key_cache_ttl)
+
+def _derive_signing_key(wallet_id: str, stored: str) -> bytearray:
+    return bytearray(derive_key_bytes(open_mnemonic(wallet_id, stored)))
+
+async def signing_key(wallet: Dict[str, Any]) -> bytearray:
+    """The wallet's private key, from the cache or decrypted and derived on the signing pool.
+    
+    The caller owns the returned buffer and should zeroize it once signing is done.
+    """
+    wallet_id = wallet["wallet_id"]
+    key = signing_keys.get(wallet_id)
+    if key is not None:
+        SIGNING_KEY_LOOKUPS.labels("hit").inc()
+        return key
+    
+    SIGNING_KEY_LOOKUPS.labels("miss").inc()
+    stored = wallet.get("encrypted_mnemonic")
+    if not stored:
+        raise HTTPException(status_code=400, detail="Wallet has no signing key")
+    try:
+        key = await asyncio.get_running_loop().run_in_executor(signing_pool, _derive_signing_key, wallet_id, stored)
+    except ValueError as e:
+        logging.error("Could not open signing key of wallet %s: %s", wallet_id, e)
+        raise HTTPException(status_code=500, detail="Wallet signing key could not be decrypted")
+    signing_keys.put(wallet_id, key)
+    return key
+
+async def seal_stored_mnemonics(batch_size: int = 1000) -> Dict[str, int]:
+    """Encrypt mnemonics stored in the clear and re-wrap envelopes made under previous master keys"""
+    if not wallet_master_key:
+        raise RuntimeError("WALLET_MASTER_KEY is not set")
+    current_prefix = f"{ENVELOPE_PREFIX}:{wallet_master_key_id}:"
+    counts = {"sealed": 0, "rewrapped": 0}
+    requests = []
+    cursor = db.wallets.find(
+        {"encrypted_mnemonic": {"$type": "string", "$not": re.compile("^" + re.escape(current_prefix))}},
+        {"_id": 1, "wallet_id": 1, "encrypted_mnemonic": 1}
+    )
+    async for wallet in cursor:
+        stored = wallet["encrypted_mnemonic"]
+        counts["rewrapped" if is_sealed(stored) else "sealed"] += 1
+        sealed = seal_mnemonic(wallet["wallet_id"], open_mnemonic(wallet["wallet_id"], stored))
+        requests.append(UpdateOne(
+            {"_id": wallet["_id"], "encrypted_mnemonic": stored}, {"$set": {"encrypted_mnemonic": sealed}}
+        ))
+        if len(requests) >= batch_size:
+            await db.wallets.bulk_write(requests, ordered=False)
+            requests = []
+    if requests:
+        await db.wallets.bulk_write(requests, ordered=False)
+    return counts
+
 # Wallet management functions
+def derive_key_bytes(mnemonic: str) -> bytes:
+    """Derive the demo private key: the first 32 bytes of the mnemonic seed"""
+    seed = hashlib.pbkdf2_hmac("sha512", mnemonic.encode("utf-8"), b"mnemonic", 2048)
+    return seed[:32]
+
+def derive_private_key(mnemonic: str) -> str:
+    return "0x" + derive_key_bytes(mnemonic).hex()
+
 async def create_ethereum_wallet(name: str, mnemonic: Optional[str] = None) -> Wallet:
     """Create a new Ethereum wallet or import from mnemonic"""
-    mnemo = Mnemonic("english")
+    mnemo = get_mnemonic()
     
     if not mnemonic:
         # Generate a new mnemonic
         mnemonic = mnemo.generate(strength=128)
     
-    # Create a seed from the mnemonic
-    seed = hashlib.pbkdf2_hmac("sha512", mnemonic.encode("utf-8"), b"mnemonic", 2048)
+    from eth_account import Account
     
-    # Use the first 32 bytes as private key (simplified for demo)
-    private_key = "0x" + seed[:32].hex()
+    # Derive the private key from the mnemonic
+    private_key = derive_private_key(mnemonic)
     
     # Create account from private key
     account = Account.from_key(private_key)
@@ -189,8 +1161,8 @@ async def create_ethereum_wallet(name: str, mnemonic: Optional[str] = None) -> W
         chain_type="ETH",
         address=account.address,
         public_key=account.address,  # For ETH, address is the public key
-        encrypted_mnemonic=mnemonic  # Not encrypted in this demo, but would be in production
     )
+    wallet.encrypted_mnemonic = seal_mnemonic(wallet.wallet_id, mnemonic)
     
     # Save to database
     await db.wallets.insert_one(wallet.dict())
@@ -199,7 +1171,7 @@ async def create_ethereum_wallet(name: str, mnemonic: Optional[str] = None) -> W
 
 async def create_solana_wallet(name: str, mnemonic: Optional[str] = None) -> Wallet:
     """Create a new Solana wallet or import from mnemonic"""
-    mnemo = Mnemonic("english")
+    mnemo = get_mnemonic()
     
     if not mnemonic:
         # Generate a new mnemonic
@@ -219,8 +1191,8 @@ async def create_solana_wallet(name: str, mnemonic: Optional[str] = None) -> Wal
         chain_type="SOL",
         address=address,
         public_key=address,  # For Solana, the address is derived from the public key
-        encrypted_mnemonic=mnemonic  # Not encrypted in this demo, but would be in production
     )
+    wallet.encrypted_mnemonic = seal_mnemonic(wallet.wallet_id, mnemonic)
     
     # Save to database
     await db.wallets.insert_one(wallet.dict())
@@ -229,28 +1201,28 @@ async def create_solana_wallet(name: str, mnemonic: Optional[str] = None) -> Wal
 
 async def create_tron_wallet(name: str, mnemonic: Optional[str] = None) -> Wallet:
     """Create a new TRON wallet or import from mnemonic"""
-    mnemo = Mnemonic("english")
+    mnemo = get_mnemonic()
     
     if not mnemonic:
         # Generate a new mnemonic
         mnemonic = mnemo.generate(strength=128)
     
-    # Create a seed from the mnemonic (simplified for demo)
-    seed = hashlib.pbkdf2_hmac("sha512", mnemonic.encode("utf-8"), b"mnemonic", 2048)
+    from eth_keys import keys as eth_keys
     
-    # Use first 32 bytes for keypair (simplified)
-    private_key = "0x" + seed[:32].hex()
+    # Derive the secp256k1 key pair from the mnemonic
+    private_key = eth_keys.PrivateKey(bytes.fromhex(derive_private_key(mnemonic)[2:]))
+    public_key = private_key.public_key
     
-    # Create a demo address (in real implementation, we'd derive from private key)
-    address = "T" + secrets.token_hex(20)  # Just a placeholder
+    # TRON addresses share the Ethereum key derivation, with a 0x41 prefix and base58check
+    address = tron_address_from_public_key(public_key)
     
     wallet = Wallet(
         name=name,
         chain_type="TRON",
         address=address,
-        public_key=address,
-        encrypted_mnemonic=mnemonic
+        public_key=public_key.to_hex(),
     )
+    wallet.encrypted_mnemonic = seal_mnemonic(wallet.wallet_id, mnemonic)
     
     # Add default TRX token
     wallet.tokens.append(
@@ -269,43 +1241,48 @@ async def create_tron_wallet(name: str, mnemonic: Optional[str] = None) -> Walle
     
     return wallet
 
-async def get_ethereum_balance(address: str) -> float:
+NATIVE_SYMBOLS = {"ETH": "ETH", "SOL": "SOL", "TRON": "TRX"}
+
+async def _load_native_balance(chain_type: str, address: str) -> str:
+    if chain_type == "ETH":
+        balance_wei = int(await json_rpc(eth_rpc_url, "eth_getBalance", [address, "latest"]), 16)
+        return from_base_units(balance_wei, NATIVE_DECIMALS["ETH"])
+    if chain_type == "SOL":
+        response = await json_rpc(sol_rpc_url, "getBalance", [address])
+        return from_base_units(int(response["value"]), NATIVE_DECIMALS["SOL"])  # Lamports to SOL
+    if chain_type == "TRON":
+        return str(await tron_client.get_balance(address))
+    raise ValueError(f"Unsupported chain type: {chain_type}")
+
+async def fetch_native_balance(chain_type: str, address: str) -> Decimal:
+    """Cached native balance in whole coins; raises if the node call fails"""
+    return Decimal(await cached(
+        f"balance:{chain_type}:{address}", balance_cache_ttl, lambda: _load_native_balance(chain_type, address)
+    ))
+
+async def get_ethereum_balance(address: str) -> Decimal:
     """Get the balance of an Ethereum address in ETH"""
     try:
-        balance_wei = web3.eth.get_balance(address)
-        balance_eth = web3.from_wei(balance_wei, 'ether')
-        return float(balance_eth)
+        return await fetch_native_balance("ETH", address)
     except Exception as e:
-        logging.error(f"Error getting ETH balance: {e}")
-        return 0.0
+        logging.error("Error getting ETH balance: %s", e)
+        return Decimal(0)
 
-async def get_solana_balance(address: str) -> float:
+async def get_solana_balance(address: str) -> Decimal:
     """Get the balance of a Solana address in SOL"""
     try:
-        response = solana_client.get_balance(address)
-        # Depending on how the response is structured
-        if isinstance(response, dict) and 'result' in response:
-            value = response['result']['value']
-        else:
-            value = response.value
-        return float(value) / 1_000_000_000  # Convert lamports to SOL
+        return await fetch_native_balance("SOL", address)
     except Exception as e:
-        logging.error(f"Error getting SOL balance: {e}")
-        return 0.0
+        logging.error("Error getting SOL balance: %s", e)
+        return Decimal(0)
 
-async def get_tron_balance(address: str) -> float:
+async def get_tron_balance(address: str) -> Decimal:
     """Get the balance of a TRON address in TRX"""
-    # In a real app, we would call TRON API
-    # For this demo, we'll return a fake balance
     try:
-        # Simulate a random balance based on address
-        # In a real app, we would call TRON API
-        random_seed = int(address[1:5], 16) if len(address) > 5 else 0
-        balance = (random_seed % 100) + (random_seed % 10) / 10
-        return balance
+        return await fetch_native_balance("TRON", address)
     except Exception as e:
-        logging.error(f"Error getting TRON balance: {e}")
-        return 0.0
+        logging.error("Error getting TRON balance: %s", e)
+        return Decimal(0)
 
 async def get_token_balances(wallet_id: str) -> List[TokenInfo]:
     """Get token balances for a wallet"""
@@ -313,9 +1290,16 @@ async def get_token_balances(wallet_id: str) -> List[TokenInfo]:
     if not wallet:
         raise HTTPException(status_code=404, detail="Wallet not found")
     
+    return await wallet_token_balances(wallet)
+
+async def wallet_token_balances(wallet: Dict[str, Any]) -> List[TokenInfo]:
+    """Token balances for an already loaded wallet document"""
     # In a real app, we would query the blockchain for token balances
     # For this demo, we'll return the stored tokens or create some dummy ones
     
+    if wallet["chain_type"] == "TRON":
+        return await get_tron_token_balances(wallet)
+    
     if "tokens" in wallet and wallet["tokens"]:
         return wallet["tokens"]
     
@@ -359,107 +1343,1597 @@ async def get_token_balances(wallet_id: str) -> List[TokenInfo]:
                 logo_url="https://cryptologos.cc/logos/tether-usdt-logo.png?v=022"
             )
         ]
-    elif wallet["chain_type"] == "TRON":
-        tokens = [
-            TokenInfo(
-                token_address="TR7NHqjeKQxGTCi8q8ZY4pL8otSzgjLj6t",
-                symbol="USDT",
-                decimals=6,
-                balance="200.0",
-                name="Tether",
-                logo_url="https://cryptologos.cc/logos/tether-usdt-logo.png?v=022"
-            ),
-            TokenInfo(
-                token_address="TEkxiTehnzSmSe2XqrBj4w32RUN966rdz8",
-                symbol="USDC",
-                decimals=6,
-                balance="150.0",
-                name="USD Coin",
-                logo_url="https://cryptologos.cc/logos/usd-coin-usdc-logo.png?v=022"
-            )
-        ]
     
     # Update wallet with tokens
     await db.wallets.update_one(
-        {"wallet_id": wallet_id},
-        {"$set": {"tokens": [token.dict() for token in tokens]}}
+        {"wallet_id": wallet["wallet_id"]},
+        {"$set": {"tokens": [token.dict() for token in tokens], "updated_at": datetime.utcnow()}}
     )
     
     return tokens
 
-# AI Assistant functions
-async def process_ai_message(message: str, wallet_id: Optional[str] = None) -> Dict[str, Any]:
-    """Process a message with AI and return a response with optional actions"""
-    
-    # If no OpenAI API key, just return a basic response
-    if not openai_api_key:
-        return {
-            "response": "I'm a wallet assistant, but I need an OpenAI API key to provide intelligent responses. I can still help with basic wallet operations though!",
-            "action": None
-        }
+# RPC transport
+class RPCError(Exception):
+    """Raised when a JSON-RPC node returns an error object"""
+
+def cassette_key(url: str, payload: Any) -> str:
+    """Identify an exchange by URL and request body, ignoring JSON-RPC ids"""
+    def strip_id(request):
+        return {key: value for key, value in request.items() if key != "id"} if isinstance(request, dict) else request
     
-    try:
-        # Get wallet context if wallet_id is provided
-        wallet_context = ""
-        if wallet_id:
-            wallet = await db.wallets.find_one({"wallet_id": wallet_id})
-            if wallet:
-                chain_type = wallet["chain_type"]
-                address = wallet["address"]
-                balance = 0
-                
-                if chain_type == "ETH":
-                    balance = await get_ethereum_balance(address)
-                    balance_str = f"{balance} ETH"
-                elif chain_type == "SOL":
-                    balance = await get_solana_balance(address)
-                    balance_str = f"{balance} SOL"
-                elif chain_type == "TRON":
-                    balance = await get_tron_balance(address)
-                    balance_str = f"{balance} TRX"
-                
-                wallet_context = f"Current wallet: {wallet['name']} ({chain_type}) - Address: {address} - Balance: {balance_str}"
-                
-                # Add token information if available
-                if "tokens" in wallet and wallet["tokens"]:
-                    tokens_str = ", ".join([f"{token['balance']} {token['symbol']}" for token in wallet["tokens"]])
-                    wallet_context += f"\nTokens: {tokens_str}"
-                
-                # Add sponsor information if available
-                if "sponsor_address" in wallet and wallet["sponsor_address"]:
-                    wallet_context += f"\nSponsor: {wallet['sponsor_address']}"
-        
-        # Create system message with context
-        system_message = f"""You are a helpful blockchain wallet assistant. 
-You can help users manage their Ethereum, Solana, and TRON wallets.
-Current date: {datetime.now().strftime('%Y-%m-%d')}
-{wallet_context}
+    body = [strip_id(request) for request in payload] if isinstance(payload, list) else strip_id(payload)
+    return url + " " + json.dumps(body, sort_keys=True, separators=(",", ":"))
 
-If the user wants to perform actions like checking balance, creating a wallet, or sending transactions, 
-you should return a structured action in your response."""
-        
-        # Call OpenAI API
-        completion = openai.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": system_message},
-                {"role": "user", "content": message}
-            ],
-            temperature=0.7,
+def _open_cassette(path: str, mode: str):
+    return gzip.open(path, mode + "t", encoding="utf-8") if path.endswith(".gz") else open(path, mode, encoding="utf-8")
+
+class RpcTransport(ABC):
+    """Posts a JSON body to an upstream node and returns the decoded JSON response"""
+
+    @abstractmethod
+    async def post_json(self, url: str, payload: Any, headers: Optional[Dict[str, str]] = None) -> Any:
+        ...
+
+    async def aclose(self):
+        pass
+
+class HttpTransport(RpcTransport):
+    """Live transport over a pooled httpx client"""
+
+    def __init__(self, timeout: float, max_connections: int):
+        self.http = httpx.AsyncClient(
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections // 5 or 1)
         )
+
+    async def post_json(self, url: str, payload: Any, headers: Optional[Dict[str, str]] = None) -> Any:
+        response = await self.http.post(url, json=payload, headers=headers)
+        response.raise_for_status()
+        return response.json()
+
+    async def aclose(self):
+        await self.http.aclose()
+
+class RecordingTransport(RpcTransport):
+    """Wraps another transport and appends every exchange, with its latency, to a cassette.
+    
+    Entries are serialised and written by a background thread, so a slow (or gzipped)
+    cassette never blocks the event loop.
+    """
+
+    def __init__(self, inner: RpcTransport, path: str):
+        self.inner = inner
+        self.path = path
+        self._file = _open_cassette(path, "a")
+        self._entries: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue()
+        self._writer = threading.Thread(target=self._write_entries, name="cassette-writer", daemon=True)
+        self._writer.start()
+
+    def _write_entries(self):
+        with self._file:
+            while True:
+                entry = self._entries.get()
+                if entry is None:
+                    return
+                self._file.write(json.dumps(entry, separators=(",", ":")) + "\n")
+
+    async def post_json(self, url: str, payload: Any, headers: Optional[Dict[str, str]] = None) -> Any:
+        start = time.perf_counter()
+        entry = {"key": cassette_key(url, payload)}
+        try:
+            entry["response"] = await self.inner.post_json(url, payload, headers)
+            return entry["response"]
+        except Exception as e:
+            entry["error"] = str(e)
+            raise
+        finally:
+            entry["latency"] = round(time.perf_counter() - start, 6)
+            self._entries.put_nowait(entry)
+
+    async def aclose(self):
+        # Everything queued so far is written before the file is closed
+        self._entries.put_nowait(None)
+        await asyncio.to_thread(self._writer.join)
+        await self.inner.aclose()
+
+class ReplayTransport(RpcTransport):
+    """Serves recorded exchanges back, sleeping for the recorded latency times a scale factor.
+    
+    Repeated identical requests get the recorded responses in order; once those run out
+    the last one is served again.
+    """
+
+    def __init__(self, path: str, latency_scale: float = 1.0):
+        self.latency_scale = latency_scale
+        self.entries: Dict[str, List[Dict[str, Any]]] = {}
+        self.positions: Dict[str, int] = {}
+        with _open_cassette(path, "r") as cassette:
+            for line in cassette:
+                if line.strip():
+                    entry = json.loads(line)
+                    self.entries.setdefault(entry["key"], []).append(entry)
+
+    async def post_json(self, url: str, payload: Any, headers: Optional[Dict[str, str]] = None) -> Any:
+        key = cassette_key(url, payload)
+        recorded = self.entries.get(key)
+        if not recorded:
+            raise RPCError(f"No cassette entry for {key[:200]}")
+        position = self.positions.get(key, 0)
+        self.positions[key] = position + 1
+        entry = recorded[min(position, len(recorded) - 1)]
         
-        response_text = completion.choices[0].message.content
-        
-        # Parse for potential actions (in a real app, we'd use a more robust approach)
-        action = None
-        if "CREATE_WALLET" in response_text or "create wallet" in response_text.lower():
-            action = {"type": "CREATE_WALLET"}
-        elif "CHECK_BALANCE" in response_text or "check balance" in response_text.lower():
-            action = {"type": "CHECK_BALANCE", "wallet_id": wallet_id}
-        elif "SEND_TRANSACTION" in response_text or "send transaction" in response_text.lower() or "send tokens" in response_text.lower():
-            action = {"type": "SEND_TRANSACTION", "wallet_id": wallet_id}
-        elif "UPDATE_OWNER" in response_text or "change owner" in response_text.lower():
-            action = {"type": "UPDATE_OWNER", "wallet_id": wallet_id}
+        if self.latency_scale > 0:
+            await asyncio.sleep(entry["latency"] * self.latency_scale)
+        if "error" in entry:
+            raise RPCError(entry["error"])
+        return entry["response"]
+
+def build_rpc_transport() -> RpcTransport:
+    """Live HTTP transport, optionally recording to or replaying from a cassette"""
+    if rpc_cassette_mode == "replay":
+        return ReplayTransport(rpc_cassette_path, rpc_cassette_latency_scale)
+    transport = HttpTransport(rpc_timeout, rpc_max_connections)
+    if rpc_cassette_mode == "record":
+        return RecordingTransport(transport, rpc_cassette_path)
+    return transport
+
+rpc_transport: Optional[RpcTransport] = None  # Created by init_clients()
+
+# Shared cache
+class CacheBackend(ABC):
+    """Async key/value cache with per-entry TTLs; values must be JSON serialisable"""
+
+    @abstractmethod
+    async def get(self, key: str) -> Any:
+        ...
+
+    @abstractmethod
+    async def set(self, key: str, value: Any, ttl: float):
+        ...
+
+    @abstractmethod
+    async def add(self, key: str, value: Any, ttl: float) -> bool:
+        """Set only if the key is absent or expired; returns whether it was set"""
+
+    @abstractmethod
+    async def delete(self, key: str):
+        ...
+
+    async def close(self):
+        pass
+
+def _encode_cache_value(value: Any) -> bytes:
+    return orjson.dumps(value, default=_orjson_default)
+
+class InProcessCache(CacheBackend):
+    """LRU dict local to one worker process"""
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    async def get(self, key: str) -> Any:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: Any, ttl: float):
+        self.entries[key] = (time.monotonic() + ttl, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    async def add(self, key: str, value: Any, ttl: float) -> bool:
+        if await self.get(key) is not None:
+            return False
+        await self.set(key, value, ttl)
+        return True
+
+    async def delete(self, key: str):
+        self.entries.pop(key, None)
+
+class SharedMemoryCache(CacheBackend):
+    """SQLite table on a tmpfs path, shared by every worker on the host"""
+
+    PURGE_EVERY = 1000  # Writes between sweeps of expired rows
+
+    def __init__(self, path: str):
+        import sqlite3
+        import threading
+        
+        self.connection = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=OFF")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self.lock = threading.Lock()
+        self.writes = 0
+
+    def _get(self, key: str) -> Any:
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT value FROM cache WHERE key = ? AND expires_at >= ?", (key, time.time())
+            ).fetchone()
+        return orjson.loads(row[0]) if row else None
+
+    def _set(self, key: str, value: bytes, ttl: float, only_if_absent: bool) -> bool:
+        now = time.time()
+        with self.lock:
+            self.writes += 1
+            if self.writes % self.PURGE_EVERY == 0:
+                self.connection.execute("DELETE FROM cache WHERE expires_at < ?", (now,))
+            if only_if_absent:
+                self.connection.execute("DELETE FROM cache WHERE key = ? AND expires_at < ?", (key, now))
+                cursor = self.connection.execute(
+                    "INSERT OR IGNORE INTO cache (key, value, expires_at) VALUES (?, ?, ?)", (key, value, now + ttl)
+                )
+            else:
+                cursor = self.connection.execute(
+                    "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)", (key, value, now + ttl)
+                )
+            return cursor.rowcount == 1
+
+    def _delete(self, key: str):
+        with self.lock:
+            self.connection.execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    async def get(self, key: str) -> Any:
+        return await asyncio.to_thread(self._get, key)
+
+    async def set(self, key: str, value: Any, ttl: float):
+        await asyncio.to_thread(self._set, key, _encode_cache_value(value), ttl, False)
+
+    async def add(self, key: str, value: Any, ttl: float) -> bool:
+        return await asyncio.to_thread(self._set, key, _encode_cache_value(value), ttl, True)
+
+    async def delete(self, key: str):
+        await asyncio.to_thread(self._delete, key)
+
+    async def close(self):
+        self.connection.close()
+
+class RedisCache(CacheBackend):
+    """Any server speaking the Redis protocol, shared across hosts"""
+
+    def __init__(self, url: str):
+        import redis.asyncio as redis
+        
+        # RESP2 is understood by every Redis-protocol server (Redis, Valkey, KeyDB, Dragonfly)
+        self.redis = redis.Redis.from_url(url, protocol=2)
+
+    async def get(self, key: str) -> Any:
+        value = await self.redis.get(key)
+        return orjson.loads(value) if value is not None else None
+
+    async def set(self, key: str, value: Any, ttl: float):
+        await self.redis.set(key, _encode_cache_value(value), px=max(1, int(ttl * 1000)))
+
+    async def add(self, key: str, value: Any, ttl: float) -> bool:
+        return bool(await self.redis.set(key, _encode_cache_value(value), px=max(1, int(ttl * 1000)), nx=True))
+
+    async def delete(self, key: str):
+        await self.redis.delete(key)
+
+    async def close(self):
+        await self.redis.aclose()
+
+def build_cache() -> CacheBackend:
+    """Cache backend selected by CACHE_BACKEND"""
+    if cache_backend == "redis":
+        return RedisCache(cache_url)
+    if cache_backend == "shm":
+        return SharedMemoryCache(cache_shm_path)
+    return InProcessCache(cache_max_entries)
+
+cache: Optional[CacheBackend] = None  # Created by init_clients()
+
+async def acquire_lease(key: str, owner: str, ttl: float) -> bool:
+    """Take or renew a lease so one worker runs a background job; it lapses if not renewed"""
+    if await cache.add(key, owner, ttl):
+        return True
+    if await cache.get(key) == owner:
+        await cache.set(key, owner, ttl)
+        return True
+    return False
+
+async def cached(key: str, ttl: float, load) -> Any:
+    """Return the cached value for key, or await load() and cache its result.
+
+    Errors from load() propagate and are never cached; an unavailable cache only costs a miss.
+    """
+    try:
+        value = await cache.get(key)
+        if value is not None:
+            return value
+    except Exception as e:
+        logging.warning("Cache read failed for %s: %s", key, e)
+    value = await load()
+    try:
+        await cache.set(key, value, ttl)
+    except Exception as e:
+        logging.warning("Cache write failed for %s: %s", key, e)
+    return value
+
+# JSON-RPC helpers
+def rpc_chain(url: str) -> str:
+    """Metrics label of the chain an RPC URL belongs to"""
+    return {eth_rpc_url: "ETH", sol_rpc_url: "SOL", tron_rpc_url: "TRON"}.get(url, "other")
+
+async def json_rpc(url: str, method: str, params: Optional[list] = None) -> Any:
+    """Send a single JSON-RPC request and return its result"""
+    payload = {"jsonrpc": "2.0", "id": 1, "method": method, "params": params or []}
+    with observe_rpc(rpc_chain(url), method):
+        body = await rpc_transport.post_json(url, payload)
+        if body.get("error"):
+            raise RPCError(f"{method} failed: {body['error']}")
+    return body.get("result")
+
+async def json_rpc_batch(url: str, calls: List[tuple]) -> List[Dict[str, Any]]:
+    """Send (method, params) calls as one JSON-RPC batch; returns the raw responses in call order"""
+    payload = [
+        {"jsonrpc": "2.0", "id": index, "method": method, "params": params}
+        for index, (method, params) in enumerate(calls)
+    ]
+    with observe_rpc(rpc_chain(url), "batch"):
+        responses = await rpc_transport.post_json(url, payload)
+        by_id = {item.get("id"): item for item in responses}
+    return [by_id.get(index, {"error": "missing response"}) for index in range(len(calls))]
+
+# TRON client
+TRON_ADDRESS_PREFIX = b"\x41"
+TRX_DECIMALS = 6
+TRC20_DEFAULT_TOKENS = [
+    TokenInfo(
+        token_address="TR7NHqjeKQxGTCi8q8ZY4pL8otSzgjLj6t",
+        symbol="USDT",
+        decimals=6,
+        balance="0",
+        name="Tether",
+        logo_url="https://cryptologos.cc/logos/tether-usdt-logo.png?v=022"
+    ),
+    TokenInfo(
+        token_address="TEkxiTehnzSmSe2XqrBj4w32RUN966rdz8",
+        symbol="USDC",
+        decimals=6,
+        balance="0",
+        name="USD Coin",
+        logo_url="https://cryptologos.cc/logos/usd-coin-usdc-logo.png?v=022"
+    )
+]
+
+def tron_address_from_public_key(public_key) -> str:
+    """Base58check TRON address (0x41 + last 20 bytes of keccak(pubkey))"""
+    return base58.b58encode_check(TRON_ADDRESS_PREFIX + public_key.to_canonical_address()).decode("utf-8")
+
+def tron_address_to_abi(address: str) -> str:
+    """ABI-encode a base58check TRON address as a 32-byte word"""
+    raw = base58.b58decode_check(address)
+    if len(raw) != 21 or raw[:1] != TRON_ADDRESS_PREFIX:
+        raise ValueError(f"Invalid TRON address: {address}")
+    return raw[1:].hex().rjust(64, "0")
+
+class TronClient:
+    """Async TronGrid / FullNode HTTP API client on top of the shared RPC transport"""
+
+    def __init__(self, transport: RpcTransport, base_url: str, api_key: Optional[str] = None, max_concurrency: int = 20):
+        self.transport = transport
+        self.base_url = base_url.rstrip("/")
+        self.headers = {"TRON-PRO-API-KEY": api_key} if api_key else None
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def _post(self, path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        async with self._semaphore:
+            with observe_rpc("TRON", path):
+                body = await self.transport.post_json(self.base_url + path, payload, self.headers)
+                if isinstance(body, dict) and body.get("Error"):
+                    raise RPCError(f"{path} failed: {body['Error']}")
+        return body
+
+    async def get_account(self, address: str) -> Dict[str, Any]:
+        """Account record; empty for addresses that were never activated"""
+        return await self._post("/wallet/getaccount", {"address": address, "visible": True})
+
+    async def get_accounts(self, addresses: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Fetch many accounts concurrently over the shared connection pool"""
+        accounts = await asyncio.gather(*[self.get_account(address) for address in addresses])
+        return dict(zip(addresses, accounts))
+
+    async def get_now_block(self) -> Dict[str, Any]:
+        """Latest block, used as a cheap connectivity check"""
+        return await self._post("/wallet/getnowblock", {})
+
+    async def get_balance(self, address: str) -> Decimal:
+        """TRX balance of an address"""
+        account = await self.get_account(address)
+        return Decimal(account.get("balance", 0)) / 10 ** TRX_DECIMALS
+
+    async def get_balances(self, addresses: List[str]) -> Dict[str, Decimal]:
+        accounts = await self.get_accounts(addresses)
+        return {address: Decimal(account.get("balance", 0)) / 10 ** TRX_DECIMALS for address, account in accounts.items()}
+
+    async def trc20_balance_of(self, owner: str, contract: str) -> int:
+        """Raw TRC-20 balanceOf(owner) in base units"""
+        result = await self._post("/wallet/triggerconstantcontract", {
+            "owner_address": owner,
+            "contract_address": contract,
+            "function_selector": "balanceOf(address)",
+            "parameter": tron_address_to_abi(owner),
+            "visible": True
+        })
+        constant_result = result.get("constant_result") or ["0"]
+        return int(constant_result[0] or "0", 16)
+
+    async def get_trc20_balances(self, owner: str, contracts: List[str]) -> Dict[str, int]:
+        """Fetch balanceOf for several TRC-20 contracts concurrently"""
+        balances = await asyncio.gather(*[self.trc20_balance_of(owner, contract) for contract in contracts])
+        return dict(zip(contracts, balances))
+
+tron_client: Optional[TronClient] = None  # Created by init_clients()
+
+def tron_token_list(wallet: Dict[str, Any]) -> List[TokenInfo]:
+    """A TRON wallet's stored tokens plus the default TRC-20 tokens, with stored balances"""
+    tokens = [TokenInfo(**token) for token in wallet.get("tokens") or []]
+    known = {token.token_address for token in tokens}
+    return tokens + [token.model_copy() for token in TRC20_DEFAULT_TOKENS if token.token_address not in known]
+
+async def get_tron_token_balances(wallet: Dict[str, Any]) -> List[TokenInfo]:
+    """Live TRX and TRC-20 balances for a TRON wallet, falling back to the stored values"""
+    try:
+        return await fetch_tron_token_balances(wallet)
+    except Exception as e:
+        logging.error("Error getting TRON token balances: %s", e)
+        return tron_token_list(wallet)
+
+async def fetch_tron_token_balances(wallet: Dict[str, Any]) -> List[TokenInfo]:
+    """Live TRX and TRC-20 balances for a TRON wallet; raises if the node call fails"""
+    tokens = tron_token_list(wallet)
+    contracts = [token.token_address for token in tokens if token.token_address != "native"]
+    
+    async def load():
+        trx_balance, trc20_balances = await asyncio.gather(
+            tron_client.get_balance(wallet["address"]),
+            tron_client.get_trc20_balances(wallet["address"], contracts)
+        )
+        return {"native": str(trx_balance), **{contract: str(balance) for contract, balance in trc20_balances.items()}}
+    
+    balances = await cached(f"tokens:TRON:{wallet['address']}:{','.join(sorted(contracts))}", token_cache_ttl, load)
+    
+    for token in tokens:
+        if token.token_address == "native":
+            token.balance = balances["native"]
+        else:
+            token.balance = from_base_units(int(balances[token.token_address]), token.decimals)
+    return tokens
+
+# Fee oracle
+def _percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of values"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+class FeeOracle:
+    """Samples fee data in the background and serves percentile estimates from memory.
+
+    With several workers only the one holding the per-chain lease in the shared cache samples
+    the node; it publishes its estimates there and the other workers serve those.
+    """
+
+    # Reward percentiles requested from eth_feeHistory: slow, standard, fast
+    ETH_REWARD_PERCENTILES = [10, 50, 90]
+    # Percentiles over the sampled Solana prioritization fees: slow, standard, fast
+    SOL_PERCENTILES = [25, 50, 90]
+    SOL_BASE_FEE_LAMPORTS = 5000  # Per signature
+    SOL_COMPUTE_UNITS = 200_000  # Default compute unit limit of a transaction
+
+    # Used until the first samples arrive (and for TRON, which has no fee market)
+    DEFAULTS = {
+        "ETH": FeeEstimate(chain_type="ETH", unit="Gwei", slow=1.0, standard=1.5, fast=2.0, base_fee=18.5),
+        "SOL": FeeEstimate(chain_type="SOL", unit="micro-lamports/CU", slow=0, standard=0, fast=0, base_fee=5000),
+        "TRON": FeeEstimate(chain_type="TRON", unit="TRX", slow=0.01, standard=0.01, fast=0.01),
+    }
+
+    def __init__(self, eth_window: int = 20, sol_window: int = 150):
+        # Ring buffers of (block, [slow, standard, fast] priority fee in wei) and (slot, micro-lamports)
+        self.eth_rewards = deque(maxlen=eth_window)
+        self.sol_fees = deque(maxlen=sol_window)
+        self.eth_next_base_fee: Optional[int] = None
+        self.last_eth_block = -1
+        self.last_sol_slot = -1
+        self.updated_at: Dict[str, datetime] = {}
+        self._tasks: List[asyncio.Task] = []
+        self.worker_id = uuid.uuid4().hex
+        self.leading: Dict[str, bool] = {}
+        self.published: Dict[str, FeeEstimate] = {}
+
+    async def sample_ethereum(self):
+        """Pull eth_feeHistory for the blocks seen since the last sample"""
+        block_count = self.eth_rewards.maxlen if self.last_eth_block < 0 else 4
+        history = await json_rpc(eth_rpc_url, "eth_feeHistory", [hex(block_count), "latest", self.ETH_REWARD_PERCENTILES])
+        oldest_block = int(history["oldestBlock"], 16)
+        for offset, rewards in enumerate(history.get("reward") or []):
+            block = oldest_block + offset
+            if block <= self.last_eth_block:
+                continue
+            self.eth_rewards.append((block, [int(reward, 16) for reward in rewards]))
+            self.last_eth_block = block
+        # The last base fee entry is the one of the next (pending) block
+        self.eth_next_base_fee = int(history["baseFeePerGas"][-1], 16)
+        self.updated_at["ETH"] = datetime.utcnow()
+
+    async def sample_solana(self):
+        """Pull getRecentPrioritizationFees and keep the slots not seen yet"""
+        fees = await json_rpc(sol_rpc_url, "getRecentPrioritizationFees")
+        for entry in sorted(fees or [], key=lambda item: item["slot"]):
+            if entry["slot"] <= self.last_sol_slot:
+                continue
+            self.sol_fees.append((entry["slot"], entry["prioritizationFee"]))
+            self.last_sol_slot = entry["slot"]
+        self.updated_at["SOL"] = datetime.utcnow()
+
+    async def _poll(self, name: str, sampler, interval: float):
+        while True:
+            try:
+                self.leading[name] = await acquire_lease(f"fee-oracle:leader:{name}", self.worker_id, interval * 3)
+                if self.leading[name]:
+                    await sampler()
+                    estimate = self._local_estimate(name)
+                    if estimate:
+                        await cache.set(f"fees:{name}", estimate.model_dump(mode="json"), interval * 5)
+                else:
+                    published = await cache.get(f"fees:{name}")
+                    if published:
+                        self.published[name] = FeeEstimate(**published)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.warning("Fee oracle %s sample failed: %s", name, e)
+            await asyncio.sleep(interval)
+
+    def start(self):
+        """Start the background samplers on the running event loop"""
+        self._tasks = [
+            asyncio.create_task(self._poll("ETH", self.sample_ethereum, fee_oracle_eth_interval)),
+            asyncio.create_task(self._poll("SOL", self.sample_solana, fee_oracle_sol_interval)),
+        ]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def estimate(self, chain_type: str) -> FeeEstimate:
+        """Return slow/standard/fast estimates for a chain without any RPC call"""
+        if not self.leading.get(chain_type) and chain_type in self.published:
+            return self.published[chain_type].model_copy()
+        return self._local_estimate(chain_type) or self.DEFAULTS.get(chain_type, self.DEFAULTS["ETH"]).model_copy()
+
+    def _local_estimate(self, chain_type: str) -> Optional[FeeEstimate]:
+        if chain_type == "ETH" and self.eth_rewards:
+            tiers = [
+                _percentile([rewards[i] for _, rewards in self.eth_rewards], 50) / 1e9
+                for i in range(len(self.ETH_REWARD_PERCENTILES))
+            ]
+            return FeeEstimate(
+                chain_type="ETH",
+                unit="Gwei",
+                slow=tiers[0],
+                standard=tiers[1],
+                fast=tiers[2],
+                base_fee=(self.eth_next_base_fee or 0) / 1e9,
+                sample_size=len(self.eth_rewards),
+                updated_at=self.updated_at.get("ETH")
+            )
+        if chain_type == "SOL" and self.sol_fees:
+            fees = [fee for _, fee in self.sol_fees]
+            tiers = [_percentile(fees, pct) for pct in self.SOL_PERCENTILES]
+            return FeeEstimate(
+                chain_type="SOL",
+                unit="micro-lamports/CU",
+                slow=tiers[0],
+                standard=tiers[1],
+                fast=tiers[2],
+                base_fee=self.SOL_BASE_FEE_LAMPORTS,
+                sample_size=len(self.sol_fees),
+                updated_at=self.updated_at.get("SOL")
+            )
+        return None
+
+    def gas_price(self, chain_type: str, speed: str = "standard") -> str:
+        """Human readable gas price for a transaction record"""
+        estimate = self.estimate(chain_type)
+        tier = getattr(estimate, speed)
+        if chain_type == "ETH":
+            return f"{(estimate.base_fee or 0) + tier:.2f} Gwei"
+        if chain_type == "SOL":
+            return f"{int(estimate.base_fee or 0)} lamports + {int(tier)} micro-lamports/CU"
+        return f"{tier} TRX"
+
+    def network_fee(self, chain_type: str, is_token: bool = False, speed: str = "standard") -> float:
+        """Expected fee of a transfer in native units"""
+        estimate = self.estimate(chain_type)
+        tier = getattr(estimate, speed)
+        if chain_type == "ETH":
+            gas_limit = 65_000 if is_token else 21_000
+            return gas_limit * ((estimate.base_fee or 0) + tier) / 1e9
+        if chain_type == "SOL":
+            lamports = (estimate.base_fee or 0) + tier * self.SOL_COMPUTE_UNITS / 1_000_000
+            return lamports / 1_000_000_000
+        return tier
+
+fee_oracle = FeeOracle(eth_window=fee_oracle_eth_window, sol_window=fee_oracle_sol_window)
+
+# Bundle execution
+ERC20_APPROVE_SELECTOR = "0x095ea7b3"
+ERC20_TRANSFER_SELECTOR = "0xa9059cbb"
+ERC20_TRANSFER_TOPIC = "0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef"  # Transfer(address,address,uint256)
+
+signing_pool: Optional[ThreadPoolExecutor] = None  # Created by init_clients()
+
+class BundleEntry(BaseModel):
+    index: int
+    key: str
+    to_address: Optional[str] = None
+    amount: Optional[str] = None
+    token_symbol: str
+    token_address: Optional[str] = None
+    data: Optional[str] = None
+    depends_on: List[str] = []
+    nonce: Optional[int] = None
+    tx_hash: Optional[str] = None
+    raw_transaction: Optional[str] = None
+    error: Optional[str] = None
+
+class BundleExecutor:
+    """Orders bundle entries by dependency, pre-assigns nonces, signs in parallel and broadcasts per level"""
+
+    def __init__(self, wallet: Dict[str, Any], bundle_data: TransactionBundle):
+        self.wallet = wallet
+        self.bundle_data = bundle_data
+        self.bundle_id = str(uuid.uuid4())
+        self.chain_type = wallet["chain_type"]
+        self.entries = self._parse_entries(bundle_data.transactions)
+        self.levels = self._topological_levels()
+
+    def _parse_entries(self, raw_entries: List[Dict[str, Any]]) -> List[BundleEntry]:
+        entries = []
+        for index, tx_data in enumerate(raw_entries):
+            depends_on = tx_data.get("depends_on") or []
+            if not isinstance(depends_on, list):
+                depends_on = [depends_on]
+            entries.append(BundleEntry(
+                index=index,
+                key=str(tx_data.get("id", index)),
+                to_address=normalize_address(tx_data.get("to_address")),
+                amount=tx_data.get("amount"),
+                token_symbol=tx_data.get("token_symbol", self.chain_type),
+                token_address=tx_data.get("token_address"),
+                data=tx_data.get("data"),
+                depends_on=[str(dep) for dep in depends_on]
+            ))
+        
+        keys = [entry.key for entry in entries]
+        if len(set(keys)) != len(keys):
+            raise HTTPException(status_code=400, detail="Bundle entry ids must be unique")
+        
+        # An approve() makes every later entry that calls the approved spender depend on it
+        for approval in entries:
+            data = (approval.data or "").lower()
+            if not data.startswith(ERC20_APPROVE_SELECTOR) or len(data) < 74:
+                continue
+            spender = "0x" + data[34:74]
+            for entry in entries[approval.index + 1:]:
+                if (entry.to_address or "").lower() == spender and approval.key not in entry.depends_on:
+                    entry.depends_on.append(approval.key)
+        return entries
+
+    def _topological_levels(self) -> List[List[BundleEntry]]:
+        """Group entries into levels whose members only depend on earlier levels (Kahn's algorithm)"""
+        by_key = {entry.key: entry for entry in self.entries}
+        remaining = {}
+        for entry in self.entries:
+            unknown = [dep for dep in entry.depends_on if dep not in by_key]
+            if unknown:
+                raise HTTPException(status_code=400, detail=f"Bundle entry {entry.key} depends on unknown entries: {unknown}")
+            remaining[entry.key] = set(entry.depends_on)
+        
+        levels = []
+        while remaining:
+            ready = [key for key, deps in remaining.items() if not deps]
+            if not ready:
+                raise HTTPException(status_code=400, detail="Bundle entries contain a dependency cycle")
+            levels.append(sorted((by_key[key] for key in ready), key=lambda entry: entry.index))
+            for key in ready:
+                del remaining[key]
+            for deps in remaining.values():
+                deps.difference_update(ready)
+        return levels
+
+    def _token_decimals(self, token_address: Optional[str]) -> int:
+        return token_decimals(self.wallet, token_address)
+
+    def _validate(self, entry: BundleEntry):
+        from eth_utils import is_address
+        
+        if not entry.to_address:
+            raise ValueError("to_address is required")
+        to_base_units(entry.amount, self._token_decimals(entry.token_address))
+        if self.chain_type == "ETH" and not is_address(entry.to_address):
+            raise ValueError(f"Invalid Ethereum address: {entry.to_address}")
+
+    def _sign_batch(self, entries: List[BundleEntry], private_key: Optional[bytearray]) -> List[Optional[Exception]]:
+        """Sign a run of entries as one signing pool task, returning each entry's failure if any"""
+        errors = []
+        for entry in entries:
+            try:
+                self._sign(entry, private_key)
+                errors.append(None)
+            except Exception as e:
+                errors.append(e)
+        return errors
+
+    def _sign(self, entry: BundleEntry, private_key: Optional[bytearray]):
+        """Sign one entry"""
+        from eth_account import Account
+        from eth_utils import to_checksum_address
+        
+        if self.chain_type != "ETH":
+            # Only ETH keys are derived for real in this demo; other chains get a deterministic digest
+            payload = json.dumps([self.bundle_id, entry.index, entry.to_address, entry.amount, entry.token_address, entry.data])
+            entry.tx_hash = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+            return
+        
+        base_units = to_base_units(entry.amount, self._token_decimals(entry.token_address))
+        to_address = to_checksum_address(entry.to_address)
+        tx = {"nonce": entry.nonce, "to": to_address, "value": 0, "data": entry.data or "0x", "chainId": eth_chain_id}
+        if entry.data:
+            tx["gas"] = 100_000
+        elif entry.token_address:
+            tx["to"] = to_checksum_address(entry.token_address)
+            tx["data"] = ERC20_TRANSFER_SELECTOR + to_address[2:].lower().rjust(64, "0") + hex(base_units)[2:].rjust(64, "0")
+            tx["gas"] = 65_000
+        else:
+            tx["value"] = base_units
+            tx["gas"] = 21_000
+        
+        estimate = fee_oracle.estimate("ETH")
+        tip = int(estimate.standard * 1e9)
+        tx["maxPriorityFeePerGas"] = tip
+        tx["maxFeePerGas"] = int(2 * (estimate.base_fee or 0) * 1e9) + tip
+        
+        signed = Account.sign_transaction(tx, private_key)
+        entry.tx_hash = "0x" + bytes(signed.hash).hex()
+        entry.raw_transaction = "0x" + bytes(getattr(signed, "raw_transaction", None) or signed.rawTransaction).hex()
+
+    async def _reserve_nonces(self, count: int) -> Optional[int]:
+        """Atomically reserve a contiguous nonce range; returns the first nonce"""
+        if self.chain_type != "ETH" or count == 0:
+            return None
+        chain_nonce = 0
+        try:
+            chain_nonce = int(await json_rpc(eth_rpc_url, "eth_getTransactionCount", [self.wallet["address"], "pending"]), 16)
+        except Exception as e:
+            logging.warning("Could not read pending nonce, using stored counter: %s", e)
+        
+        # Never hand out a nonce below the chain's pending count or one already reserved locally
+        wallet = await db.wallets.find_one_and_update(
+            {"wallet_id": self.wallet["wallet_id"]},
+            [{"$set": {"next_nonce": {"$add": [{"$max": [{"$ifNull": ["$next_nonce", 0]}, chain_nonce]}, count]}}}],
+            return_document=ReturnDocument.AFTER
+        )
+        return wallet["next_nonce"] - count
+
+    async def _release_nonces(self, start: Optional[int], count: int):
+        """Give an unused range back, unless another bundle reserved after it"""
+        if start is None:
+            return
+        await db.wallets.update_one(
+            {"wallet_id": self.wallet["wallet_id"], "next_nonce": start + count},
+            {"$set": {"next_nonce": start}}
+        )
+
+    async def _broadcast(self, level: List[BundleEntry]):
+        """Send one dependency level as a single JSON-RPC batch"""
+        signed = [entry for entry in level if entry.raw_transaction]
+        if not broadcast_transactions or not signed:
+            return
+        try:
+            responses = await json_rpc_batch(eth_rpc_url, [("eth_sendRawTransaction", [entry.raw_transaction]) for entry in signed])
+        except Exception as e:
+            for entry in signed:
+                entry.error = f"Broadcast failed: {e}"
+            return
+        for entry, response in zip(signed, responses):
+            if response.get("error"):
+                entry.error = f"Broadcast failed: {response['error']}"
+
+    async def execute(self) -> List[Transaction]:
+        # Validate everything first so that nonces are only reserved for entries that can be signed
+        for entry in self.entries:
+            try:
+                self._validate(entry)
+            except ValueError as e:
+                entry.error = str(e)
+        self._fail_dependents()
+        
+        aborted = self.bundle_data.atomic and any(entry.error for entry in self.entries)
+        signable = [] if aborted else [entry for level in self.levels for entry in level if not entry.error]
+        
+        # The key is loaded first: a wallet whose key can't be decrypted must not leave a nonce gap
+        key = await signing_key(self.wallet) if self.chain_type == "ETH" and signable else None
+        nonce_start = None
+        try:
+            nonce_start = await self._reserve_nonces(len(signable))
+            if nonce_start is not None:
+                for offset, entry in enumerate(signable):
+                    entry.nonce = nonce_start + offset
+            
+            # One pool task per batch rather than per entry, with at most one batch per worker
+            batch_size = max(1, math.ceil(len(signable) / bundle_signing_workers))
+            batches = [signable[start:start + batch_size] for start in range(0, len(signable), batch_size)]
+            loop = asyncio.get_running_loop()
+            results = await asyncio.gather(
+                *[loop.run_in_executor(signing_pool, self._sign_batch, batch, key) for batch in batches]
+            )
+        except Exception:
+            await self._release_nonces(nonce_start, len(signable))
+            raise
+        finally:
+            if key is not None:
+                zeroize(key)
+        for batch, errors in zip(batches, results):
+            for entry, error in zip(batch, errors):
+                if error is not None:
+                    entry.error = f"Signing failed: {error}"
+        
+        if self.bundle_data.atomic and any(entry.error for entry in self.entries):
+            aborted = True
+            await self._release_nonces(nonce_start, len(signable))
+        
+        if not aborted:
+            for level in self.levels:
+                self._fail_dependents()
+                await self._broadcast([entry for entry in level if not entry.error])
+        
+        transactions = [self._to_transaction(entry, aborted) for entry in self.entries]
+        if transactions and not aborted:
+            await db.transactions.insert_many(
+                [transaction_document(tx, self._token_decimals(tx.token_address)) for tx in transactions], ordered=False
+            )
+            await record_daily_stats(transactions)
+        
+        failed = sum(1 for tx in transactions if tx.status == "failed")
+        await db.transaction_bundles.insert_one({
+            "bundle_id": self.bundle_id,
+            "wallet_id": self.bundle_data.wallet_id,
+            "name": self.bundle_data.name,
+            "description": self.bundle_data.description,
+            "transaction_count": len(transactions),
+            "failed_count": failed,
+            "atomic": self.bundle_data.atomic,
+            "status": "aborted" if aborted else "partial" if failed else "confirmed",
+            "timestamp": datetime.utcnow()
+        })
+        return transactions
+
+    def _fail_dependents(self):
+        """Propagate failures to every entry that depends on a failed one"""
+        failed = {entry.key for entry in self.entries if entry.error}
+        for level in self.levels:
+            for entry in level:
+                if not entry.error and failed.intersection(entry.depends_on):
+                    entry.error = "Dependency failed"
+                    failed.add(entry.key)
+
+    def _to_transaction(self, entry: BundleEntry, aborted: bool) -> Transaction:
+        error = entry.error or ("Bundle aborted" if aborted else None)
+        return Transaction(
+            wallet_id=self.bundle_data.wallet_id,
+            from_address=self.wallet["address"],
+            to_address=entry.to_address or "",
+            amount=entry.amount or "0",
+            token_symbol=entry.token_symbol,
+            token_address=entry.token_address,
+            tx_hash=None if error else entry.tx_hash,
+            status="failed" if error else ("pending" if broadcast_transactions else "confirmed"),  # Demo mode confirms immediately
+            gas_price=fee_oracle.gas_price(self.chain_type),
+            bundle_id=self.bundle_id,
+            data=entry.data,
+            nonce=entry.nonce,
+            error=error
+        )
+
+# Deposit ingestion
+# Follows the ETH and SOL chain heads and records transfers into any managed wallet as
+# incoming transactions. Recipients are screened against a Bloom filter of every wallet
+# address, so a block costs a few hash probes per transfer whatever the number of wallets;
+# the rare filter hits are confirmed against the wallets.address index.
+class BloomFilter:
+    """Fixed-size Bloom filter over strings (double hashing on one blake2b digest)"""
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.size = max(64, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hash_count)]
+
+    def add(self, key: str):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+def address_filter_key(address: str) -> str:
+    """Case-folded EVM addresses, base58 as is: cheaper per transfer than checksumming"""
+    return address.lower() if EVM_ADDRESS_PATTERN.match(address) else address
+
+def _hex_int(value: Optional[str]) -> int:
+    return int(value, 16) if value and value != "0x" else 0
+
+SOLANA_SKIPPED_SLOT_CODES = {-32007, -32009}  # Slot skipped / missing from long-term storage
+
+class DepositIngestor:
+    """Polls new blocks/slots, filters their recipients and bulk-inserts matching deposits"""
+
+    def __init__(self):
+        self.filter: Optional[BloomFilter] = None
+        self.filter_built_at = 0.0
+        self.wallets_seen_until: Optional[datetime] = None
+        self.worker_id = uuid.uuid4().hex
+        self._tasks: List[asyncio.Task] = []
+
+    # Address filter
+    async def rebuild_filter(self):
+        """Load every wallet address into a fresh filter sized for twice the current count"""
+        count = await db.wallets.estimated_document_count()
+        address_filter = BloomFilter(max(1024, count * 2), ingest_bloom_error_rate)
+        seen_until = None
+        async for wallet in db.wallets.find({}, {"_id": 0, "address": 1, "created_at": 1}).batch_size(10_000):
+            address_filter.add(address_filter_key(wallet["address"]))
+            if wallet.get("created_at") and (seen_until is None or wallet["created_at"] > seen_until):
+                seen_until = wallet["created_at"]
+        self.filter, self.wallets_seen_until = address_filter, seen_until
+        self.filter_built_at = time.monotonic()
+
+    async def refresh_filter(self):
+        """Add wallets created since the last load; rebuild periodically to drop changed addresses"""
+        if self.filter is None or time.monotonic() - self.filter_built_at > ingest_filter_rebuild_seconds:
+            await self.rebuild_filter()
+            return
+        query = {"created_at": {"$gt": self.wallets_seen_until}} if self.wallets_seen_until else {}
+        async for wallet in db.wallets.find(query, {"_id": 0, "address": 1, "created_at": 1}):
+            self.filter.add(address_filter_key(wallet["address"]))
+            if wallet.get("created_at") and (self.wallets_seen_until is None or wallet["created_at"] > self.wallets_seen_until):
+                self.wallets_seen_until = wallet["created_at"]
+
+    async def _managed_wallets(self, candidates: set) -> Dict[str, Dict[str, Any]]:
+        """Confirm filter hits: wallets by filter key for the candidates that really are ours"""
+        if not candidates:
+            return {}
+        wallets = await db.wallets.find(
+            {"address": {"$in": [normalize_address(address) for address in candidates]}},
+            {"_id": 0, "wallet_id": 1, "address": 1, "chain_type": 1, "tokens": 1}
+        ).to_list(None)
+        return {address_filter_key(wallet["address"]): wallet for wallet in wallets}
+
+    # Block parsing
+    def _ethereum_transfers(self, block: Dict[str, Any], receipts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Native value received by a block's successful transactions; reverted ones move nothing"""
+        transfers = []
+        succeeded = {receipt["transactionHash"] for receipt in receipts if receipt.get("status") == "0x1"}
+        timestamp = datetime.utcfromtimestamp(_hex_int(block.get("timestamp")))
+        for tx in block.get("transactions") or []:
+            value = _hex_int(tx.get("value"))
+            if not value or not tx.get("to") or tx["hash"] not in succeeded:
+                continue
+            transfers.append({
+                "tx_hash": tx["hash"], "from_address": tx["from"], "to_address": tx["to"], "token_address": None,
+                "units": value, "timestamp": timestamp, "block": _hex_int(block["number"])
+            })
+        return transfers
+
+    def _erc20_transfers(self, logs: List[Dict[str, Any]], timestamps: Dict[int, datetime]) -> List[Dict[str, Any]]:
+        """ERC-20 Transfer events, including those from calls made through routers and multisigs"""
+        transfers = []
+        for log in logs:
+            topics = log.get("topics") or []
+            # ERC-721 shares the event signature but indexes the token id as a fourth topic
+            if log.get("removed") or len(topics) != 3 or topics[0] != ERC20_TRANSFER_TOPIC:
+                continue
+            number = _hex_int(log["blockNumber"])
+            transfers.append({
+                "tx_hash": log["transactionHash"], "from_address": "0x" + topics[1][-40:], "to_address": "0x" + topics[2][-40:],
+                "token_address": log["address"], "units": _hex_int(log.get("data")), "timestamp": timestamps[number],
+                "block": number, "log_index": _hex_int(log.get("logIndex"))
+            })
+        return transfers
+
+    def _solana_transfers(self, slot: int, block: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Accounts whose SOL or SPL token balance went up in a block's successful transactions"""
+        transfers = []
+        timestamp = datetime.utcfromtimestamp(block.get("blockTime") or time.time())
+        for item in block.get("transactions") or []:
+            meta = item.get("meta") or {}
+            if meta.get("err"):
+                continue
+            message = item["transaction"]["message"]
+            loaded = meta.get("loadedAddresses") or {}
+            keys = [key if isinstance(key, str) else key["pubkey"] for key in message["accountKeys"]]
+            keys += (loaded.get("writable") or []) + (loaded.get("readonly") or [])
+            base = {"tx_hash": item["transaction"]["signatures"][0], "from_address": keys[0], "timestamp": timestamp, "block": slot}
+            for key, before, after in zip(keys, meta.get("preBalances") or [], meta.get("postBalances") or []):
+                if after > before and key != keys[0]:
+                    transfers.append({**base, "to_address": key, "token_address": None, "units": after - before})
+            before_tokens = {entry["accountIndex"]: int(entry["uiTokenAmount"]["amount"]) for entry in meta.get("preTokenBalances") or []}
+            for entry in meta.get("postTokenBalances") or []:
+                units = int(entry["uiTokenAmount"]["amount"]) - before_tokens.get(entry["accountIndex"], 0)
+                if units > 0 and entry.get("owner"):
+                    transfers.append({
+                        **base, "to_address": entry["owner"], "token_address": entry["mint"], "units": units,
+                        "decimals": entry["uiTokenAmount"]["decimals"]
+                    })
+        return transfers
+
+    async def _record(self, chain_type: str, transfers: List[Dict[str, Any]]) -> int:
+        """Store the transfers into managed wallets; re-processing a block is a no-op"""
+        candidates = {transfer["to_address"] for transfer in transfers if address_filter_key(transfer["to_address"]) in self.filter}
+        wallets = await self._managed_wallets(candidates)
+        transactions = []
+        documents = []
+        for transfer in transfers:
+            wallet = wallets.get(address_filter_key(transfer["to_address"]))
+            if not wallet:
+                continue  # Bloom filter false positive
+            decimals = transfer.get("decimals", token_decimals(wallet, transfer["token_address"]))
+            symbol = "UNKNOWN" if transfer["token_address"] else {"TRON": "TRX"}.get(chain_type, chain_type)
+            for token in wallet.get("tokens") or []:
+                if transfer["token_address"] and token["token_address"].lower() == transfer["token_address"].lower():
+                    symbol = token["symbol"]
+            # Deterministic id: the unique tx_id index turns a replayed block into duplicates
+            tx_id = f"deposit:{chain_type}:{transfer['tx_hash']}:{transfer['to_address']}:{transfer['token_address'] or 'native'}"
+            if "log_index" in transfer:
+                tx_id += f":{transfer['log_index']}"  # One transaction can emit several transfers to the same wallet
+            tx = Transaction(
+                tx_id=tx_id,
+                wallet_id=wallet["wallet_id"],
+                from_address=normalize_address(transfer["from_address"]),
+                to_address=wallet["address"],
+                amount=from_base_units(transfer["units"], decimals),
+                token_symbol=symbol,
+                token_address=transfer["token_address"],
+                tx_hash=transfer["tx_hash"],
+                status="confirmed",
+                timestamp=transfer["timestamp"],
+                direction="incoming",
+                block_number=transfer["block"]
+            )
+            transactions.append(tx)
+            documents.append(transaction_document(tx, decimals))
+        if not documents:
+            return 0
+        duplicates = set()
+        try:
+            await db.transactions.insert_many(documents, ordered=False)
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            if any(error.get("code") != 11000 for error in errors):
+                raise
+            duplicates = {error["index"] for error in errors}
+        # Only deposits seen for the first time count towards the rollups, not replays of a block
+        inserted = [tx for index, tx in enumerate(transactions) if index not in duplicates]
+        await record_daily_stats(inserted)
+        DEPOSITS_DETECTED.labels(chain_type).inc(len(inserted))
+        return len(inserted)
+
+    # Head following
+    async def _cursor(self, chain_type: str, head: int) -> int:
+        """Last processed block/slot; a new deployment starts at the current head"""
+        state = await db.ingestion_state.find_one({"chain": chain_type})
+        return state["last_block"] if state else head - 1
+
+    async def _advance(self, chain_type: str, last_block: int):
+        await db.ingestion_state.update_one(
+            {"chain": chain_type}, {"$set": {"last_block": last_block, "updated_at": datetime.utcnow()}}, upsert=True
+        )
+
+    async def ingest_ethereum(self) -> int:
+        head = _hex_int(await json_rpc(eth_rpc_url, "eth_blockNumber"))
+        # The cursor never passes a block that could still be reorganised away
+        confirmed = head - eth_ingest_confirmations
+        last = await self._cursor("ETH", confirmed)
+        numbers = list(range(last + 1, min(confirmed, last + ingest_max_blocks) + 1))
+        INGEST_HEAD_LAG.labels("ETH").set(head - last)
+        if not numbers:
+            return 0
+        await self.refresh_filter()
+        # Catch-up blocks, their receipts and the range's Transfer events come back in one batch round trip
+        calls = [("eth_getBlockByNumber", [hex(number), True]) for number in numbers]
+        calls += [("eth_getBlockReceipts", [hex(number)]) for number in numbers]
+        calls.append(("eth_getLogs", [{"fromBlock": hex(numbers[0]), "toBlock": hex(numbers[-1]), "topics": [ERC20_TRANSFER_TOPIC]}]))
+        responses = await json_rpc_batch(eth_rpc_url, calls)
+        for (method, params), response in zip(calls, responses):
+            if "error" in response or response.get("result") is None:
+                raise RPCError(f"{method} {params[0]} failed: {response.get('error')}")
+        blocks = [response["result"] for response in responses[:len(numbers)]]
+        receipts = [response["result"] for response in responses[len(numbers):-1]]
+        transfers = []
+        for block, block_receipts in zip(blocks, receipts):
+            transfers += self._ethereum_transfers(block, block_receipts)
+        timestamps = {_hex_int(block["number"]): datetime.utcfromtimestamp(_hex_int(block.get("timestamp"))) for block in blocks}
+        transfers += self._erc20_transfers(responses[-1]["result"], timestamps)
+        inserted = await self._record("ETH", transfers)
+        await self._advance("ETH", numbers[-1])
+        return inserted
+
+    async def ingest_solana(self) -> int:
+        head = await json_rpc(sol_rpc_url, "getSlot", [{"commitment": "confirmed"}])
+        last = await self._cursor("SOL", head)
+        slots = list(range(last + 1, min(head, last + ingest_max_blocks) + 1))
+        INGEST_HEAD_LAG.labels("SOL").set(head - last)
+        if not slots:
+            return 0
+        await self.refresh_filter()
+        options = {
+            "encoding": "json", "transactionDetails": "full", "rewards": False,
+            "commitment": "confirmed", "maxSupportedTransactionVersion": 0
+        }
+        responses = await json_rpc_batch(sol_rpc_url, [("getBlock", [slot, options]) for slot in slots])
+        transfers = []
+        for slot, response in zip(slots, responses):
+            error = response.get("error")
+            if error:
+                if isinstance(error, dict) and error.get("code") in SOLANA_SKIPPED_SLOT_CODES:
+                    continue  # No block was produced in this slot
+                raise RPCError(f"getBlock {slot} failed: {error}")
+            if response.get("result"):
+                transfers += self._solana_transfers(slot, response["result"])
+        inserted = await self._record("SOL", transfers)
+        await self._advance("SOL", slots[-1])
+        return inserted
+
+    async def _poll(self, chain_type: str, ingest, interval: float):
+        while True:
+            try:
+                if await acquire_lease(f"ingest:leader:{chain_type}", self.worker_id, interval * 3 + 30):
+                    await ingest()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.warning("Deposit ingestion for %s failed: %s", chain_type, e)
+            await asyncio.sleep(interval)
+
+    def start(self):
+        self._tasks = [
+            asyncio.create_task(self._poll("ETH", self.ingest_ethereum, ingest_eth_interval)),
+            asyncio.create_task(self._poll("SOL", self.ingest_solana, ingest_sol_interval)),
+        ]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+deposit_ingestor = DepositIngestor()
+
+# Local intent classification
+# Balance, token and create-wallet requests make up much of the chat traffic and need no
+# language model. Messages are matched against anchored rules first, then scored by a small
+# naive Bayes model; only a confident match is answered locally. Anything mentioning an action
+# that needs the LLM's parameter extraction or explanation falls through to OpenAI, and so does
+# anything the local answers would get wrong: negations, other times, other people's holdings,
+# other networks or addresses, particular kinds of wallet and questions about the figures.
+LLM_ONLY_HINTS = re.compile(
+    r"\b(send|transfer|pay|owner|sponsor|bundle|swap|stake|bridge|why|explain|history|transactions?)\b"
+)
+LOCAL_INTENT_GUARDS = re.compile(
+    r"(n't|\b(not|no|never|without|stop|cancel|dont|"
+    r"was|were|did|had|used|yesterday|last|ago|before|since|earlier|today|tomorrow|week|month|year|will|would|should|"
+    r"does|he|she|his|her|they|their|them|someone|somebody|binance|coinbase|exchanges?|whales?|exist|supply|total|"
+    r"on|arbitrum|optimism|polygon|matic|base|bsc|bnb|avalanche|avax|layer|l2|testnet|mainnet|network|chain|0x[0-9a-f]+|address|"
+    r"multisig|multi-sig|hardware|cold|paper|smart|shared|joint|custodial|"
+    r"safe|secure|wrong|right|correct|accurate|missing|low|high|enough|risk|scam|hacked|stolen|looks?|seems?)\b)"
+)
+# The model only answers direct requests: a question or command, or a bare noun phrase
+DIRECT_REQUEST = re.compile(
+    r"^(please |can you |could you )?(what|what's|whats|how|which|show|list|check|tell|get|give|display|view|see|"
+    r"do i|i want|i need|create|make|generate|open|set up|add)\b"
+)
+FIRST_PERSON = re.compile(r"\b(my|i|me|mine|i'm|i've)\b")
+# What a message must mention for the model's intent to be taken at its word
+INTENT_KEYWORDS = {
+    "balance": re.compile(r"\b(balance|how much|how rich)\b"),
+    "tokens": re.compile(r"\b(tokens?|usdt|usdc|coins?|erc20|trc20|stablecoins?)\b"),
+    "create_wallet": re.compile(r"\b(create|make|generate|open|set up|add|new)\b.*\bwallet\b"),
+}
+
+INTENT_RULES = [
+    ("balance", re.compile(
+        r"^(please )?((check|show|get|see|view|tell me) )?(what'?s |what is )?(my |the )?(current )?(wallet )?balance( please)?[?.!]*$"
+    )),
+    ("balance", re.compile(r"^how much (eth|ether|sol|trx )?(do i have|is in my wallet|have i got)( left)?[?.!]*$")),
+    ("tokens", re.compile(
+        r"^(please )?((show|list|check|see|view)( me)? )?(my |the )?(wallet'?s? )?tokens?( balances?| holdings)?( please)?[?.!]*$"
+    )),
+    ("tokens", re.compile(r"^what tokens (do i have|do i hold|are in my wallet)[?.!]*$")),
+    ("create_wallet", re.compile(
+        r"^(please )?(can you )?(create|make|generate|open|set up|add)( me)? (a |an |another )?(new )?"
+        r"((eth|ethereum|sol|solana|tron|trx) )?wallet( for me)?( please)?[?.!]*$"
+    )),
+]
+
+INTENT_EXAMPLES = {
+    "balance": [
+        "what is my balance", "check balance", "how much do i have", "show my balance", "what's in my wallet",
+        "how much eth do i own", "balance please", "current wallet balance", "how much money is in this wallet",
+        "tell me my balance", "how much sol do i have left", "how much trx is in my account", "get my balance",
+        "what's my eth balance", "how rich am i",
+    ],
+    "tokens": [
+        "show my tokens", "list tokens", "what tokens do i hold", "token balances", "which tokens are in this wallet",
+        "my usdt balance", "how much usdc do i have", "show token holdings", "list my erc20 tokens",
+        "do i have any tokens", "show my trc20 tokens", "what coins do i hold besides eth", "my stablecoin balances",
+        "how much usdt do i have", "how many tokens do i have", "usdc balance",
+    ],
+    "create_wallet": [
+        "create a wallet", "make a new wallet", "i want a new ethereum wallet", "generate a solana wallet",
+        "open a tron wallet", "set up another wallet", "new wallet please", "can you create a wallet for me",
+        "i need a new wallet", "add a wallet", "create an eth wallet", "make me a sol wallet",
+    ],
+    "other": [
+        "what is a gas fee", "explain how solana works", "is ethereum a good investment", "what is a seed phrase",
+        "how do i keep my wallet safe", "what is the difference between eth and sol", "hello", "thanks",
+        "who are you", "what can you do", "what is tron", "why did my transaction fail", "what is a nonce",
+        "how long do transactions take", "tell me a joke", "what is usdt", "which wallet is best", "what is a token",
+        "how do wallets work", "can i recover a lost wallet", "what is the price of eth", "is my wallet secure",
+        "how are fees calculated", "what network is this", "delete my wallet",
+        "how much is eth worth", "what is the price of sol", "how much does a transfer cost", "how much gas is needed",
+    ],
+}
+
+def intent_features(text: str) -> List[str]:
+    words = re.findall(r"[a-z0-9']+", text)
+    return words + [f"{first} {second}" for first, second in zip(words, words[1:])]
+
+class IntentModel:
+    """Multinomial naive Bayes over word unigrams and bigrams, trained on INTENT_EXAMPLES at import"""
+
+    def __init__(self, examples: Dict[str, List[str]], alpha: float = 0.5):
+        self.alpha = alpha
+        self.counts: Dict[str, Dict[str, int]] = {}
+        self.totals: Dict[str, int] = {}
+        for intent, phrases in examples.items():
+            counts = self.counts.setdefault(intent, {})
+            for phrase in phrases:
+                for feature in intent_features(phrase):
+                    counts[feature] = counts.get(feature, 0) + 1
+            self.totals[intent] = sum(counts.values())
+        self.vocabulary = {feature for counts in self.counts.values() for feature in counts}
+
+    def predict(self, text: str) -> tuple:
+        """Most likely intent and its posterior probability (uniform priors)"""
+        features = [feature for feature in intent_features(text) if feature in self.vocabulary]
+        if not features:
+            return "other", 1.0
+        size = len(self.vocabulary)
+        scores = {
+            intent: sum(
+                math.log((counts.get(feature, 0) + self.alpha) / (self.totals[intent] + self.alpha * size))
+                for feature in features
+            )
+            for intent, counts in self.counts.items()
+        }
+        best = max(scores, key=scores.get)
+        return best, 1 / sum(math.exp(score - scores[best]) for score in scores.values())
+
+intent_model = IntentModel(INTENT_EXAMPLES)
+
+def classify_intent(message: str) -> Optional[tuple]:
+    """(intent, source) when the message can be answered locally, None when it needs the LLM"""
+    text = " ".join(message.lower().split())
+    words = len(text.split())
+    if not text or words > local_intent_max_words or LLM_ONLY_HINTS.search(text) or LOCAL_INTENT_GUARDS.search(text):
+        return None
+    for intent, pattern in INTENT_RULES:
+        if pattern.match(text):
+            return intent, "rule"
+    if words > 3 and not (DIRECT_REQUEST.match(text) or text.endswith("?")):
+        return None
+    intent, confidence = intent_model.predict(text)
+    if intent == "other" or confidence < local_intent_threshold or not INTENT_KEYWORDS[intent].search(text):
+        return None
+    # Balances and tokens are answered from the selected wallet, so the question must be about the user's own
+    if intent != "create_wallet" and words > 3 and not FIRST_PERSON.search(text):
+        return None
+    return intent, "model"
+
+async def answer_intent(intent: str, wallet_id: Optional[str]) -> Dict[str, Any]:
+    """Answer a locally classified intent in the same shape as process_ai_message"""
+    if intent == "create_wallet":
+        return {
+            "response": "Sure, let's create a new wallet. Pick Ethereum, Solana or TRON and give it a name.",
+            "action": {"type": "CREATE_WALLET"}
+        }
+    
+    wallet = await db.wallets.find_one({"wallet_id": wallet_id}) if wallet_id else None
+    if not wallet:
+        return {"response": "Please select a wallet first, then ask me again.", "action": None}
+    
+    if intent == "balance":
+        symbol = NATIVE_SYMBOLS.get(wallet["chain_type"], wallet["chain_type"])
+        try:
+            balance = await fetch_native_balance(wallet["chain_type"], wallet["address"])
+        except Exception as e:
+            logging.error("Error getting balance for local intent: %s", e)
+            return {"response": f"I couldn't reach the {symbol} network just now, please try again.", "action": None}
+        return {
+            "response": f"Your wallet {wallet['name']} holds {balance} {symbol}.",
+            "action": {"type": "CHECK_BALANCE", "wallet_id": wallet_id}
+        }
+    
+    # A token listing is not a native balance check, so no action for the frontend to take
+    tokens = [token if isinstance(token, TokenInfo) else TokenInfo(**token) for token in await wallet_token_balances(wallet)]
+    if tokens:
+        response = f"Your wallet {wallet['name']} holds " + ", ".join(f"{token.balance} {token.symbol}" for token in tokens) + "."
+    else:
+        response = f"Your wallet {wallet['name']} doesn't hold any tokens yet."
+    return {"response": response, "action": None}
+
+# AI admission control
+# OpenAI rate limits are shared by every user, so LLM calls go through a concurrency cap.
+# Waiting requests are queued per priority and per client and served round-robin across
+# clients, so one busy client can't starve the others; requests that can't be served in time
+# are turned away with Retry-After instead of piling onto the provider.
+AI_PRIORITIES = {"interactive": 0, "background": 1}
+
+def client_key(request: Request) -> str:
+    """The caller's address, as seen by nginx when proxied"""
+    return request.headers.get("x-real-ip") or (request.client.host if request.client else "unknown")
+
+class AdmissionController:
+    def __init__(self, max_concurrency: int, max_queue: int, max_queued_per_client: int, queue_timeout: float):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_queued_per_client = max_queued_per_client
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.queued = 0
+        self.queued_by_client: Dict[str, int] = {}
+        # One round-robin ring of clients per priority level, each with its waiters in arrival order
+        self.waiting: List[OrderedDict] = [OrderedDict() for _ in AI_PRIORITIES]
+        self.service_time = 2.0  # Moving average of slot hold time, for Retry-After estimates
+
+    def retry_after(self) -> int:
+        """Seconds until the current backlog should have drained"""
+        return max(1, math.ceil(self.service_time * (self.queued / self.max_concurrency + 1)))
+
+    def reject(self, status_code: int, detail: str, outcome: str):
+        AI_ADMISSIONS.labels(outcome).inc()
+        raise HTTPException(status_code=status_code, detail=detail, headers={"Retry-After": str(self.retry_after())})
+
+    @asynccontextmanager
+    async def slot(self, client: str, priority: str = "interactive"):
+        await self.acquire(client, priority)
+        AI_ACTIVE.inc()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            AI_ACTIVE.dec()
+            self.service_time = 0.8 * self.service_time + 0.2 * (time.perf_counter() - start)
+            self.release()
+
+    async def acquire(self, client: str, priority: str):
+        level = AI_PRIORITIES.get(priority)
+        if level is None:
+            raise HTTPException(status_code=400, detail=f"Priority must be one of {', '.join(AI_PRIORITIES)}")
+        
+        if self.active < self.max_concurrency and not self.queued:
+            self.active += 1
+            AI_ADMISSIONS.labels("admitted").inc()
+            AI_QUEUE_WAIT.labels(priority).observe(0)
+            return
+        if self.queued_by_client.get(client, 0) >= self.max_queued_per_client:
+            self.reject(429, "Too many AI requests in flight for this client", "rejected_client")
+        if self.queued >= self.max_queue:
+            self.reject(503, "AI assistant is at capacity, try again shortly", "rejected_full")
+        
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiting[level].setdefault(client, deque()).append(waiter)
+        self.queued += 1
+        self.queued_by_client[client] = self.queued_by_client.get(client, 0) + 1
+        AI_QUEUE_DEPTH.inc()
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.reject(503, "AI assistant is busy, try again shortly", "timeout")
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release()  # A slot was handed over just as the caller went away
+            raise
+        finally:
+            self._forget(level, client, waiter)
+            AI_QUEUE_WAIT.labels(priority).observe(time.perf_counter() - start)
+        AI_ADMISSIONS.labels("admitted").inc()
+
+    def release(self):
+        """Hand the slot to the next waiter, highest priority first, rotating through clients"""
+        for clients in self.waiting:
+            while clients:
+                client, waiters = next(iter(clients.items()))
+                waiter = waiters.popleft()
+                if waiters:
+                    clients.move_to_end(client)
+                else:
+                    del clients[client]
+                if not waiter.done():
+                    waiter.set_result(None)
+                    return
+        self.active -= 1
+
+    def _forget(self, level: int, client: str, waiter: asyncio.Future):
+        waiters = self.waiting[level].get(client)
+        if waiters is not None and waiter in waiters:
+            waiters.remove(waiter)
+            if not waiters:
+                del self.waiting[level][client]
+        self.queued -= 1
+        self.queued_by_client[client] -= 1
+        if not self.queued_by_client[client]:
+            del self.queued_by_client[client]
+        AI_QUEUE_DEPTH.dec()
+
+ai_admission = AdmissionController(ai_max_concurrency, ai_max_queue, ai_max_queued_per_client, ai_queue_timeout)
+
+def retry_after_seconds(value: Optional[str]) -> Optional[float]:
+    """Delay requested by a Retry-After header, given as seconds or an HTTP-date; None if absent or unparseable"""
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            when = email.utils.parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if when.tzinfo is None:
+            when = when.replace(tzinfo=timezone.utc)
+        seconds = (when - datetime.now(timezone.utc)).total_seconds()
+    return max(0.0, seconds) if math.isfinite(seconds) else None
+
+async def create_completion(messages: List[Dict[str, str]]):
+    """OpenAI chat completion, retrying rate limits and transient errors with jittered backoff"""
+    import openai
+    for attempt in range(ai_retry_attempts + 1):
+        llm_start = time.perf_counter()
+        try:
+            with profile_span("llm"):
+                completion = await get_ai_client().chat.completions.create(
+                    model=ai_model,
+                    messages=messages,
+                    temperature=0.7,
+                )
+        except (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError) as e:
+            rate_limited = isinstance(e, openai.RateLimitError)
+            LLM_DURATION.labels(ai_model, "rate_limited" if rate_limited else "error").observe(time.perf_counter() - llm_start)
+            retry_after = retry_after_seconds(getattr(getattr(e, "response", None), "headers", {}).get("retry-after"))
+            if attempt == ai_retry_attempts:
+                if rate_limited:
+                    raise HTTPException(
+                        status_code=503, detail="AI provider rate limit reached, try again shortly",
+                        headers={"Retry-After": str(max(1, math.ceil(retry_after or ai_retry_base_delay)))}
+                    )
+                raise
+            # Full jitter keeps retries from many requests from arriving in lockstep
+            delay = random.uniform(0, min(ai_retry_max_delay, ai_retry_base_delay * 2 ** attempt))
+            if retry_after is not None:
+                delay = min(ai_retry_max_delay, max(delay, retry_after))
+            LLM_RETRIES.labels(ai_model, "rate_limit" if rate_limited else "transient").inc()
+            await asyncio.sleep(delay)
+        except Exception:
+            LLM_DURATION.labels(ai_model, "error").observe(time.perf_counter() - llm_start)
+            raise
+        else:
+            LLM_DURATION.labels(ai_model, "ok").observe(time.perf_counter() - llm_start)
+            return completion
+
+# AI Assistant functions
+async def process_ai_message(message: str, wallet_id: Optional[str] = None, intent: Optional[tuple] = None) -> Dict[str, Any]:
+    """Process a message with AI and return a response with optional actions.
+    
+    intent is classify_intent's result; a locally classified message is answered without OpenAI.
+    """
+    AI_INTENTS.labels(*(intent or ("unclassified", "llm"))).inc()
+    if intent:
+        return await answer_intent(intent[0], wallet_id)
+    
+    # If no OpenAI API key, just return a basic response
+    if not openai_api_key:
+        return {
+            "response": "I'm a wallet assistant, but I need an OpenAI API key to provide intelligent responses. I can still help with basic wallet operations though!",
+            "action": None
+        }
+    
+    try:
+        # Get wallet context if wallet_id is provided
+        wallet_context = ""
+        if wallet_id:
+            wallet = await db.wallets.find_one({"wallet_id": wallet_id})
+            if wallet:
+                chain_type = wallet["chain_type"]
+                address = wallet["address"]
+                balance = 0
+                
+                if chain_type == "ETH":
+                    balance = await get_ethereum_balance(address)
+                    balance_str = f"{balance} ETH"
+                elif chain_type == "SOL":
+                    balance = await get_solana_balance(address)
+                    balance_str = f"{balance} SOL"
+                elif chain_type == "TRON":
+                    balance = await get_tron_balance(address)
+                    balance_str = f"{balance} TRX"
+                
+                wallet_context = f"Current wallet: {wallet['name']} ({chain_type}) - Address: {address} - Balance: {balance_str}"
+                
+                # Add token information if available
+                if "tokens" in wallet and wallet["tokens"]:
+                    tokens_str = ", ".join([f"{token['balance']} {token['symbol']}" for token in wallet["tokens"]])
+                    wallet_context += f"\nTokens: {tokens_str}"
+                
+                # Add sponsor information if available
+                if "sponsor_address" in wallet and wallet["sponsor_address"]:
+                    wallet_context += f"\nSponsor: {wallet['sponsor_address']}"
+        
+        # Create system message with context
+        system_message = f"""You are a helpful blockchain wallet assistant. 
+You can help users manage their Ethereum, Solana, and TRON wallets.
+Current date: {datetime.now().strftime('%Y-%m-%d')}
+{wallet_context}
+
+If the user wants to perform actions like checking balance, creating a wallet, or sending transactions, 
+you should return a structured action in your response."""
+        
+        # Call OpenAI API
+        completion = await create_completion([
+            {"role": "system", "content": system_message},
+            {"role": "user", "content": message}
+        ])
+        if completion.usage:
+            LLM_TOKENS.labels(ai_model, "prompt").inc(completion.usage.prompt_tokens)
+            LLM_TOKENS.labels(ai_model, "completion").inc(completion.usage.completion_tokens)
+        
+        response_text = completion.choices[0].message.content
+        
+        # Parse for potential actions (in a real app, we'd use a more robust approach)
+        action = None
+        if "CREATE_WALLET" in response_text or "create wallet" in response_text.lower():
+            action = {"type": "CREATE_WALLET"}
+        elif "CHECK_BALANCE" in response_text or "check balance" in response_text.lower():
+            action = {"type": "CHECK_BALANCE", "wallet_id": wallet_id}
+        elif "SEND_TRANSACTION" in response_text or "send transaction" in response_text.lower() or "send tokens" in response_text.lower():
+            action = {"type": "SEND_TRANSACTION", "wallet_id": wallet_id}
+        elif "UPDATE_OWNER" in response_text or "change owner" in response_text.lower():
+            action = {"type": "UPDATE_OWNER", "wallet_id": wallet_id}
         elif "SET_SPONSOR" in response_text or "add sponsor" in response_text.lower():
             action = {"type": "SET_SPONSOR", "wallet_id": wallet_id}
         elif "BUNDLE_TRANSACTION" in response_text or "create bundle" in response_text.lower():
@@ -469,13 +2943,353 @@ you should return a structured action in your response."""
             "response": response_text,
             "action": action
         }
+    except HTTPException:
+        raise
     except Exception as e:
-        logging.error(f"Error in AI processing: {e}")
+        logging.error("Error in AI processing: %s", e)
         return {
             "response": f"I encountered an error while processing your request: {str(e)}",
             "action": None
         }
 
+# Wallet update helpers
+def versioned_wallet_filter(wallet_id: str, expected_version: Optional[int]) -> Dict[str, Any]:
+    """Match a wallet, optionally only at the version the caller last read"""
+    query = {"wallet_id": wallet_id}
+    if expected_version is not None:
+        # Wallets created before versioning have no version field and count as version 0
+        query["version"] = expected_version if expected_version else {"$in": [0, None]}
+    return query
+
+async def raise_wallet_update_failed(wallet_id: str, session=None):
+    """Tell a missing wallet (404) apart from a lost optimistic-concurrency race (409)"""
+    if await db.wallets.count_documents({"wallet_id": wallet_id}, limit=1, session=session):
+        raise HTTPException(status_code=409, detail="Wallet was modified concurrently, reload and retry")
+    raise HTTPException(status_code=404, detail="Wallet not found")
+
+async def transfer_wallet_owner(wallet_id: str, new_address: str, expected_version: Optional[int], session=None) -> Dict[str, Any]:
+    """Swap the wallet address and write the audit record, returning the updated wallet"""
+    # The BEFORE document carries the previous owner for the audit record; the version is
+    # still incremented server-side so wallets created before versioning start from 0
+    now = datetime.utcnow()
+    now = now.replace(microsecond=now.microsecond // 1000 * 1000)  # BSON dates keep milliseconds
+    wallet = await db.wallets.find_one_and_update(
+        versioned_wallet_filter(wallet_id, expected_version),
+        [
+            {"$set": {
+                "address": {"$literal": new_address},
+                "version": {"$add": [{"$ifNull": ["$version", 0]}, 1]},
+                "updated_at": {"$literal": now}
+            }},
+            # Written by earlier releases; the audit record is where the previous owner lives
+            {"$project": {"previous_owner": 0}}
+        ],
+        projection=PUBLIC_WALLET_FIELDS,
+        return_document=ReturnDocument.BEFORE,
+        session=session
+    )
+    if not wallet:
+        await raise_wallet_update_failed(wallet_id, session)
+    
+    wallet.pop("previous_owner", None)
+    updated_wallet = {**wallet, "address": new_address, "version": (wallet.get("version") or 0) + 1, "updated_at": now}
+    
+    await db.ownership_transfers.insert_one({
+        "transfer_id": str(uuid.uuid4()),
+        "wallet_id": wallet_id,
+        "old_owner": wallet["address"],
+        "new_owner": new_address,
+        "version": updated_wallet["version"],
+        "timestamp": now
+    }, session=session)
+    return updated_wallet
+
+# Analytics rollups
+# wallet_daily_stats holds one document per wallet, UTC day and token, kept current with $inc
+# on every insert so dashboards read a few pre-aggregated documents instead of the history.
+def parse_amount(amount: Optional[str]) -> Decimal:
+    """Decimal value of a stored amount string, 0 if it isn't numeric"""
+    try:
+        value = Decimal(amount or "0")
+    except InvalidOperation:
+        return Decimal(0)
+    return value if value.is_finite() else Decimal(0)
+
+async def record_daily_stats(transactions: List[Transaction]):
+    """Fold newly inserted transactions into their daily rollups with one bulk upsert"""
+    rollups: Dict[tuple, Dict[str, Any]] = {}
+    for tx in transactions:
+        if tx.status == "simulated":
+            continue
+        key = (tx.wallet_id, tx.timestamp.strftime("%Y-%m-%d"), tx.token_symbol)
+        rollup = rollups.setdefault(key, {
+            "tx_count": 0, "failed_count": 0, "volume": Decimal(0), "first": tx.timestamp, "last": tx.timestamp
+        })
+        rollup["tx_count"] += 1
+        if tx.status == "failed":
+            rollup["failed_count"] += 1
+        else:
+            rollup["volume"] += parse_amount(tx.amount)
+        rollup["first"] = min(rollup["first"], tx.timestamp)
+        rollup["last"] = max(rollup["last"], tx.timestamp)
+    if not rollups:
+        return
+    
+    requests = [
+        UpdateOne(
+            {"wallet_id": wallet_id, "day": day, "token_symbol": token_symbol},
+            {
+                "$inc": {
+                    "tx_count": rollup["tx_count"],
+                    "failed_count": rollup["failed_count"],
+                    "volume": Decimal128(rollup["volume"])
+                },
+                "$min": {"first_tx_at": rollup["first"]},
+                "$max": {"last_tx_at": rollup["last"]},
+                "$set": {"updated_at": datetime.utcnow()}
+            },
+            upsert=True
+        )
+        for (wallet_id, day, token_symbol), rollup in rollups.items()
+    ]
+    try:
+        await db.wallet_daily_stats.bulk_write(requests, ordered=False)
+    except Exception as e:
+        # The transactions are already stored; backfill_daily_stats() repairs the rollups
+        logging.error("Error updating daily stats: %s", e)
+
+def daily_stats_pipeline(match: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Aggregation that rebuilds wallet_daily_stats from the transactions matching `match`"""
+    is_failed = {"$eq": ["$status", "failed"]}
+    amount = {"$convert": {"input": "$amount", "to": "decimal", "onError": 0, "onNull": 0}}
+    return [
+        {"$match": {**match, "status": {"$ne": "simulated"}}},
+        {"$group": {
+            "_id": {
+                "wallet_id": "$wallet_id",
+                "day": {"$dateToString": {"format": "%Y-%m-%d", "date": "$timestamp"}},
+                "token_symbol": "$token_symbol"
+            },
+            "tx_count": {"$sum": 1},
+            "failed_count": {"$sum": {"$cond": [is_failed, 1, 0]}},
+            "volume": {"$sum": {"$cond": [is_failed, 0, amount]}},
+            "first_tx_at": {"$min": "$timestamp"},
+            "last_tx_at": {"$max": "$timestamp"}
+        }},
+        {"$project": {
+            "_id": 0,
+            "wallet_id": "$_id.wallet_id",
+            "day": "$_id.day",
+            "token_symbol": "$_id.token_symbol",
+            "tx_count": 1,
+            "failed_count": 1,
+            "volume": {"$toDecimal": "$volume"},
+            "first_tx_at": 1,
+            "last_tx_at": 1,
+            "updated_at": "$$NOW"
+        }},
+        {"$merge": {
+            "into": "wallet_daily_stats",
+            "on": ["wallet_id", "day", "token_symbol"],
+            "whenMatched": "replace",
+            "whenNotMatched": "insert"
+        }}
+    ]
+
+async def backfill_daily_stats(wallet_id: Optional[str] = None, since: Optional[datetime] = None) -> int:
+    """Recompute the rollups server-side, optionally for one wallet or from a UTC day onwards.
+    
+    Days are replaced whole, so `since` should fall on a day boundary. Returns the number of
+    rollup documents in the rebuilt range.
+    """
+    match: Dict[str, Any] = {}
+    if wallet_id:
+        match["wallet_id"] = wallet_id
+    if since:
+        match["timestamp"] = {"$gte": since}
+    await ensure_indexes()
+    await db.transactions.aggregate(daily_stats_pipeline(match)).to_list(None)
+    
+    count_filter: Dict[str, Any] = {}
+    if wallet_id:
+        count_filter["wallet_id"] = wallet_id
+    if since:
+        count_filter["day"] = {"$gte": since.strftime("%Y-%m-%d")}
+    return await db.wallet_daily_stats.count_documents(count_filter)
+
+def daily_stats_from_document(doc: Dict[str, Any]) -> DailyStats:
+    volume = doc.get("volume")
+    return DailyStats(
+        day=doc["day"],
+        token_symbol=doc["token_symbol"],
+        tx_count=doc.get("tx_count", 0),
+        failed_count=doc.get("failed_count", 0),
+        volume=str(volume.to_decimal() if isinstance(volume, Decimal128) else volume or 0),
+        first_tx_at=doc.get("first_tx_at"),
+        last_tx_at=doc.get("last_tx_at")
+    )
+
+# Transaction export
+# Exports stream from a Motor cursor: each batch is rendered and handed to the response
+# before the next one is fetched, so memory stays flat however many rows are exported.
+EXPORT_COLUMNS = [
+    "tx_id", "wallet_id", "timestamp", "direction", "status", "from_address", "to_address", "token_symbol",
+    "token_address", "amount", "amount_base", "decimals", "tx_hash", "gas_price", "bundle_id", "block_number", "error"
+]
+
+def _export_value(value: Any) -> Any:
+    if isinstance(value, Decimal128):
+        return value.to_decimal()
+    return value
+
+def export_cursor(query: Dict[str, Any]):
+    return read_db("export").transactions.find(
+        query, {"_id": 0, **{column: 1 for column in EXPORT_COLUMNS}}
+    ).sort("timestamp", 1).batch_size(export_batch_size)
+
+async def export_csv(query: Dict[str, Any]):
+    """Yield the matching transactions as CSV, one chunk per cursor batch"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    rows = 0
+    async for doc in export_cursor(query):
+        value = doc.get("timestamp")
+        writer.writerow([
+            value.isoformat() if column == "timestamp" and value else _export_value(doc.get(column))
+            for column in EXPORT_COLUMNS
+        ])
+        rows += 1
+        if rows % export_batch_size == 0:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode("utf-8")
+
+class _ChunkSink:
+    """Write-only file object that hands what ParquetWriter wrote so far back to the caller"""
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+async def export_parquet(query: Dict[str, Any]):
+    """Yield the matching transactions as Parquet, one row group of export_row_group_size rows at a time"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    
+    types = {"timestamp": pa.timestamp("ms"), "amount_base": pa.decimal128(38, 0), "decimals": pa.int32(), "block_number": pa.int64()}
+    schema = pa.schema([(column, types.get(column, pa.string())) for column in EXPORT_COLUMNS])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    
+    def write_row_group(columns: Dict[str, list]):
+        # Arrow conversion and compression are CPU bound, keep them off the event loop
+        writer.write_table(pa.table(columns, schema=schema), row_group_size=export_row_group_size)
+    
+    columns: Dict[str, list] = {column: [] for column in EXPORT_COLUMNS}
+    rows = 0
+    async for doc in export_cursor(query):
+        for column in EXPORT_COLUMNS:
+            columns[column].append(_export_value(doc.get(column)))
+        rows += 1
+        if rows == export_row_group_size:
+            await asyncio.to_thread(write_row_group, columns)
+            columns = {column: [] for column in EXPORT_COLUMNS}
+            rows = 0
+            yield sink.drain()
+    if rows:
+        await asyncio.to_thread(write_row_group, columns)
+    await asyncio.to_thread(writer.close)
+    yield sink.drain()
+
+# Simulations
+async def purge_history_simulations() -> int:
+    """Delete simulations written into the transaction history before they had their own collection"""
+    result = await db.transactions.delete_many({"status": "simulated"})
+    return result.deleted_count
+
+# Response helpers
+_trusted_field_cache: Dict[type, List[tuple]] = {}
+
+def trusted_document(model, doc: Dict[str, Any]) -> Dict[str, Any]:
+    """Project a stored document onto a model's fields without validation, filling defaults"""
+    fields = _trusted_field_cache.get(model)
+    if fields is None:
+        fields = [(name, field.default, field.default_factory, field.is_required()) for name, field in model.model_fields.items()]
+        _trusted_field_cache[model] = fields
+    
+    projected = {}
+    for name, default, default_factory, required in fields:
+        if name in doc:
+            projected[name] = doc[name]
+        elif not required:
+            projected[name] = default_factory() if default_factory else default
+    return projected
+
+def trusted_response(model, docs: Union[Dict[str, Any], List[Dict[str, Any]]]):
+    """Build the response for documents read from our own collections.
+    
+    On the fast path the documents were validated when they were written, so they are
+    projected onto the model fields without validation and rendered straight with orjson,
+    skipping both model construction and FastAPI's response_model validation pass.
+    """
+    if isinstance(docs, list):
+        if fast_serialization:
+            return FastJSONResponse([trusted_document(model, doc) for doc in docs])
+        return [model(**doc) for doc in docs]
+    if fast_serialization:
+        return FastJSONResponse(trusted_document(model, docs))
+    return model(**docs)
+
+def document_etag(*parts) -> str:
+    """Strong ETag for a representation identified by these version markers"""
+    return '"' + hashlib.sha256("|".join(str(part) for part in parts).encode()).hexdigest()[:32] + '"'
+
+def wallet_version(wallet: Dict[str, Any]) -> tuple:
+    """What changes whenever anything served from a wallet document changes"""
+    return wallet["wallet_id"], wallet.get("version", 0), wallet.get("updated_at") or wallet.get("created_at")
+
+def cached_read(request: Request, etag: str, build):
+    """Answer If-None-Match with a bare 304, otherwise build the body and attach the validators.
+    
+    The ETag is derived from the stored document's version markers, so a matching client
+    costs one database read and no model construction or serialization.
+    """
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={http_cache_max_age}"}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        if etag in tags or "*" in tags:
+            return Response(status_code=304, headers=headers)
+    
+    response = build()
+    if not isinstance(response, Response):
+        response = JSONResponse(jsonable_encoder(response))
+    response.headers.update(headers)
+    return response
+
 # API Routes
 @api_router.post("/wallets", response_model=Wallet)
 async def create_wallet(wallet_data: WalletCreate):
@@ -491,25 +3305,26 @@ async def create_wallet(wallet_data: WalletCreate):
         elif wallet_data.chain_type == "TRON":
             wallet = await create_tron_wallet(wallet_data.name, wallet_data.mnemonic)
         
-        return wallet
+        return wallet.copy(update={"encrypted_mnemonic": None})
     except Exception as e:
-        logging.error(f"Error creating wallet: {e}")
+        logging.error("Error creating wallet: %s", e)
         raise HTTPException(status_code=500, detail=f"Error creating wallet: {str(e)}")
 
 @api_router.get("/wallets", response_model=List[Wallet])
-async def get_wallets():
+async def get_wallets(request: Request):
     """Get all wallets"""
-    wallets = await db.wallets.find().to_list(1000)
-    return [Wallet(**wallet) for wallet in wallets]
+    wallets = await read_db("listing").wallets.find({}, PUBLIC_WALLET_FIELDS).to_list(1000)
+    etag = document_etag("wallets", *(part for wallet in wallets for part in wallet_version(wallet)))
+    return cached_read(request, etag, lambda: trusted_response(Wallet, wallets))
 
 @api_router.get("/wallets/{wallet_id}", response_model=Wallet)
-async def get_wallet(wallet_id: str):
+async def get_wallet(wallet_id: str, request: Request):
     """Get a wallet by ID"""
-    wallet = await db.wallets.find_one({"wallet_id": wallet_id})
+    wallet = await db.wallets.find_one({"wallet_id": wallet_id}, PUBLIC_WALLET_FIELDS)
     if not wallet:
         raise HTTPException(status_code=404, detail="Wallet not found")
     
-    return Wallet(**wallet)
+    return cached_read(request, document_etag("wallet", *wallet_version(wallet)), lambda: trusted_response(Wallet, wallet))
 
 @api_router.get("/wallets/{wallet_id}/balance", response_model=Balance)
 async def get_wallet_balance(wallet_id: str):
@@ -541,11 +3356,52 @@ async def get_wallet_balance(wallet_id: str):
         token_symbol=token_symbol
     )
 
+@api_router.get("/wallets/{wallet_id}/overview", response_model=WalletOverview)
+async def get_wallet_overview(wallet_id: str):
+    """Wallet, native balance and token balances in one call, loading the wallet once"""
+    wallet = await db.wallets.find_one({"wallet_id": wallet_id}, PUBLIC_WALLET_FIELDS)
+    if not wallet:
+        raise HTTPException(status_code=404, detail="Wallet not found")
+    
+    chain_type = wallet["chain_type"]
+    tokens_call = fetch_tron_token_balances(wallet) if chain_type == "TRON" else wallet_token_balances(wallet)
+    balance, tokens = await asyncio.gather(
+        asyncio.wait_for(fetch_native_balance(chain_type, wallet["address"]), overview_chain_timeout),
+        asyncio.wait_for(tokens_call, overview_chain_timeout),
+        return_exceptions=True
+    )
+    
+    errors = {}
+    for part, result in (("balance", balance), ("tokens", tokens)):
+        if isinstance(result, Exception):
+            errors[part] = "timeout" if isinstance(result, asyncio.TimeoutError) else f"error: {result}"
+            logging.error("Error getting wallet overview %s: %r", part, result)
+    if "tokens" in errors:
+        tokens = tron_token_list(wallet) if chain_type == "TRON" else wallet.get("tokens") or []
+    
+    return WalletOverview(
+        **{**wallet, "tokens": tokens},
+        balance=None if "balance" in errors else str(balance),
+        token_symbol=NATIVE_SYMBOLS.get(chain_type, chain_type),
+        errors=errors
+    )
+
 @api_router.get("/wallets/{wallet_id}/tokens", response_model=List[TokenInfo])
-async def get_wallet_tokens(wallet_id: str):
+async def get_wallet_tokens(wallet_id: str, request: Request):
     """Get tokens for a wallet"""
-    tokens = await get_token_balances(wallet_id)
-    return tokens
+    wallet = await db.wallets.find_one({"wallet_id": wallet_id}, {"_id": 0})
+    if not wallet:
+        raise HTTPException(status_code=404, detail="Wallet not found")
+    
+    if wallet["chain_type"] == "TRON":
+        # Live chain balances: the ETag covers the content, so unchanged balances still revalidate cheaply
+        tokens = await wallet_token_balances(wallet)
+        etag = document_etag("tokens", *(f"{token.token_address}:{token.balance}" for token in tokens))
+        return cached_read(request, etag, lambda: tokens)
+    
+    if wallet.get("tokens"):
+        return cached_read(request, document_etag("tokens", *wallet_version(wallet)), lambda: wallet["tokens"])
+    return await wallet_token_balances(wallet)
 
 @api_router.post("/transactions", response_model=Transaction)
 async def create_transaction(tx_data: TransactionCreate):
@@ -559,101 +3415,211 @@ async def create_transaction(tx_data: TransactionCreate):
     if tx_data.use_sponsor and "sponsor_address" in wallet and wallet["sponsor_address"]:
         sponsor_address = wallet["sponsor_address"]
     
+    decimals = token_decimals(wallet, tx_data.token_address)
+    try:
+        to_base_units(tx_data.amount, decimals)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
     # In a real app, we would use the wallet's private key to sign and send the transaction
     # For this demo, we'll just create a transaction record
     
     tx = Transaction(
         wallet_id=tx_data.wallet_id,
         from_address=wallet["address"],
-        to_address=tx_data.to_address,
+        to_address=normalize_address(tx_data.to_address),
         amount=tx_data.amount,
         token_symbol=tx_data.token_symbol,
         token_address=tx_data.token_address,
         tx_hash=f"demo_tx_{uuid.uuid4().hex}",  # This would be the actual transaction hash in production
         status="confirmed",  # For demo purposes, we mark it as confirmed immediately
+        gas_price=fee_oracle.gas_price(wallet["chain_type"]),
         is_sponsored=tx_data.use_sponsor,
         sponsor_address=sponsor_address,
         data=tx_data.data
     )
     
-    await db.transactions.insert_one(tx.dict())
+    await db.transactions.insert_one(transaction_document(tx, decimals))
+    await record_daily_stats([tx])
     
     return tx
 
+# Declared before /transactions/{wallet_id}, which would otherwise capture "export"
+@api_router.get("/transactions/export")
+async def export_transactions(
+    format: str = "csv",
+    wallet_id: Optional[str] = None,
+    start: Optional[str] = Query(None, alias="from"),
+    end: Optional[str] = Query(None, alias="to")
+):
+    """Stream transaction history as CSV or Parquet, optionally for one wallet and a time range"""
+    if format not in ("csv", "parquet"):
+        raise HTTPException(status_code=400, detail="format must be csv or parquet")
+    
+    query: Dict[str, Any] = {}
+    if wallet_id:
+        query["wallet_id"] = wallet_id
+    try:
+        bounds = {operator: datetime.fromisoformat(value) for operator, value in (("$gte", start), ("$lt", end)) if value}
+    except ValueError:
+        raise HTTPException(status_code=400, detail="from and to must be ISO 8601 dates or datetimes")
+    if bounds:
+        query["timestamp"] = bounds
+    
+    filename = f"transactions-{wallet_id or 'all'}-{datetime.utcnow():%Y%m%d%H%M%S}.{format}"
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    if format == "parquet":
+        return StreamingResponse(export_parquet(query), media_type="application/vnd.apache.parquet", headers=headers)
+    return StreamingResponse(export_csv(query), media_type="text/csv", headers=headers)
+
 @api_router.get("/transactions/{wallet_id}", response_model=List[Transaction])
-async def get_wallet_transactions(wallet_id: str):
-    """Get all transactions for a wallet"""
-    transactions = await db.transactions.find({"wallet_id": wallet_id}).to_list(1000)
-    return [Transaction(**tx) for tx in transactions]
+async def get_wallet_transactions(
+    wallet_id: str,
+    token_symbol: Optional[str] = None,
+    min_amount: Optional[str] = None,
+    max_amount: Optional[str] = None,
+    include_simulated: bool = False
+):
+    """Get all transactions for a wallet, optionally filtered by token and amount range (in token units).
+    
+    Simulations are kept out of the history unless include_simulated asks for the unexpired ones.
+    """
+    history = read_db("history")
+    collections = [history.transactions, history.transaction_simulations] if include_simulated else [history.transactions]
+    query: Dict[str, Any] = {"wallet_id": wallet_id}
+    if token_symbol:
+        query["token_symbol"] = token_symbol
+    if min_amount is not None or max_amount is not None:
+        # Amounts are compared in base units, so the bounds are scaled per decimals value in use
+        decimals_in_use = set()
+        for collection in collections:
+            decimals_in_use.update(await collection.distinct("decimals", query))
+        query.update(amount_range_filter(min_amount, max_amount, [d for d in decimals_in_use if d is not None]))
+    transactions = await history.transactions.find(query, {"_id": 0}).to_list(1000)
+    if include_simulated:
+        transactions += await history.transaction_simulations.find(
+            {**query, "expires_at": {"$gt": datetime.utcnow()}}, {"_id": 0, "expires_at": 0}
+        ).to_list(1000)
+    return trusted_response(Transaction, transactions)
+
+@api_router.get("/addresses/{address}", response_model=AddressActivity)
+async def get_address_activity(address: str, limit: int = 20):
+    """Reverse lookup: the wallet owning an address and the latest transactions involving it"""
+    address = normalize_address(address)
+    limit = max(1, min(limit, 100))
+    wallet, transactions = await asyncio.gather(
+        db.wallets.find_one({"address": address}, PUBLIC_WALLET_FIELDS),
+        read_db("history").transactions.find(
+            {"$or": [{"from_address": address}, {"to_address": address}]}, {"_id": 0}
+        ).sort("timestamp", -1).limit(limit).to_list(limit)
+    )
+    if not wallet and not transactions:
+        raise HTTPException(status_code=404, detail="Address not found")
+    
+    return AddressActivity(
+        address=address,
+        wallet=Wallet(**wallet) if wallet else None,
+        transactions=[Transaction(**tx) for tx in transactions]
+    )
+
+@api_router.get("/wallets/{wallet_id}/analytics", response_model=WalletAnalytics)
+async def get_wallet_analytics(
+    wallet_id: str,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    token_symbol: Optional[str] = None
+):
+    """Daily transaction counts and volume per token, read from the precomputed rollups"""
+    try:
+        end_day = datetime.strptime(end, "%Y-%m-%d") if end else datetime.utcnow()
+        start_day = datetime.strptime(start, "%Y-%m-%d") if start else end_day - timedelta(days=30)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="start and end must be dates in YYYY-MM-DD format")
+    if start_day > end_day:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    
+    query: Dict[str, Any] = {
+        "wallet_id": wallet_id,
+        "day": {"$gte": start_day.strftime("%Y-%m-%d"), "$lte": end_day.strftime("%Y-%m-%d")}
+    }
+    if token_symbol:
+        query["token_symbol"] = token_symbol
+    docs = await read_db("history").wallet_daily_stats.find(query, {"_id": 0}).sort([("day", 1), ("token_symbol", 1)]).to_list(None)
+    if not docs and not await db.wallets.find_one({"wallet_id": wallet_id}, {"_id": 1}):
+        raise HTTPException(status_code=404, detail="Wallet not found")
+    
+    days = [daily_stats_from_document(doc) for doc in docs]
+    totals: Dict[str, TokenTotals] = {}
+    for day in days:
+        total = totals.setdefault(day.token_symbol, TokenTotals(token_symbol=day.token_symbol, tx_count=0, failed_count=0, volume="0"))
+        total.tx_count += day.tx_count
+        total.failed_count += day.failed_count
+        total.volume = str(Decimal(total.volume) + Decimal(day.volume))
+    
+    return WalletAnalytics(
+        wallet_id=wallet_id,
+        start=start_day.strftime("%Y-%m-%d"),
+        end=end_day.strftime("%Y-%m-%d"),
+        days=days,
+        totals=list(totals.values())
+    )
 
 @api_router.post("/wallets/{wallet_id}/owner", response_model=Wallet)
 async def update_wallet_owner(wallet_id: str, owner_data: WalletOwnerUpdate):
     """Update the owner of a wallet"""
-    wallet = await db.wallets.find_one({"wallet_id": wallet_id})
-    if not wallet:
-        raise HTTPException(status_code=404, detail="Wallet not found")
-    
     # In a real app, we would verify ownership through a signature or other means
     # For this demo, we'll just update the address
     
     # Check if new owner is another wallet in the system
     if owner_data.new_owner_type == "wallet":
-        owner_wallet = await db.wallets.find_one({"wallet_id": owner_data.new_owner_address})
+        owner_wallet = await db.wallets.find_one({"wallet_id": owner_data.new_owner_address}, {"address": 1})
         if not owner_wallet:
             raise HTTPException(status_code=404, detail="Owner wallet not found")
         new_address = owner_wallet["address"]
     else:
-        new_address = owner_data.new_owner_address
+        new_address = normalize_address(owner_data.new_owner_address)
     
     # In a real app, we would handle the transfer of ownership on-chain
     # For this demo, we'll just update our record
     
-    # Create an ownership transfer record
-    transfer = {
-        "transfer_id": str(uuid.uuid4()),
-        "wallet_id": wallet_id,
-        "old_owner": wallet["address"],
-        "new_owner": new_address,
-        "timestamp": datetime.utcnow()
-    }
-    await db.ownership_transfers.insert_one(transfer)
-    
-    # Update wallet address
-    await db.wallets.update_one(
-        {"wallet_id": wallet_id},
-        {"$set": {"address": new_address}}
-    )
+    # The address swap and the ownership transfer record commit together
+    async with causal_session() as session:
+        if mongo_supports_transactions:
+            async with session.start_transaction():
+                updated_wallet = await transfer_wallet_owner(wallet_id, new_address, owner_data.expected_version, session)
+        else:
+            updated_wallet = await transfer_wallet_owner(wallet_id, new_address, owner_data.expected_version, session)
     
-    # Return updated wallet
-    updated_wallet = await db.wallets.find_one({"wallet_id": wallet_id})
     return Wallet(**updated_wallet)
 
 @api_router.post("/wallets/{wallet_id}/sponsor", response_model=Wallet)
 async def set_wallet_sponsor(wallet_id: str, sponsor_data: WalletSponsor):
     """Set a sponsor address for wallet transactions"""
-    wallet = await db.wallets.find_one({"wallet_id": wallet_id})
-    if not wallet:
-        raise HTTPException(status_code=404, detail="Wallet not found")
-    
     # In a real app, we would verify the sponsor's consent
     # For this demo, we'll just update the wallet
     
     if sponsor_data.active:
-        await db.wallets.update_one(
-            {"wallet_id": wallet_id},
-            {"$set": {"sponsor_address": sponsor_data.sponsor_address}}
-        )
+        update = {"$set": {"sponsor_address": normalize_address(sponsor_data.sponsor_address)}}
     else:
-        await db.wallets.update_one(
-            {"wallet_id": wallet_id},
-            {"$unset": {"sponsor_address": ""}}
+        update = {"$unset": {"sponsor_address": ""}}
+    update.setdefault("$set", {})["updated_at"] = datetime.utcnow()
+    update["$inc"] = {"version": 1}
+    
+    # The 404/409 check after a failed update must observe the state the update saw
+    async with causal_session() as session:
+        updated_wallet = await db.wallets.find_one_and_update(
+            versioned_wallet_filter(wallet_id, sponsor_data.expected_version),
+            update,
+            projection=PUBLIC_WALLET_FIELDS,
+            return_document=ReturnDocument.AFTER,
+            session=session
         )
+        if not updated_wallet:
+            await raise_wallet_update_failed(wallet_id, session)
     
-    # Return updated wallet
-    updated_wallet = await db.wallets.find_one({"wallet_id": wallet_id})
     return Wallet(**updated_wallet)
 
-@api_router.post("/transactions/simulate", response_model=Transaction)
+@api_router.post("/transactions/simulate", response_model=SimulatedTransaction)
 async def simulate_transaction(sim_data: TransactionSimulation):
     """Simulate a transaction and return expected result without sending it"""
     wallet = await db.wallets.find_one({"wallet_id": sim_data.wallet_id})
@@ -663,6 +3629,12 @@ async def simulate_transaction(sim_data: TransactionSimulation):
     # In a real app, we would perform an actual simulation on the blockchain
     # For this demo, we'll create a simulated transaction record
     
+    decimals = token_decimals(wallet, sim_data.token_address)
+    try:
+        to_base_units(sim_data.amount, decimals)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
     # Set token information
     token_symbol = wallet["chain_type"]  # Default to native token
     if sim_data.token_address:
@@ -674,23 +3646,35 @@ async def simulate_transaction(sim_data: TransactionSimulation):
                 break
     
     # Create simulated transaction
-    tx = Transaction(
+    tx = SimulatedTransaction(
         wallet_id=sim_data.wallet_id,
         from_address=wallet["address"],
-        to_address=sim_data.to_address,
+        to_address=normalize_address(sim_data.to_address),
         amount=sim_data.amount,
         token_symbol=token_symbol,
         token_address=sim_data.token_address,
-        status="simulated",
-        gas_used=0.000142 if wallet["chain_type"] != "SOL" else 0.000005,
-        gas_price="20 Gwei" if wallet["chain_type"] == "ETH" else "0.01 TRX" if wallet["chain_type"] == "TRON" else "5 lamports",
-        data=sim_data.data
+        gas_used=fee_oracle.network_fee(wallet["chain_type"], is_token=bool(sim_data.token_address)),
+        gas_price=fee_oracle.gas_price(wallet["chain_type"]),
+        data=sim_data.data,
+        expires_at=datetime.utcnow() + timedelta(seconds=simulation_ttl_seconds)
     )
     
-    await db.transactions.insert_one(tx.dict())
+    await db.transaction_simulations.insert_one(transaction_document(tx, decimals))
     
     return tx
 
+@api_router.get("/transactions/simulations/{tx_id}", response_model=SimulatedTransaction)
+async def get_simulation(tx_id: str):
+    """Get a simulation by ID while it is still retained"""
+    # The TTL monitor only runs about once a minute, so expired documents are filtered here too
+    simulation = await db.transaction_simulations.find_one(
+        {"tx_id": tx_id, "expires_at": {"$gt": datetime.utcnow()}}, {"_id": 0}
+    )
+    if not simulation:
+        raise HTTPException(status_code=404, detail="Simulation not found or expired")
+    
+    return trusted_response(SimulatedTransaction, simulation)
+
 @api_router.post("/transactions/bundle", response_model=List[Transaction])
 async def create_transaction_bundle(bundle_data: TransactionBundle):
     """Create and execute a bundle of transactions"""
@@ -698,94 +3682,159 @@ async def create_transaction_bundle(bundle_data: TransactionBundle):
     if not wallet:
         raise HTTPException(status_code=404, detail="Wallet not found")
     
-    # Generate a bundle ID
-    bundle_id = str(uuid.uuid4())
-    
-    # Process each transaction in the bundle
-    transactions = []
-    for tx_data in bundle_data.transactions:
-        # Extract transaction data
-        to_address = tx_data.get("to_address")
-        amount = tx_data.get("amount")
-        token_symbol = tx_data.get("token_symbol", wallet["chain_type"])
-        token_address = tx_data.get("token_address")
-        data = tx_data.get("data")
-        
-        # In a real app, we would batch and send these transactions
-        # For this demo, we'll create individual transaction records
-        tx = Transaction(
-            wallet_id=bundle_data.wallet_id,
-            from_address=wallet["address"],
-            to_address=to_address,
-            amount=amount,
-            token_symbol=token_symbol,
-            token_address=token_address,
-            tx_hash=f"bundle_tx_{uuid.uuid4().hex}",
-            status="confirmed",  # For demo purposes
-            bundle_id=bundle_id,
-            data=data
-        )
-        
-        await db.transactions.insert_one(tx.dict())
-        transactions.append(tx)
-    
-    # Store bundle metadata
-    bundle_meta = {
-        "bundle_id": bundle_id,
-        "wallet_id": bundle_data.wallet_id,
-        "name": bundle_data.name,
-        "description": bundle_data.description,
-        "transaction_count": len(transactions),
-        "timestamp": datetime.utcnow()
-    }
-    await db.transaction_bundles.insert_one(bundle_meta)
+    executor = BundleExecutor(wallet, bundle_data)
+    transactions = await executor.execute()
     
     return transactions
 
 @api_router.post("/ai/chat", response_model=AIChatResponse)
-async def ai_chat(request: AIChatRequest):
+async def ai_chat(request: AIChatRequest, http_request: Request):
     """Chat with the AI assistant"""
-    chat_id = request.chat_id
-    
-    # If no chat_id, create a new chat
-    if not chat_id:
-        chat = AIChat()
-        chat_id = chat.chat_id
-        chat.messages.append(AIChatMessage(role="user", content=request.message))
-        await db.ai_chats.insert_one(chat.dict())
-    else:
-        # Add message to existing chat
-        chat = await db.ai_chats.find_one({"chat_id": chat_id})
-        if not chat:
-            raise HTTPException(status_code=404, detail="Chat not found")
-        
-        # Update the chat with the new message
-        chat["messages"].append({"role": "user", "content": request.message})
-        await db.ai_chats.update_one({"chat_id": chat_id}, {"$set": {"messages": chat["messages"]}})
-    
-    # Process the message with AI
-    ai_response = await process_ai_message(request.message, request.wallet_id)
-    
-    # Add AI response to the chat
-    await db.ai_chats.update_one(
-        {"chat_id": chat_id}, 
-        {"$push": {"messages": {"role": "assistant", "content": ai_response["response"]}}}
-    )
-    
-    return AIChatResponse(
-        chat_id=chat_id,
-        response=ai_response["response"],
-        action=ai_response["action"]
-    )
+    # Admitted before the user message is stored, so a rejected request leaves the chat untouched.
+    # Messages answered locally never reach the LLM and skip admission.
+    intent = classify_intent(request.message) if local_intents_enabled else None
+    async with nullcontext() if intent else ai_admission.slot(client_key(http_request), request.priority):
+        chat_id = request.chat_id
+        
+        # If no chat_id, create a new chat
+        if not chat_id:
+            chat = AIChat()
+            chat_id = chat.chat_id
+            chat.messages.append(AIChatMessage(role="user", content=request.message))
+            await db.ai_chats.insert_one(chat.dict())
+        else:
+            # Add message to existing chat
+            chat = await db.ai_chats.find_one({"chat_id": chat_id})
+            if not chat:
+                raise HTTPException(status_code=404, detail="Chat not found")
+        
+            # Update the chat with the new message
+            chat["messages"].append({"role": "user", "content": request.message})
+            await db.ai_chats.update_one({"chat_id": chat_id}, {"$set": {"messages": chat["messages"], "updated_at": datetime.utcnow()}})
+        
+        # Process the message with AI
+        ai_response = await process_ai_message(request.message, request.wallet_id, intent)
+        
+        # Add AI response to the chat
+        await db.ai_chats.update_one(
+            {"chat_id": chat_id}, 
+            {
+                "$push": {"messages": {"role": "assistant", "content": ai_response["response"]}},
+                "$set": {"updated_at": datetime.utcnow()}
+            }
+        )
+        
+        return AIChatResponse(
+            chat_id=chat_id,
+            response=ai_response["response"],
+            action=ai_response["action"]
+        )
 
 @api_router.get("/ai/chat/{chat_id}", response_model=AIChat)
-async def get_chat(chat_id: str):
+async def get_chat(chat_id: str, request: Request):
     """Get a chat by ID"""
-    chat = await db.ai_chats.find_one({"chat_id": chat_id})
+    chat = await db.ai_chats.find_one({"chat_id": chat_id}, {"_id": 0})
     if not chat:
         raise HTTPException(status_code=404, detail="Chat not found")
     
-    return AIChat(**chat)
+    etag = document_etag("chat", chat_id, chat.get("updated_at") or chat.get("timestamp"), len(chat.get("messages", [])))
+    return cached_read(request, etag, lambda: trusted_response(AIChat, chat))
+
+@api_router.get("/fees/{chain_type}", response_model=FeeEstimate)
+async def get_fee_estimate(chain_type: str):
+    """Get slow, standard and fast fee estimates for a chain"""
+    if chain_type not in ["ETH", "SOL", "TRON"]:
+        raise HTTPException(status_code=400, detail="Chain type must be ETH, SOL, or TRON")
+    
+    return fee_oracle.estimate(chain_type)
+
+# Request profiles
+def require_profile_token(request: Request):
+    """Profiles expose internals, so they are only served to holders of the profile token"""
+    token = request.headers.get("x-profile-token", "")
+    if not profile_token or not secrets.compare_digest(token, profile_token):
+        raise HTTPException(status_code=403, detail="Profile token required")
+
+@api_router.get("/debug/slow-requests")
+async def list_slow_requests(request: Request, limit: int = 50, route: Optional[str] = None):
+    """Most recent slow or on-demand request profiles, without their stack samples"""
+    require_profile_token(request)
+    query = {"route": route} if route else {}
+    profiles = await db.slow_requests.find(query, {"_id": 0, "samples": 0}).sort("$natural", -1).to_list(max(1, min(limit, 500)))
+    return profiles
+
+@api_router.get("/debug/slow-requests/{profile_id}")
+async def get_slow_request(profile_id: str, request: Request, format: str = "json"):
+    """One request profile; format=folded renders it as folded stacks for flamegraph tools.
+    
+    Stack-sampled profiles fold to one line per distinct await stack weighted by sample count.
+    Profiles without samples fold their span breakdown instead, weighted in milliseconds.
+    """
+    require_profile_token(request)
+    profile = await db.slow_requests.find_one({"profile_id": profile_id}, {"_id": 0})
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if format == "json":
+        return profile
+    if format != "folded":
+        raise HTTPException(status_code=400, detail="Format must be json or folded")
+    
+    root = f"{profile['method']} {profile.get('route') or profile['path']}"
+    if profile.get("samples"):
+        lines = [f"{root};{sample['stack']} {sample['count']}" for sample in profile["samples"]]
+    else:
+        spans = profile.get("spans", {})
+        lines = [f"{root};{name} {round(span['ms'])}" for name, span in spans.items()]
+        other = profile["duration_ms"] - sum(span["ms"] for span in spans.values())
+        if other >= 1:
+            lines.append(f"{root};other {round(other)}")
+    return PlainTextResponse("\n".join(lines) + "\n")
+
+# Health checks
+_rpc_health: Dict[str, Any] = {"checked_at": 0.0, "status": {}}
+
+async def _check(name: str, probe) -> tuple:
+    try:
+        await asyncio.wait_for(probe, timeout=readiness_timeout)
+        return name, "ok"
+    except Exception as e:
+        return name, f"error: {e.__class__.__name__}"
+
+async def check_rpc_health() -> Dict[str, str]:
+    """Probe every chain node, cached so frequent readiness probes don't load the nodes"""
+    if time.monotonic() - _rpc_health["checked_at"] > readiness_rpc_cache_seconds:
+        results = await asyncio.gather(
+            _check("ETH", json_rpc(eth_rpc_url, "eth_chainId")),
+            _check("SOL", json_rpc(sol_rpc_url, "getHealth")),
+            _check("TRON", tron_client.get_now_block())
+        )
+        _rpc_health["status"] = dict(results)
+        _rpc_health["checked_at"] = time.monotonic()
+    return _rpc_health["status"]
+
+@api_router.get("/health/live")
+async def health_live():
+    """Liveness probe: the process is up and serving"""
+    return {"status": "ok"}
+
+@api_router.get("/health/ready")
+async def health_ready():
+    """Readiness probe: Mongo reachable, subsystems warmed up and chain nodes checked"""
+    (_, mongo_status), rpc_status = await asyncio.gather(
+        _check("mongo", client.admin.command("ping")),
+        check_rpc_health()
+    )
+    ready = mongo_status == "ok" and subsystems_ready
+    if readiness_require_rpc:
+        ready = ready and all(status == "ok" for status in rpc_status.values())
+    
+    body = {
+        "status": "ready" if ready else "not_ready",
+        "mongo": mongo_status,
+        "subsystems": "ok" if subsystems_ready else "warming_up",
+        "rpc": rpc_status
+    }
+    return JSONResponse(body, status_code=200 if ready else 503)
 
 # Root API endpoint
 @api_router.get("/")
@@ -795,21 +3844,284 @@ async def root():
 # Include the router in the main app
 app.include_router(api_router)
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus scrape endpoint"""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        # Multi-worker mode: every worker writes its samples to this directory, merge them
+        from prometheus_client import CollectorRegistry, multiprocess
+        
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+class MetricsMiddleware:
+    """ASGI middleware recording request latency per route template"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        start = time.perf_counter()
+        status = 500
+        
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # Label with the route template, not the raw path, to keep cardinality bounded
+            route = scope.get("route")
+            HTTP_REQUEST_DURATION.labels(
+                scope["method"], route.path if route else "unmatched", str(status)
+            ).observe(time.perf_counter() - start)
+
+app.add_middleware(MetricsMiddleware)
+
+class ProfilingMiddleware:
+    """ASGI middleware collecting span timings for every request and stack samples for profiled ones.
+    
+    Every request gets a request id, taken from X-Request-ID when the caller sent one, which is
+    echoed in the response and attached to everything logged while serving it; with ACCESS_LOG
+    the request ends with one log line carrying its status, duration and span timings.
+    
+    A request is profiled when it carries the profile token in X-Profile-Token, or at random
+    with PROFILE_SAMPLE_RATE. Profiled requests get a Server-Timing breakdown and an
+    X-Profile-Id header; requests slower than SLOW_REQUEST_MS, and every on-demand profile,
+    are written to the capped slow_requests collection once the response has been sent.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        headers = dict(scope["headers"])
+        token = headers.get(b"x-profile-token", b"").decode()
+        requested = bool(profile_token) and secrets.compare_digest(token, profile_token)
+        sampled = requested or (profile_sample_rate > 0 and random.random() < profile_sample_rate)
+        request_id = headers.get(b"x-request-id", b"").decode("latin-1")[:64] or uuid.uuid4().hex
+        
+        profile = RequestProfile(
+            request_id, scope["method"], scope["path"], asyncio.current_task(),
+            ProfilingMiddleware.__call__.__code__, threading.get_ident()
+        )
+        context_token = current_profile.set(profile)
+        start = time.perf_counter()
+        status = 500
+        
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                extra_headers = [(b"x-request-id", request_id.encode("latin-1"))]
+                if requested:
+                    timings = ", ".join(
+                        f"{name};dur={span['ms']}" for name, span in profile.span_summary().items()
+                    )
+                    total = f"app;dur={round((time.perf_counter() - start) * 1000, 2)}"
+                    extra_headers += [
+                        (b"server-timing", (f"{timings}, {total}" if timings else total).encode()),
+                        (b"x-profile-id", profile.profile_id.encode()),
+                    ]
+                message["headers"] = list(message.get("headers", [])) + extra_headers
+            await send(message)
+        
+        if sampled:
+            profile.sampled = True
+            stack_sampler.add(profile)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration_ms = (time.perf_counter() - start) * 1000
+            if sampled:
+                stack_sampler.remove(profile)
+            if access_log:
+                log_access(profile, scope, status, duration_ms)
+            current_profile.reset(context_token)
+            slow = slow_request_ms > 0 and duration_ms >= slow_request_ms
+            if requested or slow:
+                await save_profile(profile, scope, status, duration_ms, "slow" if slow else "requested")
+
+def log_access(profile: RequestProfile, scope, status: int, duration_ms: float):
+    route = scope.get("route")
+    timings = {f"{name}_ms": span["ms"] for name, span in profile.span_summary().items()}
+    access_logger.info(
+        "%s %s %d %.1fms", profile.method, profile.path, status, duration_ms,
+        extra={
+            "method": profile.method,
+            "path": profile.path,
+            "route": route.path if route else None,
+            "status": status,
+            "duration_ms": round(duration_ms, 2),
+            **timings,
+        },
+    )
+
+async def save_profile(profile: RequestProfile, scope, status: int, duration_ms: float, reason: str):
+    route = scope.get("route")
+    try:
+        await db.slow_requests.insert_one({
+            "profile_id": profile.profile_id,
+            "method": profile.method,
+            "path": profile.path,
+            "route": route.path if route else None,
+            "status": status,
+            "reason": reason,
+            "timestamp": datetime.utcnow(),
+            "duration_ms": round(duration_ms, 2),
+            "spans": profile.span_summary(),
+            "sample_interval_ms": profile_interval * 1000,
+            "samples": [{"stack": stack, "count": count} for stack, count in profile.samples.items()],
+        })
+    except Exception as e:
+        logging.error("Error saving request profile: %s", e)
+
+stack_sampler = StackSampler(profile_interval)
+
+app.add_middleware(ProfilingMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Retry-After"],
 )
 
 # Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
-logger = logging.getLogger(__name__)
+# Log calls only format the record and put it on a queue; a listener thread does the writing,
+# so a slow or blocked stderr never stalls the event loop. Each line is one JSON object with
+# the id of the request that logged it. Warnings and errors repeating the same message
+# template are rate limited: LOG_ERROR_BURST per LOG_ERROR_WINDOW are written, after that a
+# LOG_ERROR_SAMPLE_RATE sample, each carrying the count suppressed since the previous one.
+LOG_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
 
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
+class JSONLogFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": datetime.utcfromtimestamp(record.created).isoformat(timespec="milliseconds") + "Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        # Fields passed with extra=, plus request_id and suppressed
+        entry.update((key, value) for key, value in vars(record).items() if key not in LOG_RECORD_ATTRIBUTES)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+class RepeatedErrorSampler(logging.Filter):
+    """Rate limits warnings and errors per (logger, level, message template)"""
+
+    MAX_KEYS = 10000
+
+    def __init__(self, burst: int, window: float, sample_rate: float):
+        super().__init__()
+        self.burst = burst
+        self.window = window
+        self.sample_rate = sample_rate
+        self.keys: Dict[tuple, List[float]] = {}  # key -> [window start, count in window, suppressed]
+        self.lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno < logging.WARNING:
+            return True
+        key = (record.name, record.levelno, str(record.msg))
+        now = time.monotonic()
+        with self.lock:
+            state = self.keys.get(key)
+            if state is None or now - state[0] >= self.window:
+                if state is None and len(self.keys) >= self.MAX_KEYS:
+                    self.keys.clear()
+                # A new window; what was suppressed in the last one is reported with the next record
+                state = self.keys[key] = [now, 0, state[2] if state else 0]
+            state[1] += 1
+            if state[1] <= self.burst or random.random() < self.sample_rate:
+                if state[2]:
+                    record.suppressed = int(state[2])
+                    state[2] = 0
+                return True
+            state[2] += 1
+        LOG_RECORDS_DROPPED.labels("sampled").inc()
+        return False
+
+class RequestQueueHandler(QueueHandler):
+    """Queues records tagged with the current request id, dropping them when the queue is full"""
+
+    def prepare(self, record):
+        # Runs in the calling thread: render everything that refers to live objects before queueing
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = record.exc_text or logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        profile = current_profile.get()
+        if profile is not None:
+            record.request_id = profile.request_id
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.labels("queue_full").inc()
+
+def configure_logging() -> QueueListener:
+    output = logging.StreamHandler()
+    if log_format == "json":
+        output.setFormatter(JSONLogFormatter())
+    else:
+        output.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+    
+    handler = RequestQueueHandler(queue.Queue(maxsize=log_queue_size))
+    handler.addFilter(RepeatedErrorSampler(log_error_burst, log_error_window, log_error_sample_rate))
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(log_level)
+    # uvicorn's loggers write synchronously through their own handlers; route them through ours
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        uvicorn_logger = logging.getLogger(name)
+        uvicorn_logger.handlers = []
+        uvicorn_logger.propagate = True
+    # The access lines written by ProfilingMiddleware replace uvicorn's
+    logging.getLogger("uvicorn.access").disabled = access_log
+    
+    listener = QueueListener(handler.queue, output, respect_handler_level=True)
+    listener.start()
+    return listener
+
+def stop_logging():
+    """Flush the queue and write directly from here on; safe to call more than once"""
+    global log_listener
+    if log_listener is None:
+        return
+    listener, log_listener = log_listener, None
+    listener.stop()
+    logging.getLogger().handlers = list(listener.handlers)
+
+def start_logging():
+    """Route logging through the queue listener; a no-op when it is already running"""
+    global log_listener
+    if log_listener is None:
+        log_listener = configure_logging()
+
+log_listener: Optional[QueueListener] = None  # Started by start_logging(), from lifespan or init_clients()
+# Shutdown normally goes through lifespan; this covers scripts and abnormal exits
+atexit.register(stop_logging)
+logger = logging.getLogger(__name__)
+access_logger = logging.getLogger("access")
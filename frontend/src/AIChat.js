@@ -44,22 +44,16 @@ const AIChat = ({ language }) => {
   
   const fetchWalletDetails = async (walletId) => {
     try {
-      const walletResponse = await axios.get(`${API}/wallets/${walletId}`);
-      const balanceResponse = await axios.get(`${API}/wallets/${walletId}/balance`);
+      const response = await axios.get(`${API}/wallets/${walletId}/overview`);
+      const { errors, ...overview } = response.data;
       
-      let tokens = [];
-      try {
-        const tokensResponse = await axios.get(`${API}/wallets/${walletId}/tokens`);
-        tokens = tokensResponse.data;
-      } catch (err) {
-        console.error("Error fetching tokens:", err);
+      if (errors && Object.keys(errors).length > 0) {
+        console.error("Partial wallet details:", errors);
       }
       
       setSelectedWalletData({
-        ...walletResponse.data,
-        balance: balanceResponse.data.balance,
-        token_symbol: balanceResponse.data.token_symbol,
-        tokens
+        ...overview,
+        balance: overview.balance ?? "—"
       });
     } catch (err) {
       console.error("Error fetching wallet details:", err);
@@ -109,9 +103,13 @@ const AIChat = ({ language }) => {
       console.error("Error sending message:", err);
       
       // Add error message
+      const status = err.response?.status;
+      const retryAfter = err.response?.headers?.["retry-after"];
       const errorMessage = {
         role: "assistant",
-        content: "Sorry, there was an error processing your request. Please try again.",
+        content: status === 429 || status === 503
+          ? `The assistant is busy right now. Please try again${retryAfter ? ` in ${retryAfter} seconds` : " shortly"}.`
+          : "Sorry, there was an error processing your request. Please try again.",
       };
       
       setMessages([...messages, userMessage, errorMessage]);
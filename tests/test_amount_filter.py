@@ -0,0 +1,23 @@
+from decimal import Decimal
+
+import pytest
+from bson import Decimal128
+from fastapi import HTTPException
+
+import server
+
+
+@pytest.mark.parametrize("value", ["NaN", "sNaN", "Infinity", "-Infinity", "1e999999", "abc"])
+def test_invalid_bounds_are_a_bad_request(value):
+    for min_amount, max_amount in ((value, None), (None, value)):
+        with pytest.raises(HTTPException) as error:
+            server.amount_range_filter(min_amount, max_amount, [18])
+        assert error.value.status_code == 400
+
+
+def test_bounds_are_scaled_per_decimals():
+    query = server.amount_range_filter("1.5", "2", [18, 6])
+    assert query == {"$or": [
+        {"decimals": 18, "amount_base": {"$gte": Decimal128(Decimal(15 * 10 ** 17)), "$lte": Decimal128(Decimal(2 * 10 ** 18))}},
+        {"decimals": 6, "amount_base": {"$gte": Decimal128(Decimal(1_500_000)), "$lte": Decimal128(Decimal(2_000_000))}},
+    ]}
@@ -0,0 +1,60 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi import HTTPException
+from mongomock_motor import AsyncMongoMockClient
+
+import server
+
+WALLET = {"wallet_id": "w1", "chain_type": "ETH", "address": "0x" + "aa" * 20, "next_nonce": 7}
+BUNDLE = server.TransactionBundle(
+    wallet_id="w1", transactions=[{"to_address": "0x" + "bb" * 20, "amount": "0.1"}, {"to_address": "0x" + "cc" * 20, "amount": "0.2"}]
+)
+
+
+class PendingNonce(server.RpcTransport):
+    async def post_json(self, url, payload, headers=None):
+        return {"id": payload["id"], "result": "0x5"}
+
+
+class BrokenPool(ThreadPoolExecutor):
+    def submit(self, fn, *args, **kwargs):
+        raise RuntimeError("signing pool is shut down")
+
+
+@pytest.fixture
+def execute(monkeypatch):
+    mock = AsyncMongoMockClient()
+    monkeypatch.setattr(server, "db", mock["test_db"])
+    monkeypatch.setattr(server, "rpc_transport", PendingNonce())
+
+    def run(wallet):
+        """The exception execute() raised and the wallet's stored nonce counter afterwards"""
+        async def main():
+            await server.db.wallets.insert_one(dict(wallet))
+            with pytest.raises(Exception) as error:
+                await server.BundleExecutor(wallet, BUNDLE).execute()
+            stored = await server.db.wallets.find_one({"wallet_id": "w1"})
+            return error.value, stored["next_nonce"]
+
+        return asyncio.run(main())
+
+    return run
+
+
+def test_missing_key_reserves_no_nonces(execute):
+    error, next_nonce = execute(WALLET)
+    assert isinstance(error, HTTPException) and error.status_code == 400
+    assert next_nonce == 7
+
+
+def test_nonces_are_released_when_signing_cannot_run(execute, monkeypatch):
+    async def key(wallet):
+        return bytearray(32)
+
+    monkeypatch.setattr(server, "signing_key", key)
+    monkeypatch.setattr(server, "signing_pool", BrokenPool(max_workers=1))
+    error, next_nonce = execute(WALLET)
+    assert isinstance(error, RuntimeError)
+    assert next_nonce == 7
@@ -0,0 +1,169 @@
+import asyncio
+import socket
+import threading
+import uuid
+
+import pytest
+
+import server
+from benchmarks import stubs
+from benchmarks.load import free_port, wait_until
+
+
+def accepting(port):
+    with socket.create_connection(("127.0.0.1", port), timeout=1):
+        return True
+
+
+@pytest.fixture(scope="module")
+def redis_url():
+    port = free_port()
+    threading.Thread(target=stubs.serve_redis, args=(port,), daemon=True).start()
+    wait_until(lambda: accepting(port), 10, "RESP stub")
+    return f"redis://127.0.0.1:{port}/0"
+
+
+@pytest.fixture(params=["memory", "shm", "redis"])
+def make_cache(request, tmp_path):
+    """Factory, since the Redis client must be created on the loop that uses it"""
+    if request.param == "redis":
+        url = request.getfixturevalue("redis_url")
+        return lambda: server.RedisCache(url)
+    if request.param == "shm":
+        return lambda: server.SharedMemoryCache(str(tmp_path / "cache.db"))
+    return lambda: server.InProcessCache(max_entries=100)
+
+
+def run_with_cache(make_cache, body, monkeypatch=None):
+    async def main():
+        cache = make_cache()
+        if monkeypatch is not None:
+            monkeypatch.setattr(server, "cache", cache)
+        try:
+            return await body(cache, uuid.uuid4().hex)
+        finally:
+            await cache.close()
+
+    return asyncio.run(main())
+
+
+def test_set_get_delete(make_cache):
+    async def body(cache, key):
+        assert await cache.get(key) is None
+        await cache.set(key, {"balance": "1.5", "tokens": [1, 2]}, 30)
+        assert await cache.get(key) == {"balance": "1.5", "tokens": [1, 2]}
+        await cache.delete(key)
+        assert await cache.get(key) is None
+
+    run_with_cache(make_cache, body)
+
+
+def test_entries_expire(make_cache):
+    async def body(cache, key):
+        await cache.set(key, "short", 0.05)
+        assert await cache.get(key) == "short"
+        await asyncio.sleep(0.1)
+        assert await cache.get(key) is None
+
+    run_with_cache(make_cache, body)
+
+
+def test_add_only_sets_absent_or_expired_keys(make_cache):
+    async def body(cache, key):
+        assert await cache.add(key, "first", 0.05)
+        assert not await cache.add(key, "second", 30)
+        assert await cache.get(key) == "first"
+        await asyncio.sleep(0.1)
+        assert await cache.add(key, "third", 30)
+        assert await cache.get(key) == "third"
+
+    run_with_cache(make_cache, body)
+
+
+def test_lease_is_held_by_one_owner_until_it_lapses(make_cache, monkeypatch):
+    async def body(cache, key):
+        assert await server.acquire_lease(key, "worker-1", 0.05)
+        assert await server.acquire_lease(key, "worker-1", 0.05)  # Renewal
+        assert not await server.acquire_lease(key, "worker-2", 0.05)
+        await asyncio.sleep(0.1)
+        assert await server.acquire_lease(key, "worker-2", 30)
+
+    run_with_cache(make_cache, body, monkeypatch)
+
+
+def test_cached_loads_once_and_never_caches_errors(make_cache, monkeypatch):
+    async def body(cache, key):
+        calls = []
+
+        async def load():
+            calls.append(1)
+            return {"fee": 12}
+
+        async def fail():
+            raise server.RPCError("upstream down")
+
+        assert await server.cached(key, 30, load) == {"fee": 12}
+        assert await server.cached(key, 30, load) == {"fee": 12}
+        assert len(calls) == 1
+
+        with pytest.raises(server.RPCError):
+            await server.cached(key + ":failing", 30, fail)
+        assert await cache.get(key + ":failing") is None
+
+    run_with_cache(make_cache, body, monkeypatch)
+
+
+def test_unavailable_cache_only_costs_a_miss(monkeypatch):
+    class Unavailable(server.CacheBackend):
+        async def get(self, key):
+            raise ConnectionError("cache down")
+
+        async def set(self, key, value, ttl):
+            raise ConnectionError("cache down")
+
+        async def add(self, key, value, ttl):
+            raise ConnectionError("cache down")
+
+        async def delete(self, key):
+            raise ConnectionError("cache down")
+
+    async def load():
+        return "fresh"
+
+    monkeypatch.setattr(server, "cache", Unavailable())
+    assert asyncio.run(server.cached("key", 30, load)) == "fresh"
+
+
+def test_in_process_cache_evicts_least_recently_used():
+    async def main():
+        cache = server.InProcessCache(max_entries=2)
+        await cache.set("a", 1, 30)
+        await cache.set("b", 2, 30)
+        await cache.get("a")
+        await cache.set("c", 3, 30)
+        return [await cache.get(key) for key in ("a", "b", "c")]
+
+    assert asyncio.run(main()) == [1, None, 3]
+
+
+def test_shared_memory_cache_is_shared_between_instances(tmp_path):
+    async def main():
+        path = str(tmp_path / "cache.db")
+        writer, reader = server.SharedMemoryCache(path), server.SharedMemoryCache(path)
+        try:
+            await writer.set("shared", [1, 2, 3], 30)
+            return await reader.get("shared")
+        finally:
+            await writer.close()
+            await reader.close()
+
+    assert asyncio.run(main()) == [1, 2, 3]
+
+
+def test_incomplete_backend_cannot_be_created():
+    class GetOnly(server.CacheBackend):
+        async def get(self, key):
+            return None
+
+    with pytest.raises(TypeError):
+        GetOnly()
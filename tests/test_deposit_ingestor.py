@@ -0,0 +1,130 @@
+import asyncio
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+import server
+
+WALLET = "0x" + "aa" * 20
+SENDER = "0x" + "bb" * 20
+ROUTER = "0x" + "cc" * 20
+TOKEN = "0x" + "dd" * 20
+
+
+def word(address):
+    return "0x" + address[2:].rjust(64, "0")
+
+
+class ChainTransport(server.RpcTransport):
+    """Answers the ingestor's JSON-RPC calls from a fixed chain"""
+
+    def __init__(self, head, blocks, receipts, logs):
+        self.head, self.blocks, self.receipts, self.logs = head, blocks, receipts, logs
+        self.requested = []
+
+    def result(self, method, params):
+        self.requested.append((method, params))
+        if method == "eth_blockNumber":
+            return hex(self.head)
+        if method == "eth_getBlockByNumber":
+            return self.blocks[int(params[0], 16)]
+        if method == "eth_getBlockReceipts":
+            return self.receipts[int(params[0], 16)]
+        if method == "eth_getLogs":
+            start, end = int(params[0]["fromBlock"], 16), int(params[0]["toBlock"], 16)
+            return [log for log in self.logs if start <= int(log["blockNumber"], 16) <= end]
+        raise KeyError(method)
+
+    async def post_json(self, url, payload, headers=None):
+        if isinstance(payload, list):
+            return [{"id": call["id"], "result": self.result(call["method"], call["params"])} for call in payload]
+        return {"id": payload["id"], "result": self.result(payload["method"], payload["params"])}
+
+
+def block(number, *transactions):
+    return {"number": hex(number), "timestamp": hex(1_700_000_000 + number * 12), "transactions": list(transactions)}
+
+
+def native(tx_hash, value):
+    return {"hash": tx_hash, "from": SENDER, "to": WALLET, "value": hex(value), "input": "0x"}
+
+
+def receipt(tx_hash, status):
+    return {"transactionHash": tx_hash, "status": status}
+
+
+def transfer_log(number, tx_hash, log_index, units, topics=None):
+    return {
+        "address": TOKEN, "blockNumber": hex(number), "transactionHash": tx_hash, "logIndex": hex(log_index),
+        "topics": topics or [server.ERC20_TRANSFER_TOPIC, word(SENDER), word(WALLET)], "data": hex(units), "removed": False
+    }
+
+
+@pytest.fixture
+def ingest(monkeypatch):
+    mock = AsyncMongoMockClient()
+    monkeypatch.setattr(server, "db", mock["test_db"])
+
+    def run(transport, last_block):
+        monkeypatch.setattr(server, "rpc_transport", transport)
+
+        async def main():
+            await server.db.wallets.insert_one({"wallet_id": "w1", "chain_type": "ETH", "address": server.normalize_address(WALLET), "tokens": []})
+            await server.db.ingestion_state.insert_one({"chain": "ETH", "last_block": last_block})
+            await server.DepositIngestor().ingest_ethereum()
+            deposits = await server.db.transactions.find({}, {"_id": 0}).sort("tx_id", 1).to_list(None)
+            state = await server.db.ingestion_state.find_one({"chain": "ETH"})
+            return deposits, state["last_block"]
+
+        return asyncio.run(main())
+
+    return run
+
+
+def test_reverted_transactions_are_not_deposits(ingest, monkeypatch):
+    monkeypatch.setattr(server, "eth_ingest_confirmations", 0)
+    transport = ChainTransport(
+        head=101,
+        blocks={101: block(101, native("0x01", 10 ** 18), native("0x02", 5 * 10 ** 18))},
+        receipts={101: [receipt("0x01", "0x1"), receipt("0x02", "0x0")]},
+        logs=[],
+    )
+    deposits, _ = ingest(transport, 100)
+    assert [(deposit["tx_hash"], deposit["amount"]) for deposit in deposits] == [("0x01", "1")]
+
+
+def test_token_deposits_come_from_transfer_events(ingest, monkeypatch):
+    monkeypatch.setattr(server, "eth_ingest_confirmations", 0)
+    # A router call: the transaction is to the router, only the event names the wallet
+    routed = {"hash": "0x03", "from": SENDER, "to": ROUTER, "value": "0x0", "input": "0x12345678"}
+    nft_topics = [server.ERC20_TRANSFER_TOPIC, word(SENDER), word(WALLET), "0x" + "0" * 63 + "1"]
+    transport = ChainTransport(
+        head=101,
+        blocks={101: block(101, routed)},
+        receipts={101: [receipt("0x03", "0x1")]},
+        logs=[
+            transfer_log(101, "0x03", 4, 2 * 10 ** 18),
+            transfer_log(101, "0x03", 7, 3 * 10 ** 18),
+            transfer_log(101, "0x03", 9, 1, topics=nft_topics),
+        ],
+    )
+    deposits, _ = ingest(transport, 100)
+    assert [(deposit["token_address"], deposit["amount"], deposit["block_number"]) for deposit in deposits] == [
+        (TOKEN, "2", 101), (TOKEN, "3", 101)
+    ]
+    assert all(deposit["direction"] == "incoming" for deposit in deposits)
+
+
+def test_blocks_within_the_confirmation_depth_are_left_for_later(ingest, monkeypatch):
+    monkeypatch.setattr(server, "eth_ingest_confirmations", 2)
+    numbers = range(101, 104)
+    transport = ChainTransport(
+        head=103,
+        blocks={number: block(number, native(hex(number), 10 ** 18)) for number in numbers},
+        receipts={number: [receipt(hex(number), "0x1")] for number in numbers},
+        logs=[],
+    )
+    deposits, last_block = ingest(transport, 100)
+    assert last_block == 101
+    assert [deposit["block_number"] for deposit in deposits] == [101]
+    assert ("eth_getBlockByNumber", [hex(102), True]) not in transport.requested
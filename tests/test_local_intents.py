@@ -0,0 +1,53 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import server
+
+
+@pytest.mark.parametrize("message", [
+    "don't create a wallet",
+    "create a multisig wallet",
+    "what's my address",
+    "what was my balance yesterday",
+    "show me my eth balance on arbitrum",
+    "is my balance safe",
+    "my balance looks wrong",
+    "what tokens does binance hold",
+    "how many tokens exist",
+    "send 1 eth to my friend",
+    "explain what gas fees I should expect",
+])
+def test_messages_the_local_answers_would_get_wrong_go_to_the_llm(message):
+    assert server.classify_intent(message) is None
+
+
+@pytest.mark.parametrize("message, intent", [
+    ("what is my balance?", "balance"),
+    ("Check balance", "balance"),
+    ("how much eth do i have left?", "balance"),
+    ("what's my eth balance", "balance"),
+    ("show my tokens", "tokens"),
+    ("how much usdt do i have", "tokens"),
+    ("create a wallet", "create_wallet"),
+    ("please make me a new solana wallet", "create_wallet"),
+])
+def test_direct_requests_are_answered_locally(message, intent):
+    assert server.classify_intent(message)[0] == intent
+
+
+def test_token_answer_carries_no_balance_action(monkeypatch):
+    wallet = {"wallet_id": "w1", "name": "main", "chain_type": "ETH", "address": "0x" + "1" * 40, "tokens": []}
+
+    class Wallets:
+        async def find_one(self, query):
+            return wallet
+
+    async def no_tokens(_wallet):
+        return []
+
+    monkeypatch.setattr(server, "db", SimpleNamespace(wallets=Wallets()))
+    monkeypatch.setattr(server, "wallet_token_balances", no_tokens)
+    answer = asyncio.run(server.answer_intent("tokens", "w1"))
+    assert answer["action"] is None
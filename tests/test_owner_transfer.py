@@ -0,0 +1,54 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from mongomock_motor import AsyncMongoMockClient
+
+import server
+
+WALLET = {"wallet_id": "w1", "name": "Main", "chain_type": "ETH", "address": "0xold", "public_key": "0x04"}
+
+
+@pytest.fixture
+def wallets_db(monkeypatch):
+    mock = AsyncMongoMockClient()
+    monkeypatch.setattr(server, "db", mock["test_db"])
+    return server.db
+
+
+def test_transfer_records_the_previous_owner_without_storing_it(wallets_db):
+    async def main():
+        await wallets_db.wallets.insert_one({**WALLET, "version": 2, "encrypted_mnemonic": "sealed"})
+        returned = await server.transfer_wallet_owner("w1", "0xnew", 2)
+        stored = await wallets_db.wallets.find_one({"wallet_id": "w1"}, {"_id": 0})
+        audit = await wallets_db.ownership_transfers.find_one({"wallet_id": "w1"}, {"_id": 0})
+        return returned, stored, audit
+
+    returned, stored, audit = asyncio.run(main())
+    assert "previous_owner" not in stored
+    assert stored["address"] == returned["address"] == "0xnew"
+    assert stored["version"] == returned["version"] == 3
+    assert stored["updated_at"] == returned["updated_at"]
+    assert "encrypted_mnemonic" not in returned
+    assert (audit["old_owner"], audit["new_owner"], audit["version"]) == ("0xold", "0xnew", 3)
+
+
+def test_transfer_clears_a_previously_stored_owner(wallets_db):
+    async def main():
+        await wallets_db.wallets.insert_one({**WALLET, "previous_owner": "0xolder"})
+        returned = await server.transfer_wallet_owner("w1", "0xnew", None)
+        return returned, await wallets_db.wallets.find_one({"wallet_id": "w1"}, {"_id": 0})
+
+    returned, stored = asyncio.run(main())
+    assert "previous_owner" not in stored and "previous_owner" not in returned
+    assert stored["version"] == returned["version"] == 1
+
+
+def test_stale_version_is_a_conflict(wallets_db):
+    async def main():
+        await wallets_db.wallets.insert_one({**WALLET, "version": 5})
+        await server.transfer_wallet_owner("w1", "0xnew", 4)
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(main())
+    assert error.value.status_code == 409
@@ -0,0 +1,92 @@
+import asyncio
+import shutil
+import uuid
+
+import pytest
+from pymongo import read_preferences
+
+import server
+from benchmarks.load import local_mongo
+
+
+def test_primary_has_no_staleness_bound():
+    assert server.read_preference("primary") == read_preferences.Primary()
+
+
+@pytest.mark.parametrize("name", ["primaryPreferred", "secondary", "secondaryPreferred", "nearest"])
+def test_secondary_reads_are_bounded_by_max_staleness(name):
+    preference = server.read_preference(name)
+    assert preference.mongos_mode == name
+    assert preference.max_staleness == server.mongo_max_staleness
+
+
+def test_unknown_read_preference_is_rejected():
+    with pytest.raises(ValueError):
+        server.read_preference("closest")
+
+
+def test_no_session_where_the_deployment_has_none(monkeypatch):
+    """mongomock, as used by the in-memory benchmark mode, has no sessions"""
+    from mongomock_motor import AsyncMongoMockClient
+
+    async def main():
+        mock = AsyncMongoMockClient()
+        monkeypatch.setattr(server, "client", mock)
+        monkeypatch.setattr(server, "db", mock["test_db"])
+        await server.db.wallets.insert_one({
+            "wallet_id": "w1", "name": "Main", "chain_type": "ETH", "address": "0xabc", "public_key": "0x04", "version": 3
+        })
+        async with server.causal_session() as session:
+            assert session is None
+        sponsor = server.WalletSponsor(wallet_id="w1", sponsor_address="0xdef")
+        return await server.set_wallet_sponsor("w1", sponsor)
+
+    wallet = asyncio.run(main())
+    assert wallet.version == 4
+    assert wallet.sponsor_address == server.normalize_address("0xdef")
+
+
+@pytest.fixture(scope="module")
+def replica_set_url():
+    if not shutil.which("mongod"):
+        pytest.skip("mongod not found on PATH")
+    with local_mongo("mongod") as (url, _):
+        yield url
+
+
+@pytest.fixture
+def replica_set_clients(replica_set_url, monkeypatch):
+    """init_clients() against the replica set, with every client it creates reverted afterwards"""
+    for name in ("client", "db", "read_dbs", "rpc_transport", "tron_client", "signing_pool", "cache"):
+        monkeypatch.setattr(server, name, None)
+    monkeypatch.setattr(server, "mongo_supports_transactions", False)
+    monkeypatch.setattr(server, "mongo_url", replica_set_url)
+    monkeypatch.setattr(server, "db_name", f"test_{uuid.uuid4().hex[:8]}")
+    yield
+    server.client.close()
+    server.signing_pool.shutdown(wait=False)
+
+
+def test_query_classes_use_their_configured_read_preference(replica_set_clients):
+    async def main():
+        server.init_clients()
+        return {query_class: server.read_db(query_class).read_preference for query_class in server.read_dbs}
+
+    preferences = asyncio.run(main())
+    for query_class, name in server.read_preference_names.items():
+        assert preferences[query_class] == server.read_preference(name)
+
+
+def test_causal_session_reads_its_own_writes(replica_set_clients):
+    async def main():
+        server.init_clients()
+        await server.detect_mongo_topology()
+        async with server.causal_session() as session:
+            assert session is not None and session.options.causal_consistency
+            await server.db.wallets.insert_one({"wallet_id": "w1", "version": 0}, session=session)
+            await server.db.wallets.update_one({"wallet_id": "w1"}, {"$inc": {"version": 1}}, session=session)
+            return await server.read_db("listing").wallets.find_one({"wallet_id": "w1"}, session=session)
+
+    wallet = asyncio.run(main())
+    assert wallet["version"] == 1
+    assert server.mongo_supports_transactions
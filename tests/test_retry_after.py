@@ -0,0 +1,46 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from types import SimpleNamespace
+
+import httpx
+import openai
+import pytest
+from fastapi import HTTPException
+
+import server
+
+
+def test_delay_seconds():
+    assert server.retry_after_seconds("7") == 7.0
+    assert server.retry_after_seconds("1.5") == 1.5
+    assert server.retry_after_seconds("-3") == 0.0
+
+
+def test_http_date():
+    when = datetime.now(timezone.utc) + timedelta(seconds=30)
+    assert 25 <= server.retry_after_seconds(format_datetime(when, usegmt=True)) <= 30
+    assert server.retry_after_seconds("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+
+
+@pytest.mark.parametrize("value", [None, "", "soon", "inf", "nan"])
+def test_missing_or_unparseable(value):
+    assert server.retry_after_seconds(value) is None
+
+
+def test_rate_limit_with_http_date_becomes_a_503(monkeypatch):
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+    response = httpx.Response(429, headers={"retry-after": "Wed, 21 Oct 2015 07:28:00 GMT"}, request=request)
+
+    async def create(**kwargs):
+        raise openai.RateLimitError("rate limited", response=response, body=None)
+
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    monkeypatch.setattr(server, "get_ai_client", lambda: client)
+    monkeypatch.setattr(server, "ai_retry_attempts", 1)
+    monkeypatch.setattr(server, "ai_retry_base_delay", 0.01)
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(server.create_completion([{"role": "user", "content": "hi"}]))
+    assert error.value.status_code == 503
+    assert error.value.headers["Retry-After"] == "1"
@@ -0,0 +1,85 @@
+import asyncio
+import socket
+import threading
+from decimal import Decimal
+
+import base58
+import httpx
+import pytest
+
+import server
+from benchmarks import stubs
+from benchmarks.load import free_port, wait_until
+
+OWNER = base58.b58encode_check(server.TRON_ADDRESS_PREFIX + bytes(range(20))).decode()
+USDT = server.TRC20_DEFAULT_TOKENS[0].token_address
+
+
+def accepting(port):
+    with socket.create_connection(("127.0.0.1", port), timeout=1):
+        return True
+
+
+@pytest.fixture(scope="module")
+def stub_url():
+    port = free_port()
+    threading.Thread(target=stubs.serve, args=(port,), daemon=True).start()
+    wait_until(lambda: accepting(port), 10, "stub server")
+    return f"http://127.0.0.1:{port}/tron"
+
+
+def run_with_client(base_url, call):
+    async def main():
+        transport = server.HttpTransport(timeout=5, max_connections=10)
+        try:
+            return await call(server.TronClient(transport, base_url, max_concurrency=4))
+        finally:
+            await transport.aclose()
+
+    return asyncio.run(main())
+
+
+def test_balance_is_converted_from_sun(stub_url):
+    balance = run_with_client(stub_url, lambda tron: tron.get_balance(OWNER))
+    assert balance == Decimal("12.345678")
+
+
+def test_balances_are_fetched_for_every_address(stub_url):
+    addresses = [OWNER, USDT]
+    balances = run_with_client(stub_url, lambda tron: tron.get_balances(addresses))
+    assert balances == {address: Decimal("12.345678") for address in addresses}
+
+
+def test_trc20_balances_are_decoded_from_the_constant_result(stub_url):
+    balance = run_with_client(stub_url, lambda tron: tron.trc20_balance_of(OWNER, USDT))
+    assert balance == 25_000_000
+    balances = run_with_client(stub_url, lambda tron: tron.get_trc20_balances(OWNER, [USDT]))
+    assert balances == {USDT: 25_000_000}
+
+
+def test_now_block(stub_url):
+    block = run_with_client(stub_url, lambda tron: tron.get_now_block())
+    assert block["block_header"]["raw_data"]["number"] > 0
+
+
+def test_unknown_endpoint_raises(stub_url):
+    with pytest.raises(httpx.HTTPStatusError):
+        run_with_client(stub_url, lambda tron: tron._post("/wallet/unknown", {}))
+
+
+def test_error_body_raises_rpc_error():
+    class ErrorTransport(server.RpcTransport):
+        async def post_json(self, url, payload, headers=None):
+            return {"Error": "class org.tron.core.exception.BadItemException"}
+
+    async def main():
+        tron = server.TronClient(ErrorTransport(), "http://tron.invalid")
+        await tron.get_account(OWNER)
+
+    with pytest.raises(server.RPCError):
+        asyncio.run(main())
+
+
+def test_invalid_owner_is_rejected_before_the_call():
+    with pytest.raises(ValueError):
+        server.tron_address_to_abi("0x" + "11" * 20)